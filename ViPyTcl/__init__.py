@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from .utils import my_logger as _my_logger
@@ -5,7 +6,9 @@ from .base import *
 from .core import TclProcessPopen
 from .core import VivadoPrj
 from .core import DefaultVivadoBatPath, find_vivado_bat
+from .core import NetlistDB, DeviceDB, NetlistGraph, BuildCache, RunScheduler, RunHost, RunWatcher, SourceWatcher
 from .core import GRPCServer, GRPCRemoteTclServicer, RemoteTclProcessPopen, add_RemoteTclServicer_to_server
+from .core import AioGRPCServer, AioRemoteTclServicer, AioRemoteTclProcess
 
 __all__ = ["VivadoPrj",
            "TclProcessPopen",
@@ -14,7 +17,9 @@ __all__ = ["VivadoPrj",
            "terminate",
            "viproperty",
            "DefaultVivadoBatPath", "GRPCServer", "RemoteTclProcessPopen", "GRPCRemoteTclServicer",
-           "add_RemoteTclServicer_to_server"]
+           "add_RemoteTclServicer_to_server", "AioGRPCServer", "AioRemoteTclServicer", "AioRemoteTclProcess",
+           "NetlistDB", "DeviceDB", "NetlistGraph", "BuildCache", "RunScheduler", "RunHost", "RunWatcher",
+           "SourceWatcher"]
 
 __author__ = "odjvnrij <odjvnrij72@outlook.com>"
 __status__ = "production"
@@ -63,18 +68,43 @@ def terminate():
         _tcl_popen = None
 
 
-def remote_tcl_server(ip="127.0.0.1", port=21000):
+def remote_tcl_server(ip="127.0.0.1", port=21000, aio: bool = False):
+    """
+    :param aio: 使用 grpc.aio 的服务端，在当前线程中运行直到服务端停止
+    """
+    if aio:
+        asyncio.run(_remote_tcl_server_aio(ip, port))
+        return
+
     grpc_server = GRPCServer()
     remote_tcl_servicer = GRPCRemoteTclServicer()
     grpc_server.add_servicer(add_RemoteTclServicer_to_server, remote_tcl_servicer)
     grpc_server.add_stop_callback(remote_tcl_servicer.stop)
     grpc_server.add_aps_job(remote_tcl_servicer.clean_vivado_cache, "interval", days=3)
     grpc_server.add_aps_job(remote_tcl_servicer.clean_file_cache, "interval", days=3)
+    grpc_server.add_aps_job(remote_tcl_servicer.reap_sessions, "interval", minutes=1)
 
     grpc_server.add_insecure_port(ip, int(port))
     grpc_server.start()
 
 
+async def _remote_tcl_server_aio(ip="127.0.0.1", port=21000):
+    grpc_server = AioGRPCServer()
+    remote_tcl_servicer = AioRemoteTclServicer()
+    grpc_server.add_servicer(add_RemoteTclServicer_to_server, remote_tcl_servicer)
+    grpc_server.add_stop_callback(remote_tcl_servicer.stop)
+    grpc_server.add_aps_job(remote_tcl_servicer.clean_vivado_cache, "interval", days=3)
+    grpc_server.add_aps_job(remote_tcl_servicer.clean_file_cache, "interval", days=3)
+    grpc_server.add_aps_job(remote_tcl_servicer.reap_sessions, "interval", minutes=1)
+
+    grpc_server.add_insecure_port(ip, int(port))
+    await grpc_server.start()
+    try:
+        await grpc_server.wait_for_termination()
+    finally:
+        await grpc_server.stop()
+
+
 def remote_program_bits(bit_path: str, ip="127.0.0.1", port=21000):
     _vivado = VivadoPrj(server_addr=(ip, port))
     bit_path = _vivado.grpc_put_file(bit_path)
@@ -142,26 +142,31 @@ class ViObjList:
         return self._objs[item]
 
 
+def _runs_type_from_flags(result: List[str]) -> RunsType:
+    """ result: ["<对象数> <IS_SYNTHESIS> <IS_IMPLEMENTATION>"]，对象不存在时只有对象数 """
+    if not result:
+        raise ViUnexpectedEmptyTclReturnError("empty tcl return")
+
+    flags = result[0].split()
+    if not flags or flags[0] == "0" or len(flags) < 3:
+        return RunsType.NoneType
+    if flags[1] == "1":
+        return RunsType.SYNTH
+    elif flags[2] == "1":
+        return RunsType.IMPL
+    return RunsType.NoneType
+
+
 class ViObjRun(ViObj):
     def __init__(self, tcl_popen, run_name: str):
         super().__init__(tcl_popen, f"get_runs", run_name)
 
     def get_run_type(self):
-        result = self()
-        if not result:
-            raise ViUnexpectedEmptyTclReturnError
-
-        if "WARNING: [Vivado 12-821]" in result[0]:
-            return RunsType.NoneType
-
-        is_synth = int(self._tcl_popen.tcl(f"get_property IS_SYNTHESIS [{self}]")[0])
-        is_impl = int(self._tcl_popen.tcl(f"get_property IS_IMPLEMENTATION [{self}]")[0])
-        if is_synth:
-            return RunsType.SYNTH
-        elif is_impl:
-            return RunsType.IMPL
-        else:
-            return RunsType.NoneType
+        """ 一次 tcl 调用同时查询 run 是否存在以及 IS_SYNTHESIS / IS_IMPLEMENTATION """
+        run = f"[get_runs -quiet {{{self.name}}}]"
+        result = self._tcl_popen.tcl(f"concat [llength {run}] [get_property -quiet IS_SYNTHESIS {run}] "
+                                     f"[get_property -quiet IS_IMPLEMENTATION {run}]")
+        return _runs_type_from_flags(result)
 
 
 class ViObjDesign(ViObj):
@@ -169,21 +174,12 @@ class ViObjDesign(ViObj):
         super().__init__(tcl_popen, "get_designs", design_name)
 
     def get_design_type(self):
-        result = self()
-        if not result:
-            raise ViUnexpectedEmptyTclReturnError
-
-        if "WARNING: [Vivado 12-628]" in result[0]:
-            return RunsType.NoneType
-
-        is_synth = int(self._tcl_popen.tcl(f"get_property IS_SYNTHESIS [get_runs {self.name}]")[0])
-        is_impl = int(self._tcl_popen.tcl(f"get_property IS_IMPLEMENTATION [get_runs {self.name}]")[0])
-        if is_synth:
-            return RunsType.SYNTH
-        elif is_impl:
-            return RunsType.IMPL
-        else:
-            return RunsType.NoneType
+        """ design 名即为打开它的 run 名，一次 tcl 调用同时查询 design 是否存在以及 run 的类型 """
+        run = f"[get_runs -quiet {{{self.name}}}]"
+        result = self._tcl_popen.tcl(f"concat [llength [get_designs -quiet {{{self.name}}}]] "
+                                     f"[get_property -quiet IS_SYNTHESIS {run}] "
+                                     f"[get_property -quiet IS_IMPLEMENTATION {run}]")
+        return _runs_type_from_flags(result)
 
 
 class ViObjFileset(ViObj):
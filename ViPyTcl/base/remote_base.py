@@ -1,6 +1,6 @@
 import os.path
 from enum import IntEnum
-from .vivado_error import ViError
+from .vivado_error import ViError, ViFileChecksumError
 
 
 class MsgStat(IntEnum):
@@ -17,6 +17,9 @@ class GRPCErrCode(IntEnum):
     TclRunTimeoutErr = 0x02
     FileNotFoundErr = 0x5
     FileExistsErr = 0x6
+    FileChecksumErr = 0x7
+    SessionLimitErr = 0x10
+    SessionNotFoundErr = 0x11
     UnknownErr = 0x50
 
 
@@ -24,9 +27,17 @@ class GRPCErr(Exception):
     pass
 
 
+class GRPCSessionErr(GRPCErr):
+    pass
+
+
 GRPCErrCode2Err = {
     GRPCErrCode.TclRunErr: ViError,
+    GRPCErrCode.TclRunTimeoutErr: TimeoutError,
     GRPCErrCode.FileNotFoundErr: FileNotFoundError,
     GRPCErrCode.FileExistsErr: FileExistsError,
+    GRPCErrCode.FileChecksumErr: ViFileChecksumError,
+    GRPCErrCode.SessionLimitErr: GRPCSessionErr,
+    GRPCErrCode.SessionNotFoundErr: GRPCSessionErr,
     GRPCErrCode.UnknownErr: GRPCErr,
 }
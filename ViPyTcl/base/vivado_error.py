@@ -40,6 +40,10 @@ class ViFileErrro(ViError):
     pass
 
 
+class ViFileChecksumError(ViFileErrro):
+    pass
+
+
 class ViRunNotExist(ViError):
     pass
 
@@ -76,6 +80,15 @@ class ViUnknownPropertyValue(ViError):
     pass
 
 
+class ViRunFailed(ViError):
+    pass
+
+
+class ViDeferredResult(ViError):
+    """ 录制模式下的命令还没有运行，结果不可用 """
+    pass
+
+
 CommonErrDict = {
     "Common 17-162": ViRunNotExist
 }
@@ -83,6 +96,8 @@ CommonErrDict = {
 
 def get_err_from_str(s: str):
     t = re.search(r"^ERROR: \[(?P<error_type>\w+) (?P<code>[\d\-]+)\] (?P<message>.*)", s)
+    if t is None:
+        return ViError(s)
 
     err = CommonErrDict.get(f'{t.group("error_type")} {t.group("code")}', None)
     if not err:
@@ -1,5 +1,27 @@
 from .global_var import DefaultVivadoBatPath, find_vivado_bat
+from .build_cache import BuildCache, BuildCacheStore, DirectoryStore, LocalStore, GRPCStore
+from .device_db import DeviceDB
+from .netlist_db import NetlistDB
+from .netlist_graph import NetlistGraph, Cone
+from .timing_report import TimingPath, TimingPathTable, iter_timing_paths, timing_path_table
+from .utilization_report import UtilizationReport, UtilizationTable, parse_utilization_report
+from .run_watcher import RunWatcher, RunWatchEvent, RunState
+from .source_watcher import SourceWatcher, SourceChangeEvent, RebuildPlan
+from .run_scheduler import RunScheduler, RunHost, RunJob, RunEvent
+from .strategy_sweep import StrategySweep, SweepResult
+from .project_snapshot import ProjectSnapshot, RunInfo, DesignInfo
+from .incremental import IncrementalResult, parse_reuse_report
+from .report_cache import ReportCache, report_key
+from .blob_store import BlobStore
+from .compression import CompressionStats, available_encodings
+from .dir_sync import DirSync, SyncResult, ManifestEntry
+from .ip_build import IPBuilder, IPBuildResult, IPInfo
+from .tcl_batch import TclBatch, TclFuture
+from .remote_session import SessionManager, SessionInterceptor, SessionLimitError
+from .admission import AdmissionControl, AioAdmissionControl, ClassLimit
+from .channel_pool import ChannelPool
 from .remote_tcl import GRPCServer, GRPCRemoteTclServicer, RemoteTclProcessPopen, clean_file_cache
 from .remote_tcl_pb2_grpc import add_RemoteTclServicer_to_server
+from .remote_aio import AioGRPCServer, AioRemoteTclServicer, AioRemoteTclProcess
 from .tcl_process import TclProcessPopen, BaseTclProcess, clean_vivado_cache
 from .vivado_prj import VivadoPrj
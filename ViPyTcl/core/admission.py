@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict
+
+import grpc
+import grpc.aio
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+服务端的准入控制，作为 grpc 服务端拦截器
+    每个 rpc 按方法名分类 (tcl / file / control)，每类有并发上限和排队上限
+    超过并发上限的请求排队，按客户端轮转放行，一个客户端的大量请求不会挡住其它客户端
+    排队已满、单个客户端的请求过多、或排队超过 max_wait（或客户端的 deadline）时以 RESOURCE_EXHAUSTED 拒绝，
+    trailing metadata grpc-retry-pushback-ms 为建议的重试间隔，grpc 客户端的重试策略会使用它
+    control 类（keepalive、压缩协商、blob 查询、统计）不限制，负载高时服务端仍然可以响应
+"""
+
+RetryPushbackKey = "grpc-retry-pushback-ms"
+
+# 不在其中的 rpc 为 control
+RpcClasses = {
+    "tcl": "tcl",
+    "tcl_stream": "tcl",
+    "tcl_batch": "tcl",
+    "put_file": "file",
+    "get_file": "file",
+    "put_file_stream": "file",
+    "get_file_stream": "file",
+    "put_blob_stream": "file",
+    "link_blobs": "file",
+    "dir_manifest": "file",
+    "block_digests": "file",
+    "remove_files": "file",
+}  # type: Dict[str, str]
+
+# control 类和 grpc 内部使用的线程
+ControlThreads = 4
+
+
+class ClassLimit:
+    """
+    :param concurrency: 同时运行的上限
+    :param queue: 排队的上限
+    :param per_client: 单个客户端运行和排队的请求上限，0 为不限制
+    :param max_wait: 最长排队时间, sec
+    """
+
+    def __init__(self, concurrency: int, queue: int, per_client: int = 0, max_wait: float = 30.0):
+        self.concurrency = max(1, concurrency)
+        self.queue = max(0, queue)
+        self.per_client = per_client
+        self.max_wait = max_wait
+
+    def __repr__(self):
+        return f"<ClassLimit concurrency: {self.concurrency}, queue: {self.queue}, per_client: {self.per_client}>"
+
+
+def default_limits() -> Dict[str, ClassLimit]:
+    # 共享解释器上的 tcl 本来就是串行的，并发上限主要给会话使用
+    return {
+        "tcl": ClassLimit(8, 32, per_client=8, max_wait=60.0),
+        "file": ClassLimit(8, 32, per_client=8, max_wait=30.0),
+    }
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, msg: str, retry_after: float):
+        super().__init__(msg)
+        self.retry_after = retry_after
+
+
+class _RpcClass:
+    def __init__(self, name: str, limit: ClassLimit):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.queued = 0
+        self.waiting = OrderedDict()  # type: Dict[str, deque]   # 客户端 -> 排队的 Event，按轮转顺序
+        self.clients = {}  # type: Dict[str, int]   # 客户端 -> 运行和排队的请求数
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_total = 0.0
+
+    def retry_after(self) -> float:
+        """ 按平均处理时间估计排队清空的时间, sec """
+        avg = self.service_total / self.completed if self.completed else 1.0
+        return min(max(avg * (self.queued + 1) / self.limit.concurrency, 0.1), 60.0)
+
+
+class AdmissionControl(grpc.ServerInterceptor):
+    """
+    :param limits: {类名: ClassLimit}，默认 default_limits()
+    :param rpc_classes: {rpc 名: 类名}，默认 RpcClasses
+    """
+
+    def __init__(self, limits: Dict[str, ClassLimit] = None, rpc_classes: Dict[str, str] = None):
+        self.limits = limits if limits is not None else default_limits()
+        self.rpc_classes = rpc_classes if rpc_classes is not None else RpcClasses
+        self._classes = {name: _RpcClass(name, limit) for name, limit in self.limits.items()}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<AdmissionControl {self.limits}>"
+
+    @property
+    def max_threads(self) -> int:
+        """ 受限的 rpc 最多占用的服务端线程，加上 ControlThreads 为需要的线程数 """
+        return sum(limit.concurrency + limit.queue for limit in self.limits.values())
+
+    @staticmethod
+    def client_key(context) -> str:
+        """ 客户端地址，不含端口，同一台机器的多个连接算同一个客户端 """
+        return context.peer().rsplit(":", 1)[0]
+
+    def _reject(self, cls: _RpcClass, msg: str) -> AdmissionRejected:
+        cls.rejected += 1
+        return AdmissionRejected(msg, cls.retry_after())
+
+    def _leave(self, cls: _RpcClass, client: str) -> None:
+        n = cls.clients.get(client, 0) - 1
+        if n > 0:
+            cls.clients[client] = n
+        else:
+            cls.clients.pop(client, None)
+
+    def _enter(self, cls: _RpcClass, client: str, ticket_factory):
+        """ :return: 直接放行时为 None，否则为排队的 ticket（有 set / is_set） """
+        with self._lock:
+            n = cls.clients.get(client, 0)
+            if cls.limit.per_client and n >= cls.limit.per_client:
+                raise self._reject(cls, f"too many {cls.name} requests from {client}: {n}/{cls.limit.per_client}")
+            if cls.active < cls.limit.concurrency and not cls.queued:
+                cls.active += 1
+                cls.clients[client] = n + 1
+                cls.admitted += 1
+                return None
+            if cls.queued >= cls.limit.queue:
+                raise self._reject(cls, f"{cls.name} queue full: {cls.queued}/{cls.limit.queue}")
+            ticket = ticket_factory()
+            cls.waiting.setdefault(client, deque()).append(ticket)
+            cls.queued += 1
+            cls.clients[client] = n + 1
+            return ticket
+
+    def acquire(self, rpc_class: str, client: str, timeout: float) -> float:
+        """
+        取得运行的名额，排满时按客户端轮转排队
+        :return: 排队时间, sec，被拒绝时抛出 AdmissionRejected
+        """
+        cls = self._classes[rpc_class]
+        start = time.time()
+        ticket = self._enter(cls, client, threading.Event)
+        if ticket is None:
+            return 0.0
+        ticket.wait(max(timeout, 0))
+        return self._waited(cls, client, ticket, start, timeout)
+
+    def _waited(self, cls: _RpcClass, client: str, ticket, start: float, timeout: float) -> float:
+        with self._lock:
+            # set 和出队都在锁内，未 set 时仍然在队列中
+            if not ticket.is_set():
+                tickets = cls.waiting[client]
+                tickets.remove(ticket)
+                if not tickets:
+                    del cls.waiting[client]
+                cls.queued -= 1
+                self._leave(cls, client)
+                cls.timeouts += 1
+                raise self._reject(cls, f"{cls.name} queue wait timeout {timeout:.1f} s")
+            wait = time.time() - start
+            cls.admitted += 1
+            cls.wait_total += wait
+            cls.wait_max = max(cls.wait_max, wait)
+        return wait
+
+    def release(self, rpc_class: str, client: str, elapsed: float) -> None:
+        """ 释放名额，放行下一个客户端的第一个排队请求 """
+        cls = self._classes[rpc_class]
+        with self._lock:
+            cls.active -= 1
+            self._leave(cls, client)
+            cls.completed += 1
+            cls.service_total += elapsed
+            while cls.active < cls.limit.concurrency and cls.waiting:
+                client, tickets = next(iter(cls.waiting.items()))
+                ticket = tickets.popleft()
+                if tickets:
+                    cls.waiting.move_to_end(client)
+                else:
+                    del cls.waiting[client]
+                cls.queued -= 1
+                cls.active += 1
+                ticket.set()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """ {类名: {active, queued, clients, admitted, rejected, timeouts, wait_avg, wait_max, service_avg}} """
+        with self._lock:
+            return {name: {
+                "active": cls.active,
+                "queued": cls.queued,
+                "clients": len(cls.clients),
+                "admitted": cls.admitted,
+                "rejected": cls.rejected,
+                "timeouts": cls.timeouts,
+                "wait_avg": cls.wait_total / cls.admitted if cls.admitted else 0.0,
+                "wait_max": cls.wait_max,
+                "service_avg": cls.service_total / cls.completed if cls.completed else 0.0,
+            } for name, cls in self._classes.items()}
+
+    def _timeout(self, rpc_class: str, context) -> float:
+        timeout = self.limits[rpc_class].max_wait
+        remaining = context.time_remaining()
+        return min(timeout, remaining) if remaining is not None else timeout
+
+    @staticmethod
+    def _rejected(rpc_class: str, client: str, err: AdmissionRejected, context) -> str:
+        """ 设置 retry 提示，:return: abort 的 details """
+        logger.warning(f"reject {rpc_class} request from {client}: {err}, retry after {err.retry_after:.1f} s")
+        context.set_trailing_metadata(((RetryPushbackKey, str(int(err.retry_after * 1000))),))
+        return f"{err}, retry after {err.retry_after:.1f} s"
+
+    def _admit(self, rpc_class: str, context) -> str:
+        client = self.client_key(context)
+        try:
+            self.acquire(rpc_class, client, self._timeout(rpc_class, context))
+        except AdmissionRejected as err:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, self._rejected(rpc_class, client, err, context))
+        return client
+
+    def _wrap(self, rpc_class: str, behavior, response_streaming: bool):
+        def unary(request, context):
+            client = self._admit(rpc_class, context)
+            start = time.time()
+            try:
+                return behavior(request, context)
+            finally:
+                self.release(rpc_class, client, time.time() - start)
+
+        def stream(request, context):
+            client = self._admit(rpc_class, context)
+            start = time.time()
+            try:
+                yield from behavior(request, context)
+            finally:
+                self.release(rpc_class, client, time.time() - start)
+
+        return stream if response_streaming else unary
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        rpc_class = self.rpc_classes.get(handler_call_details.method.rsplit("/", 1)[-1])
+        if handler is None or rpc_class not in self._classes:
+            return handler
+
+        args = dict(request_deserializer=handler.request_deserializer,
+                    response_serializer=handler.response_serializer)
+        if handler.request_streaming and handler.response_streaming:
+            return grpc.stream_stream_rpc_method_handler(self._wrap(rpc_class, handler.stream_stream, True), **args)
+        if handler.request_streaming:
+            return grpc.stream_unary_rpc_method_handler(self._wrap(rpc_class, handler.stream_unary, False), **args)
+        if handler.response_streaming:
+            return grpc.unary_stream_rpc_method_handler(self._wrap(rpc_class, handler.unary_stream, True), **args)
+        return grpc.unary_unary_rpc_method_handler(self._wrap(rpc_class, handler.unary_unary, False), **args)
+
+
+class AioAdmissionControl(AdmissionControl, grpc.aio.ServerInterceptor):
+    """ grpc.aio 服务端使用的 AdmissionControl，排队时不占用线程 """
+
+    async def acquire_async(self, rpc_class: str, client: str, timeout: float) -> float:
+        cls = self._classes[rpc_class]
+        start = time.time()
+        ticket = self._enter(cls, client, asyncio.Event)
+        if ticket is None:
+            return 0.0
+        try:
+            await asyncio.wait_for(ticket.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # 客户端取消: 未放行的从队列中移除，已经放行的归还名额
+            try:
+                self._waited(cls, client, ticket, start, timeout)
+                self.release(rpc_class, client, 0.0)
+            except AdmissionRejected:
+                pass
+            raise
+        return self._waited(cls, client, ticket, start, timeout)
+
+    async def _admit_async(self, rpc_class: str, context) -> str:
+        client = self.client_key(context)
+        try:
+            await self.acquire_async(rpc_class, client, self._timeout(rpc_class, context))
+        except AdmissionRejected as err:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, self._rejected(rpc_class, client, err, context))
+        return client
+
+    def _wrap_async(self, rpc_class: str, behavior, response_streaming: bool):
+        async def unary(request, context):
+            client = await self._admit_async(rpc_class, context)
+            start = time.time()
+            try:
+                return await behavior(request, context)
+            finally:
+                self.release(rpc_class, client, time.time() - start)
+
+        async def stream(request, context):
+            client = await self._admit_async(rpc_class, context)
+            start = time.time()
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            finally:
+                self.release(rpc_class, client, time.time() - start)
+
+        return stream if response_streaming else unary
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        rpc_class = self.rpc_classes.get(handler_call_details.method.rsplit("/", 1)[-1])
+        if handler is None or rpc_class not in self._classes:
+            return handler
+
+        args = dict(request_deserializer=handler.request_deserializer,
+                    response_serializer=handler.response_serializer)
+        if handler.request_streaming and handler.response_streaming:
+            return grpc.stream_stream_rpc_method_handler(
+                self._wrap_async(rpc_class, handler.stream_stream, True), **args)
+        if handler.request_streaming:
+            return grpc.stream_unary_rpc_method_handler(
+                self._wrap_async(rpc_class, handler.stream_unary, False), **args)
+        if handler.response_streaming:
+            return grpc.unary_stream_rpc_method_handler(
+                self._wrap_async(rpc_class, handler.unary_stream, True), **args)
+        return grpc.unary_unary_rpc_method_handler(self._wrap_async(rpc_class, handler.unary_unary, False), **args)
@@ -0,0 +1,135 @@
+import logging
+import os
+import shutil
+import stat
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+from ..utils.tools import file_digest
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+服务端按内容寻址的文件存储，同样内容的文件只上传、只存一份
+    <root>/<sha256[:2]>/<sha256>
+上传流程:
+    1. has_blobs     客户端发送每个文件的 sha256 和大小，服务端返回缺少的
+    2. put_blob_stream  只上传缺少的 blob
+    3. link_blobs    服务端在 dst_path 处用 reflink（写时复制）生成文件，不支持时复制
+硬链接需要 hardlink=True 打开: 硬链接和 dst 是同一个文件，dst 被原地修改（write_xdc、保存 .xpr、编辑脚本）
+时 blob 和其它会话中链接的文件都会改变，所以此时 blob 设为只读（root 不受限制），链接出的文件也是只读的，
+只适合不会被修改的输入
+    每个 blob 记录入库时的 (size, mtime_ns)，查询时不一致则重新计算摘要，不匹配的 blob 视为缺少，重新上传
+"""
+
+# linux FICLONE ioctl，btrfs / xfs 等支持时为写时复制
+_FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflink not supported")
+    import fcntl
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+class BlobStore:
+    """
+    :param root: blob 目录，放在服务端缓存目录下，和其中的文件在同一个卷上才能 reflink / 硬链接
+    :param hardlink: 不支持 reflink 时使用硬链接（blob 和链接出的文件只读），否则复制
+    """
+
+    def __init__(self, root: str or Path, hardlink: bool = False):
+        self.root = Path(root)
+        self.hardlink = hardlink
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._stats = {}  # sha256: (size, mtime_ns)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<BlobStore {self.root} known: {len(self._stats)}>"
+
+    def path(self, sha256: str) -> Path:
+        if len(sha256) != 64 or not all(c in "0123456789abcdef" for c in sha256):
+            raise ValueError(f"invalid sha256: {sha256!r}")
+        return self.root / sha256[:2] / sha256
+
+    def part_path(self, sha256: str) -> Path:
+        """ 上传中的临时文件，同一个 blob 被同时上传时互不影响 """
+        path = self.path(sha256)
+        path.parent.mkdir(exist_ok=True)
+        # aio 服务端的多个上传共用 executor 的线程，线程 id 不能区分，每次上传使用随机的名字
+        return path.with_name(f".{sha256}.{uuid.uuid4().hex[:8]}.part")
+
+    def has(self, sha256: str, size: int) -> bool:
+        """ blob 存在且内容仍然是 sha256 """
+        path = self.path(sha256)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._stats.pop(sha256, None)
+            return False
+        if stat.st_size != size:
+            return False
+
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if self._stats.get(sha256) == key:
+                return True
+        # 服务端重启后第一次查询，或者 blob 被硬链接的文件修改过
+        if file_digest(str(path)) != sha256:
+            logger.warning(f"blob {sha256[:12]} modified, drop it")
+            return False
+        with self._lock:
+            self._stats[sha256] = key
+        return True
+
+    def add(self, sha256: str, part: Path) -> Path:
+        """ 已经校验过摘要的临时文件入库 """
+        path = self.path(sha256)
+        if self.hardlink:
+            os.chmod(part, stat.S_IMODE(os.stat(part).st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+        os.replace(part, path)
+        st = path.stat()
+        with self._lock:
+            self._stats[sha256] = (st.st_size, st.st_mtime_ns)
+        return path
+
+    def link(self, sha256: str, dst: Path) -> str:
+        """
+        在 dst 处生成 blob 的内容，先生成临时文件再 rename，dst 所在目录需要已经存在
+        :return: reflink / hardlink / copy / exists，copy 得到的 dst 可写
+        """
+        src = self.path(sha256)
+        if dst.exists() and os.path.samefile(src, dst):
+            return "exists"
+
+        tmp = dst.with_name(f".{dst.name}.{threading.get_ident()}.link")
+        try:
+            try:
+                _reflink(src, tmp)
+                method = "reflink"
+            except OSError:
+                method = "copy"
+                if self.hardlink:
+                    try:
+                        os.link(src, tmp)
+                        method = "hardlink"
+                    except OSError:
+                        pass
+                if method == "copy":
+                    shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        finally:
+            if tmp.exists():
+                os.remove(tmp)
+        return method
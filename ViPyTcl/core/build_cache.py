@@ -0,0 +1,369 @@
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from .tcl_lib import WriteObjsTcl
+
+logger = logging.getLogger("ViPyTcl")
+
+# 2: 缓存中包含全部 run 状态标记，旧的条目不再命中
+BuildCacheVersion = 2
+DefaultBuildCacheRoot = os.path.join(os.path.expanduser("~"), ".ViPyTcl", "build_cache")
+DefaultBuildCacheBytes = 20 * 1024 ** 3
+
+# 运行过程中会变化或者和机器相关的 run 属性，不参与 key 的计算
+VolatileRunProperties = ("STATUS", "PROGRESS", "NEEDS_REFRESH", "CURRENT_STEP", "DIRECTORY", "STATS.*",
+                         "LAST_*", "*_TIME", "QUEUE", "JOBS", "HOST")
+
+# vivado 根据 run 目录中的这些标记文件判断 run 和每一步的状态
+# (.vivado.begin.rst / .vivado.end.rst / .<step>.begin.rst / .<step>.end.rst / __synthesis_is_complete__)
+RunStatusPatterns = ("*.rst", "__synthesis_is_complete__")
+# 命中后恢复到 run 目录的文件
+DefaultCachePatterns = ("*.dcp", "*.rpt", "*.pb", "*.bit", "*.bin", "*.ltx", "*.mmi", "*.log", "*.vds", "*.vdi",
+                        "gen_run.xml") + RunStatusPatterns
+
+r"""
+vivado 端导出 run 输入的脚本，每项一行，tab 分隔:
+    V   version
+    D   project directory
+    R   run     parent  used_in
+    RP  property    value
+    F   fileset path    size    mtime   sha256
+    sha256 只在 vivado 自带 tcllib 的 sha256 包可用时计算，否则为空，由本机或 size/mtime 代替
+"""
+RunInputsTcl = WriteObjsTcl + r"""
+proc ::vipytcl::run_inputs {path run} {
+    set fh [open $path w]
+    fconfigure $fh -encoding utf-8 -translation lf
+    set has_sha [expr {![catch {package require sha256}]}]
+
+    set run [get_runs $run]
+    puts $fh "V\t[version -short]"
+    puts $fh "D\t[get_property DIRECTORY [current_project]]"
+    set used_in [expr {[get_property IS_SYNTHESIS $run] ? "synthesis" : "implementation"}]
+    puts $fh "R\t$run\t[get_property -quiet PARENT $run]\t$used_in"
+    foreach p [list_property $run] { puts $fh "RP\t$p\t[get_property -quiet $p $run]" }
+
+    foreach fs [list [get_property -quiet SRCSET $run] [get_property -quiet CONSTRSET $run]] {
+        if {$fs eq ""} { continue }
+        foreach f [lsort [get_files -quiet -all -used_in $used_in -of_objects [get_filesets $fs]]] {
+            if {![file isfile $f]} { continue }
+            set sha ""
+            if {$has_sha} { set sha [::sha2::sha256 -hex -file $f] }
+            puts $fh [join [list F $fs $f [file size $f] [file mtime $f] $sha] "\t"]
+        }
+    }
+    close $fh
+    return $path
+}
+
+proc ::vipytcl::run_outputs {run} {
+    set dir [get_property DIRECTORY [get_runs $run]]
+    set paths [concat [glob -nocomplain -types f -directory $dir *] [glob -nocomplain -types {f hidden} -directory $dir *]]
+    return [join $paths "\n"]
+}
+"""
+
+
+class RunInputs:
+    """ 解析后的 run 输入 """
+
+    def __init__(self):
+        self.version = ""
+        self.project_dir = ""
+        self.run = ""
+        self.parent = ""
+        self.used_in = ""
+        self.properties = {}  # type: Dict[str, str]
+        self.files = []  # type: List[Dict[str, str]]
+
+    def __repr__(self):
+        return f"<RunInputs {self.run} files: {len(self.files)}, properties: {len(self.properties)}>"
+
+
+def parse_run_inputs(lines: Iterable[str]) -> RunInputs:
+    inputs = RunInputs()
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        fields += [""] * (6 - len(fields))
+        tag = fields[0]
+        if tag == "V":
+            inputs.version = fields[1]
+        elif tag == "D":
+            inputs.project_dir = fields[1]
+        elif tag == "R":
+            inputs.run, inputs.parent, inputs.used_in = fields[1:4]
+        elif tag == "RP":
+            if not any(fnmatch.fnmatchcase(fields[1], p) for p in VolatileRunProperties):
+                inputs.properties[fields[1]] = fields[2]
+        elif tag == "F":
+            inputs.files.append({"fileset": fields[1], "path": fields[2], "size": fields[3], "mtime": fields[4],
+                                 "sha256": fields[5]})
+    return inputs
+
+
+def build_cache_key(inputs: RunInputs, digests: Dict[str, str] = None, parent_key: str = "") -> str:
+    """
+    由 run 输入计算 key，文件路径取相对于工程目录的路径，同一工程在不同机器上的 key 相同
+    :param digests: {path: 摘要}，优先于 inputs 中的 sha256；都没有时用 size 和 mtime
+    :param parent_key: impl run 的 parent synth run 的 key
+    """
+    digests = digests if digests else {}
+    files = []
+    for f in inputs.files:
+        path = f["path"]
+        digest = digests.get(path) or f["sha256"] or f"{f['size']}:{f['mtime']}"
+        rel = os.path.relpath(path, inputs.project_dir) if inputs.project_dir else path
+        files.append((f["fileset"], rel.replace("\\", "/"), digest))
+
+    payload = {"cache_version": BuildCacheVersion,
+               "vivado": inputs.version,
+               "used_in": inputs.used_in,
+               "properties": sorted(inputs.properties.items()),
+               "files": sorted(files),
+               "parent": parent_key}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def select_outputs(paths: Iterable[str], patterns: Iterable[str] = DefaultCachePatterns) -> List[str]:
+    patterns = tuple(patterns)
+    return [p for p in paths if any(fnmatch.fnmatchcase(os.path.basename(p), pat) for pat in patterns)]
+
+
+class BuildCacheStore:
+    """
+    缓存存储的接口，一个 entry 为一个 key 对应的一组文件
+        has / get / put 需要由子类实现
+    """
+
+    def has(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def get(self, key: str, dst_dir: str) -> Optional[List[str]]:
+        """ 将 entry 的全部文件取到 dst_dir，不存在时返回 None """
+        raise NotImplementedError
+
+    def put(self, key: str, files: Iterable[str], meta: dict = None) -> None:
+        raise NotImplementedError
+
+
+class DirectoryStore(BuildCacheStore):
+    """
+    目录存储，可以是本机目录，也可以是多台机器共享的 NFS / SMB 目录
+        <root>/<key[:2]>/<key>/ 下保存文件以及 manifest.json
+        先写到临时目录再 rename，manifest.json 存在即 entry 完整，并发写入同一个 key 时只保留一份
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.root}>"
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _manifest(self, key: str) -> Optional[dict]:
+        path = os.path.join(self._entry(key), "manifest.json")
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def has(self, key: str) -> bool:
+        return os.path.isfile(os.path.join(self._entry(key), "manifest.json"))
+
+    def get(self, key: str, dst_dir: str) -> Optional[List[str]]:
+        manifest = self._manifest(key)
+        if manifest is None:
+            return None
+
+        entry = self._entry(key)
+        os.makedirs(dst_dir, exist_ok=True)
+        result = []
+        for name in manifest["files"]:
+            dst = os.path.join(dst_dir, name)
+            shutil.copyfile(os.path.join(entry, name), dst)
+            result.append(dst)
+        os.utime(os.path.join(entry, "manifest.json"))
+        return result
+
+    def put(self, key: str, files: Iterable[str], meta: dict = None) -> None:
+        entry = self._entry(key)
+        if self.has(key):
+            return
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key[:8]}_", dir=os.path.dirname(entry))
+        try:
+            manifest = {"key": key, "created": time.time(), "meta": meta if meta else {}, "files": {}}
+            for path in files:
+                name = os.path.basename(path)
+                shutil.copyfile(path, os.path.join(tmp, name))
+                manifest["files"][name] = os.path.getsize(path)
+            with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=1)
+            os.rename(tmp, entry)
+        except OSError:
+            # 其它进程已经写入同一个 key
+            if not self.has(key):
+                raise
+        finally:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def remove(self, key: str) -> None:
+        shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def entries(self) -> List[dict]:
+        """ 全部 entry 的 {key, size, atime}，atime 为最近一次 get/put 的时间 """
+        result = []
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir() or prefix.name.startswith("."):
+                continue
+            for entry in os.scandir(prefix.path):
+                manifest = os.path.join(entry.path, "manifest.json")
+                if entry.name.startswith(".") or not os.path.isfile(manifest):
+                    continue
+                with open(manifest, encoding="utf-8") as f:
+                    size = sum(json.load(f)["files"].values())
+                result.append({"key": entry.name, "size": size, "atime": os.path.getmtime(manifest)})
+        return result
+
+
+class LocalStore(DirectoryStore):
+    """ 本机存储，超过 max_bytes 时按最近使用时间淘汰 """
+
+    def __init__(self, root: str = "", max_bytes: int = DefaultBuildCacheBytes):
+        super().__init__(root if root else DefaultBuildCacheRoot)
+        self.max_bytes = max_bytes
+
+    def put(self, key: str, files: Iterable[str], meta: dict = None) -> None:
+        super().put(key, files, meta)
+        self.evict()
+
+    def evict(self) -> int:
+        """ :return: 淘汰的 entry 数 """
+        entries = sorted(self.entries(), key=lambda e: e["atime"])
+        total = sum(e["size"] for e in entries)
+        n = 0
+        while entries and total > self.max_bytes:
+            entry = entries.pop(0)
+            self.remove(entry["key"])
+            total -= entry["size"]
+            n += 1
+        if n:
+            logger.info(f"build cache evict {n} entries, size: {total / 1024 ** 2:.1f} MB")
+        return n
+
+
+class GRPCStore(BuildCacheStore):
+    """
+    以 remote tcl 服务端的目录作为共享存储，文件经 put_file / get_file 传输
+    :param tcl_proc: 连接缓存服务端的 RemoteTclProcessPopen
+    :param root: 服务端的绝对路径
+    """
+
+    def __init__(self, tcl_proc, root: str):
+        self._tcl_proc = tcl_proc
+        self.root = root.replace("\\", "/").rstrip("/")
+
+    def __repr__(self):
+        return f"<GRPCStore {self._tcl_proc.server_ip}:{self._tcl_proc.server_port} {self.root}>"
+
+    def _entry(self, key: str) -> str:
+        return f"{self.root}/{key[:2]}/{key}"
+
+    def has(self, key: str) -> bool:
+        result = self._tcl_proc.tcl(f"file exists {{{self._entry(key)}/manifest.json}}")
+        return bool(result) and result[0] == "1"
+
+    def get(self, key: str, dst_dir: str) -> Optional[List[str]]:
+        if not self.has(key):
+            return None
+
+        os.makedirs(dst_dir, exist_ok=True)
+        manifest_path = os.path.join(dst_dir, f".{key[:8]}_manifest.json")
+        self._tcl_proc.grpc_get_file(f"{self._entry(key)}/manifest.json", manifest_path)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        os.remove(manifest_path)
+
+        result = []
+        for name in manifest["files"]:
+            dst = os.path.join(dst_dir, name)
+            self._tcl_proc.grpc_get_file(f"{self._entry(key)}/{name}", dst)
+            result.append(dst)
+        return result
+
+    def put(self, key: str, files: Iterable[str], meta: dict = None) -> None:
+        if self.has(key):
+            return
+
+        entry = self._entry(key)
+        tmp = f"{self.root}/{key[:2]}/.{key[:8]}_{uuid.uuid4().hex[:8]}"
+        self._tcl_proc.tcl(f"file mkdir {{{tmp}}}")
+        manifest = {"key": key, "created": time.time(), "meta": meta if meta else {}, "files": {}}
+        for path in files:
+            name = os.path.basename(path)
+            self._tcl_proc.grpc_put_file(path, f"{tmp}/{name}")
+            manifest["files"][name] = os.path.getsize(path)
+
+        fd, manifest_path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        self._tcl_proc.grpc_put_file(manifest_path, f"{tmp}/manifest.json")
+        os.remove(manifest_path)
+
+        self._tcl_proc.tcl(f"if {{[file exists {{{entry}}}]}} {{file delete -force {{{tmp}}}}} "
+                           f"else {{file rename {{{tmp}}} {{{entry}}}}}", raw=True)
+
+
+class BuildCache:
+    """
+    本机存储加上可选的共享存储
+        get 先查本机，再查共享存储，共享存储命中时同时写入本机
+        put 同时写入本机和共享存储
+    """
+
+    def __init__(self, local: DirectoryStore = None, shared: BuildCacheStore = None):
+        self.local = local if local else LocalStore()
+        self.shared = shared
+
+    def __repr__(self):
+        return f"<BuildCache local: {self.local}, shared: {self.shared}>"
+
+    def has(self, key: str) -> bool:
+        return self.local.has(key) or (self.shared is not None and self.shared.has(key))
+
+    def get(self, key: str, dst_dir: str) -> Optional[List[str]]:
+        files = self.local.get(key, dst_dir)
+        if files is not None:
+            logger.info(f"build cache local hit {key[:12]}")
+            return files
+
+        if self.shared is None:
+            return None
+        files = self.shared.get(key, dst_dir)
+        if files is not None:
+            logger.info(f"build cache shared hit {key[:12]}")
+            self.local.put(key, files)
+        return files
+
+    def put(self, key: str, files: Iterable[str], meta: dict = None) -> None:
+        files = list(files)
+        self.local.put(key, files, meta)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, files, meta)
+            except Exception as err:
+                # 共享存储不可用时不影响本次构建
+                logger.warning(f"build cache shared put failed {key[:12]}: {err}")
@@ -0,0 +1,153 @@
+import json
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+import grpc
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+客户端 channel 池
+    同一个进程中连接同一个服务端的 RemoteTclProcessPopen（包括多个 VivadoPrj(server_addr=...)）共享一个 channel，
+    不再每次 open 都重新建立连接；会话通过 metadata 区分，和 channel 无关
+    channel 按引用计数，最后一个使用者释放后再保留 linger 秒，之后关闭，短时间内重新打开的不需要重新连接
+    HTTP/2 keepalive 每 KeepaliveTime 发送一次 ping，连接被 NAT / 防火墙静默断开时在 KeepaliveTimeout 内发现，
+    而不是等到下一条命令超时；服务端需要允许这个频率的 ping，见 ServerOptions
+    幂等的 rpc 在 UNAVAILABLE / RESOURCE_EXHAUSTED 时由 grpc 按 retryPolicy 重试，
+    服务端准入控制返回的 grpc-retry-pushback-ms 会替代退避时间；tcl、open_session、上传不重试，避免重复执行
+"""
+
+ServiceName = "remote_tcl.RemoteTcl"
+
+# ms
+KeepaliveTime = 30000
+KeepaliveTimeout = 10000
+
+# 可以安全重试的 rpc：只读或重复执行结果相同
+IdempotentRpcs = ("encodings", "keepalive", "close_session", "server_stats", "has_blobs", "link_blobs",
+                  "dir_manifest", "block_digests", "remove_files", "get_file", "get_file_stream")
+
+RetryPolicy = {
+    "maxAttempts": 4,
+    "initialBackoff": "0.2s",
+    "maxBackoff": "5s",
+    "backoffMultiplier": 2,
+    "retryableStatusCodes": ["UNAVAILABLE", "RESOURCE_EXHAUSTED"],
+}
+
+# 没有超时参数的控制类 rpc（会话、统计、压缩协商）的 deadline, sec
+ControlDeadline = 30.0
+# 命令超时之外的余量，覆盖服务端排队（准入控制的 max_wait）和网络传输, sec
+DeadlineMargin = 60.0
+
+# 服务端允许客户端 keepalive 的频率，需小于 KeepaliveTime
+ServerOptions = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_recv_ping_interval_without_data_ms", KeepaliveTime // 3),
+    ("grpc.http2.max_ping_strikes", 0),
+]  # type: List[Tuple[str, int]]
+
+
+def service_config() -> str:
+    return json.dumps({
+        "methodConfig": [{
+            "name": [{"service": ServiceName, "method": method} for method in IdempotentRpcs],
+            "retryPolicy": RetryPolicy,
+        }],
+    })
+
+
+def channel_options() -> List[Tuple[str, object]]:
+    return [
+        ("grpc.keepalive_time_ms", KeepaliveTime),
+        ("grpc.keepalive_timeout_ms", KeepaliveTimeout),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        ("grpc.enable_retries", 1),
+        ("grpc.service_config", service_config()),
+    ]
+
+
+def call_deadline(timeout: float = None, margin: float = DeadlineMargin):
+    """
+    :param timeout: 命令或传输的超时, sec，0 / None 为不限制
+    :return: grpc 的 timeout 参数，不限制时为 None
+    """
+    return timeout + margin if timeout else None
+
+
+class ChannelPool:
+    """
+    :param linger: 引用计数为 0 后 channel 保留的时间, sec，0 为立即关闭
+    :param options: grpc channel 参数，默认为 channel_options()
+    """
+
+    def __init__(self, linger: float = 60.0, options: List[Tuple[str, object]] = None):
+        self.linger = linger
+        self.options = options if options is not None else channel_options()
+        self._channels = {}  # type: Dict[str, List]   # address: [channel, refs, timer]
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<ChannelPool {self.snapshot()}>"
+
+    def acquire(self, ip: str, port: int) -> grpc.Channel:
+        address = f"{ip}:{int(port)}"
+        with self._lock:
+            entry = self._channels.get(address)
+            if entry is None:
+                entry = [grpc.insecure_channel(address, options=self.options), 0, None]
+                self._channels[address] = entry
+                logger.info(f"channel pool open {address}")
+            elif entry[2] is not None:
+                entry[2].cancel()
+                entry[2] = None
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, ip: str, port: int) -> None:
+        address = f"{ip}:{int(port)}"
+        with self._lock:
+            entry = self._channels.get(address)
+            if entry is None or entry[1] <= 0:
+                return
+            entry[1] -= 1
+            if entry[1]:
+                return
+            if self.linger <= 0:
+                del self._channels[address]
+            else:
+                entry[2] = threading.Timer(self.linger, self._expire, args=(address, entry))
+                entry[2].daemon = True
+                entry[2].start()
+                return
+        self._close(address, entry[0])
+
+    def _expire(self, address: str, entry: list) -> None:
+        with self._lock:
+            if self._channels.get(address) is not entry or entry[1]:
+                return
+            del self._channels[address]
+        self._close(address, entry[0])
+
+    @staticmethod
+    def _close(address: str, channel: grpc.Channel) -> None:
+        logger.info(f"channel pool close {address}")
+        channel.close()
+
+    def snapshot(self) -> Dict[str, int]:
+        """ :return: {address: 引用计数} """
+        with self._lock:
+            return {address: entry[1] for address, entry in self._channels.items()}
+
+    def close_all(self) -> None:
+        with self._lock:
+            channels, self._channels = self._channels, {}
+        for address, entry in channels.items():
+            if entry[2] is not None:
+                entry[2].cancel()
+            self._close(address, entry[0])
+
+
+default_pool = ChannelPool()
@@ -0,0 +1,184 @@
+import io
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+文件块和 tcl 输出的压缩
+    协商: 客户端先用 encodings rpc 取得双方都支持的编码，之后每个请求带 accept_encoding，
+          发送方按大小和文件类型为每个流选择编码，每个块单独压缩，块的 encoding 为空时是原始数据
+    zlib 总是可用，安装了 zstandard / lz4 时同时支持 zstd / lz4
+    一个流的第一个块压缩后没有明显变小时，之后的块不再压缩
+    解压时限制输出大小，超过限制的块直接拒绝，不会先完整解压到内存
+"""
+
+# 小于该大小的输出 / 文件不压缩
+CompressMinSize = 4096
+# 压缩后不小于原大小的该比例时视为不可压缩
+CompressMinRatio = 0.9
+# 已经压缩过的文件类型，dcp 是 zip
+IncompressibleExts = (".dcp", ".zip", ".gz", ".tgz", ".xz", ".bz2", ".zst", ".lz4", ".7z", ".jar",
+                      ".png", ".jpg", ".jpeg")
+
+# 解压后的默认上限，tcl 输出整体作为一个块，文件块由调用方传入块大小的上限
+MaxDecodedSize = 256 << 20
+
+
+def _zlib_decompress(data: bytes, max_size: int) -> bytes:
+    d = zlib.decompressobj()
+    out = d.decompress(data, max_size)
+    if d.unconsumed_tail:
+        raise ValueError(f"zlib chunk exceeds {max_size} bytes")
+    if not d.eof:
+        raise ValueError("truncated zlib chunk")
+    return out
+
+
+# encoding: (compress(data), decompress(data, max_size))
+_Codecs = {
+    "zlib": (lambda data: zlib.compress(data, 6), _zlib_decompress),
+}  # type: Dict[str, Tuple]
+
+try:
+    import zstandard
+
+    def _zstd_decompress(data: bytes, max_size: int) -> bytes:
+        # 帧头中的 content size 由发送方填写，不可信，按流读取并截断
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            out = reader.read(max_size + 1)
+        if len(out) > max_size:
+            raise ValueError(f"zstd chunk exceeds {max_size} bytes")
+        return out
+
+    _Codecs["zstd"] = (lambda data: zstandard.ZstdCompressor(level=3).compress(data), _zstd_decompress)
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+
+    def _lz4_decompress(data: bytes, max_size: int) -> bytes:
+        d = lz4.frame.LZ4FrameDecompressor()
+        out = d.decompress(data, max_length=max_size + 1)
+        if len(out) > max_size:
+            raise ValueError(f"lz4 chunk exceeds {max_size} bytes")
+        if not d.eof:
+            raise ValueError("truncated lz4 chunk")
+        return out
+
+    _Codecs["lz4"] = (lz4.frame.compress, _lz4_decompress)
+except ImportError:
+    pass
+
+# 优先级，带宽受限时压缩率优先
+EncodingPreference = ("zstd", "zlib", "lz4")
+
+
+def available_encodings() -> List[str]:
+    return [name for name in EncodingPreference if name in _Codecs]
+
+
+def negotiate(offered: Iterable[str]) -> List[str]:
+    """ 对方支持的编码中本机也支持的，按本机优先级排序 """
+    offered = set(offered)
+    return [name for name in available_encodings() if name in offered]
+
+
+def choose_encoding(accept: Iterable[str], size: int, name: str = "") -> str:
+    """ :return: 编码，为空时不压缩 """
+    if size < CompressMinSize or name.lower().endswith(IncompressibleExts):
+        return ""
+    accept = negotiate(accept)
+    return accept[0] if accept else ""
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    return _Codecs[encoding][0](data) if encoding else data
+
+
+def decompress(encoding: str, data: bytes, max_size: int = MaxDecodedSize) -> bytes:
+    """ :param max_size: 解压后的上限，超过时抛出 ValueError """
+    if not encoding:
+        if len(data) > max_size:
+            raise ValueError(f"chunk exceeds {max_size} bytes")
+        return data
+    if encoding not in _Codecs:
+        raise ValueError(f"unsupported encoding: {encoding}")
+    return _Codecs[encoding][1](data, max_size)
+
+
+class CompressionStats:
+    """ 按方向和编码统计原始字节数和实际传输的字节数 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # type: Dict[Tuple[str, str], List[int]]
+
+    def __repr__(self):
+        return f"<CompressionStats raw: {self.raw_bytes}, wire: {self.wire_bytes}, saved: {self.saved_bytes}>"
+
+    def record(self, direction: str, encoding: str, raw: int, wire: int) -> None:
+        """ :param direction: send / recv """
+        with self._lock:
+            counter = self._counters.setdefault((direction, encoding if encoding else "identity"), [0, 0, 0])
+            counter[0] += raw
+            counter[1] += wire
+            counter[2] += 1
+
+    @property
+    def raw_bytes(self) -> int:
+        with self._lock:
+            return sum(c[0] for c in self._counters.values())
+
+    @property
+    def wire_bytes(self) -> int:
+        with self._lock:
+            return sum(c[1] for c in self._counters.values())
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.raw_bytes - self.wire_bytes
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """ {"send/zlib": {"raw", "wire", "saved", "count"}} """
+        with self._lock:
+            return {f"{d}/{e}": {"raw": c[0], "wire": c[1], "saved": c[0] - c[1], "count": c[2]}
+                    for (d, e), c in sorted(self._counters.items())}
+
+
+class ChunkEncoder:
+    """
+    一个流的压缩，每个块单独压缩，第一个块不可压缩时之后不再尝试
+    :param encoding: choose_encoding 的结果
+    """
+
+    def __init__(self, encoding: str, stats: CompressionStats = None):
+        self.encoding = encoding
+        self.stats = stats
+
+    def encode(self, data: bytes) -> Tuple[str, bytes]:
+        encoding = self.encoding
+        payload = compress(encoding, data) if encoding and data else data
+        if encoding and len(payload) >= len(data) * CompressMinRatio:
+            logger.debug(f"{encoding} ratio {len(payload) / max(len(data), 1):.2f}, stop compressing stream")
+            encoding, payload, self.encoding = "", data, ""
+        if self.stats is not None:
+            self.stats.record("send", encoding, len(data), len(payload))
+        return encoding, payload
+
+
+def decode_chunk(encoding: str, payload: bytes, stats: CompressionStats = None,
+                 max_size: int = MaxDecodedSize) -> bytes:
+    data = decompress(encoding, payload, max_size)
+    if stats is not None:
+        stats.record("recv", encoding, len(data), len(payload))
+    return data
+
+
+def file_encoding(accept: Iterable[str], path: str) -> str:
+    """ 按文件大小和扩展名选择编码 """
+    return choose_encoding(accept, os.path.getsize(path), path)
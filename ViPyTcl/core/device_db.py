@@ -0,0 +1,252 @@
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .tcl_lib import WriteObjsTcl
+from ..utils.columnar import StringTable, encode_column, build_csr, save_npz, load_npz
+
+logger = logging.getLogger("ViPyTcl")
+
+DeviceDBVersion = 1
+DefaultDeviceDBRoot = os.path.join(os.path.expanduser("~"), ".ViPyTcl", "device_db")
+
+r"""
+vivado 端导出器件数据的脚本，每个对象一行，tab 分隔:
+    T   tile    type    grid_x  grid_y
+    S   site    type    rpm_x   rpm_y
+    B   bel     type
+    TS  tile    <sites...>
+    SP  site_pin            (with_pins)
+    BP  bel_pin             (with_pins)
+    bel / site_pin / bel_pin 的从属关系由名字的 "/" 层级得出, 不需要额外查询
+"""
+ExportDeviceTcl = WriteObjsTcl + r"""
+proc ::vipytcl::export_device {path with_pins} {
+    set fh [open $path w]
+    fconfigure $fh -encoding utf-8 -translation lf
+
+    set tiles [get_tiles -quiet]
+    ::vipytcl::write_objs $fh T $tiles [list] {TYPE GRID_POINT_X GRID_POINT_Y}
+    ::vipytcl::write_objs $fh S [get_sites -quiet] [list] {SITE_TYPE RPM_X RPM_Y}
+    ::vipytcl::write_objs $fh B [get_bels -quiet] [list] {TYPE}
+
+    foreach tile $tiles {
+        set sites [get_sites -quiet -of_objects $tile]
+        if {[llength $sites]} { puts $fh [join [concat TS $tile $sites] "\t"] }
+    }
+
+    if {$with_pins} {
+        foreach pin [get_site_pins -quiet] { puts $fh "SP\t$pin" }
+        foreach pin [get_bel_pins -quiet] { puts $fh "BP\t$pin" }
+    }
+    close $fh
+    return $path
+}
+"""
+
+DeviceKinds = ("tiles", "sites", "bels", "site_pins", "bel_pins")
+
+ViObjTclToDeviceKind = {
+    "get_tiles": "tiles",
+    "get_sites": "sites",
+    "get_bels": "bels",
+    "get_site_pins": "site_pins",
+    "get_bel_pins": "bel_pins",
+}
+
+
+def device_db_path(part: str, version: str, root: str = "") -> str:
+    """ 数据库按 vivado 版本和器件型号保存: <root>/<version>/<part>.npz """
+    root = root if root else DefaultDeviceDBRoot
+    part, version = re.sub(r"[^\w.\-]", "_", part), re.sub(r"[^\w.\-]", "_", version)
+    return os.path.join(root, version, f"{part}.npz")
+
+
+def _int_or(value: str, default: int = -1) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _parent_index(names: Iterable[str], parents: StringTable) -> np.ndarray:
+    """ 由 'parent/child' 形式的名字得到 parent 下标 """
+    return np.fromiter((parents.get(name.rpartition("/")[0]) for name in names), dtype=np.int32)
+
+
+def parse_device_dump(lines: Iterable[str], part: str, version: str) -> 'DeviceDB':
+    tiles, tile_types, tile_x, tile_y = [], [], [], []
+    sites, site_types, site_x, site_y = [], [], [], []
+    bels, bel_types = [], []
+    site_pins, bel_pins = [], []
+    tile_sites = []
+
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        fields += [""] * (5 - len(fields))
+        tag = fields[0]
+        if tag == "T":
+            tiles.append(fields[1])
+            tile_types.append(fields[2])
+            tile_x.append(_int_or(fields[3]))
+            tile_y.append(_int_or(fields[4]))
+        elif tag == "S":
+            sites.append(fields[1])
+            site_types.append(fields[2])
+            site_x.append(_int_or(fields[3]))
+            site_y.append(_int_or(fields[4]))
+        elif tag == "B":
+            bels.append(fields[1])
+            bel_types.append(fields[2])
+        elif tag == "TS":
+            tile_sites.append((fields[1], [f for f in fields[2:] if f]))
+        elif tag == "SP":
+            site_pins.append(fields[1])
+        elif tag == "BP":
+            bel_pins.append(fields[1])
+
+    arrays = {"version": np.array([DeviceDBVersion], dtype=np.int32),
+              "with_pins": np.array([bool(site_pins or bel_pins)])}
+    tables = {}
+    for kind, names in (("tiles", tiles), ("sites", sites), ("bels", bels),
+                        ("site_pins", site_pins), ("bel_pins", bel_pins)):
+        tables[kind] = StringTable.from_strings(names)
+        arrays.update(tables[kind].to_arrays(f"{kind}_names"))
+
+    for kind, types in (("tiles", tile_types), ("sites", site_types), ("bels", bel_types)):
+        type_table, codes = encode_column(types)
+        arrays.update(type_table.to_arrays(f"{kind}_types"))
+        arrays[f"{kind}_type_codes"] = codes
+
+    arrays["tiles_x"], arrays["tiles_y"] = np.array(tile_x, dtype=np.int32), np.array(tile_y, dtype=np.int32)
+    arrays["sites_x"], arrays["sites_y"] = np.array(site_x, dtype=np.int32), np.array(site_y, dtype=np.int32)
+
+    site_tile = np.full(len(sites), -1, dtype=np.int32)
+    for tile, members in tile_sites:
+        t = tables["tiles"].get(tile)
+        for site in members:
+            s = tables["sites"].get(site)
+            if s >= 0:
+                site_tile[s] = t
+    arrays["sites_parent"] = site_tile
+    arrays["bels_parent"] = _parent_index(bels, tables["sites"])
+    arrays["site_pins_parent"] = _parent_index(site_pins, tables["sites"])
+    arrays["bel_pins_parent"] = _parent_index(bel_pins, tables["bels"])
+
+    for child, parent in (("sites", "tiles"), ("bels", "sites"), ("site_pins", "sites"), ("bel_pins", "bels")):
+        rows = arrays[f"{child}_parent"]
+        valid = np.flatnonzero(rows >= 0)
+        arrays[f"{parent}_{child}_indptr"], arrays[f"{parent}_{child}_indices"] = build_csr(
+            rows[valid], valid, len(tables[parent]))
+
+    return DeviceDB(arrays, part, version)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """ vivado 的通配符只有 * 和 ?，其余字符（包括 []）按字面匹配 """
+    return "".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern)
+
+
+class DeviceDB:
+    """
+    单个器件的 tile / site / bel / site_pin / bel_pin 数据库
+        名字、类型、坐标以及 tile -> site -> bel -> bel_pin、site -> site_pin 的从属关系
+        以不压缩的 .npz 保存并 mmap 加载，同一台机器上的多个进程共享一份 page cache
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], part: str = "", version: str = ""):
+        self.arrays = arrays
+        self.part = part
+        self.version = version
+        self.with_pins = bool(arrays["with_pins"][0])
+        self.names = {kind: StringTable.from_arrays(arrays, f"{kind}_names") for kind in DeviceKinds}
+        self.types = {kind: StringTable.from_arrays(arrays, f"{kind}_types") for kind in ("tiles", "sites", "bels")}
+
+    def __repr__(self):
+        counts = ", ".join(f"{kind}: {len(names)}" for kind, names in self.names.items())
+        return f"<DeviceDB {self.part} {self.version} {counts}>"
+
+    @classmethod
+    def load(cls, path: str, part: str = "", version: str = "", mmap: bool = True) -> 'DeviceDB':
+        arrays = load_npz(path, mmap=mmap)
+        if int(arrays["version"][0]) != DeviceDBVersion:
+            raise ValueError(f"device db version dont match: {int(arrays['version'][0])}, expect {DeviceDBVersion}")
+        return cls(arrays, part, version)
+
+    @classmethod
+    def open(cls, part: str, version: str, root: str = "") -> Optional['DeviceDB']:
+        """ 按 part 和 vivado 版本打开已有的数据库，不存在时返回 None """
+        path = device_db_path(part, version, root)
+        if not os.path.isfile(path):
+            return None
+        return cls.load(path, part, version)
+
+    def save(self, root: str = "") -> str:
+        path = device_db_path(self.part, self.version, root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return save_npz(path, self.arrays)
+
+    def has(self, kind: str) -> bool:
+        return kind in ("tiles", "sites", "bels") or self.with_pins
+
+    def get_type(self, kind: str, name: str) -> str:
+        i = self.names[kind].index(name)
+        return self.types[kind][int(self.arrays[f"{kind}_type_codes"][i])]
+
+    def get_coord(self, kind: str, name: str):
+        """ tile 为 (GRID_POINT_X, GRID_POINT_Y)，site 为 (RPM_X, RPM_Y) """
+        i = self.names[kind].index(name)
+        return int(self.arrays[f"{kind}_x"][i]), int(self.arrays[f"{kind}_y"][i])
+
+    def _related(self, kind: str, of_kind: str, of_index: np.ndarray) -> np.ndarray:
+        """ of_kind 对象集合相关的 kind 对象下标，支持上下两个方向的从属关系 """
+        if kind == of_kind:
+            return of_index
+
+        key = f"{of_kind}_{kind}_indptr"
+        if key in self.arrays:
+            indptr, indices = self.arrays[key], self.arrays[f"{of_kind}_{kind}_indices"]
+            return np.unique(np.concatenate(
+                [np.asarray(indices[indptr[i]:indptr[i + 1]]) for i in of_index] or [np.zeros(0, np.int32)]))
+
+        if f"{kind}_{of_kind}_indptr" in self.arrays:
+            parent = self.arrays[f"{of_kind}_parent"]
+            result = np.unique(np.asarray(parent)[of_index])
+            return result[result >= 0]
+
+        # tile <-> bel 等跨级关系经过中间层逐级展开, site_pin 只和 site 直接相关
+        chain = ("tiles", "sites", "bels", "bel_pins")
+        if "site_pins" in (kind, of_kind):
+            mid = "sites"
+        else:
+            step = 1 if chain.index(kind) > chain.index(of_kind) else -1
+            mid = chain[chain.index(of_kind) + step]
+        return self._related(kind, mid, self._related(mid, of_kind, of_index))
+
+    def query(self, kind: str, pattern: str = "*", regexp: bool = False, nocase: bool = False,
+              of_kind: str = "", of_names: Iterable[str] = ()) -> List[str]:
+        """
+        本地模拟 get_tiles / get_sites / get_bels / get_site_pins / get_bel_pins
+        :param kind: DeviceKinds 之一
+        :param pattern: 以空格分隔的多个 vivado 通配符或正则
+        :param of_kind: -of_objects 的对象种类
+        :param of_names: -of_objects 的对象名
+        """
+        names = self.names[kind]
+        if of_kind:
+            of_table = self.names[of_kind]
+            of_index = np.array([of_table.index(n) for n in of_names], dtype=np.int64)
+            candidates = self._related(kind, of_kind, of_index)
+        else:
+            candidates = range(len(names))
+
+        patterns = pattern.split() if pattern else ["*"]
+        if not regexp and patterns == ["*"]:
+            return [names[int(i)] for i in candidates]
+
+        flags = re.IGNORECASE if nocase else 0
+        matcher = re.compile("|".join(f"(?:{p if regexp else _glob_to_regex(p)})" for p in patterns), flags)
+        return [name for name in (names[int(i)] for i in candidates) if matcher.fullmatch(name)]
@@ -0,0 +1,313 @@
+import fnmatch
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+本机目录和服务端目录的增量同步
+    1. 两端各自生成清单 {相对路径: (size, mtime, sha256)}，摘要按 (path, size, mtime_ns) 缓存，未改变的文件不重新读取
+    2. sha256 相同的文件跳过
+    3. put: 服务端已有相同内容（blob）的只链接；服务端旧文件较大时按块比较，只发送改变的块；其余上传 blob
+       get: 改变的文件分块下载
+    4. 多个文件在同一个 channel 上并发传输
+    5. delete=True 时删除目标目录中多余的文件
+块比较使用固定大小的块，块摘要为 blake2b-128，适合原地修改和追加，插入会使之后的块都不匹配
+"""
+
+DefaultBlockSize = 64 * 1024
+# 小于该大小的文件直接上传，不做块比较
+DeltaMinSize = 1024 * 1024
+# 传输中的临时文件，不出现在清单中
+TempSuffixes = (".part", ".link")
+
+
+def block_digests(path: str, block_size: int = DefaultBlockSize) -> List[bytes]:
+    digests = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digests.append(hashlib.blake2b(block, digest_size=16).digest())
+    return digests
+
+
+def excluded(rel: str, exclude: Sequence[str]) -> bool:
+    """ 相对路径或其中任意一级名字匹配 exclude 中的 glob """
+    parts = rel.split("/")
+    return any(fnmatch.fnmatch(rel, p) or any(fnmatch.fnmatch(part, p) for part in parts) for p in exclude)
+
+
+def walk_files(root: str, exclude: Sequence[str] = ()) -> Iterator[Tuple[str, str]]:
+    """ :return: (相对路径, 绝对路径)，相对路径以 / 分隔 """
+    for folder, dirs, names in os.walk(root):
+        rel_dir = os.path.relpath(folder, root).replace("\\", "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        dirs[:] = [d for d in dirs if not excluded(rel_dir + d, exclude)]
+        for name in names:
+            rel = rel_dir + name
+            if name.endswith(TempSuffixes) or excluded(rel, exclude):
+                continue
+            yield rel, os.path.join(folder, name)
+
+
+class ManifestEntry:
+    def __init__(self, path: str, size: int, mtime: float, sha256: str):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.sha256 = sha256
+
+    def __repr__(self):
+        return f"<ManifestEntry {self.path} {self.size} {self.sha256[:12]}>"
+
+
+def build_manifest(root: str, digest: Callable[[str], str], exclude: Sequence[str] = (),
+                   paths: Iterable[str] = ()) -> Dict[str, ManifestEntry]:
+    """
+    :param digest: digest(path) -> sha256，由调用方缓存
+    :param paths: 不为空时只列出这些相对路径，不存在的跳过
+    """
+    if paths:
+        files = [(rel, os.path.join(root, *rel.split("/"))) for rel in paths]
+        files = [(rel, path) for rel, path in files if os.path.isfile(path)]
+    else:
+        files = walk_files(root, exclude)
+    manifest = {}
+    for rel, path in files:
+        stat = os.stat(path)
+        manifest[rel] = ManifestEntry(rel, stat.st_size, stat.st_mtime, digest(path))
+    return manifest
+
+
+def diff_manifest(src: Dict[str, ManifestEntry], dst: Dict[str, ManifestEntry],
+                  exclude: Sequence[str] = ()) -> Tuple[List[str], List[str], int]:
+    """ :return: (需要传输的, dst 中多余的, 相同的文件数) """
+    changed = [rel for rel, e in sorted(src.items()) if rel not in dst or dst[rel].sha256 != e.sha256]
+    extra = [rel for rel in sorted(dst) if rel not in src and not excluded(rel, exclude)]
+    return changed, extra, len(src) - len(changed)
+
+
+class SyncResult:
+    """
+    files: 源目录的文件数
+    unchanged / linked / uploaded / delta / downloaded / deleted: 文件数
+    sent: 实际发送的文件内容字节数（压缩前），saved: 因为块比较而没有发送的字节数
+    """
+
+    def __init__(self, src: str, dst: str, direction: str):
+        self.src = src
+        self.dst = dst
+        self.direction = direction
+        self.files = 0
+        self.unchanged = 0
+        self.linked = 0
+        self.uploaded = 0
+        self.delta = 0
+        self.downloaded = 0
+        self.deleted = 0
+        self.sent = 0
+        self.saved = 0
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (f"<SyncResult {self.direction} {self.src} -> {self.dst} files: {self.files}, "
+                f"unchanged: {self.unchanged}, linked: {self.linked}, uploaded: {self.uploaded}, "
+                f"delta: {self.delta}, downloaded: {self.downloaded}, deleted: {self.deleted}, "
+                f"sent: {self.sent}, saved: {self.saved}, {self.elapsed:.2f} s>")
+
+
+class DirSync:
+    """
+    :param proc: RemoteTclProcessPopen
+    :param src: put 时为本机目录，get 时为服务端目录
+    :param dst: put 时为服务端目录（相对路径时在该客户端的缓存目录下），get 时为本机目录
+    :param direction: put / get
+    :param delete: 删除 dst 中 src 没有的文件
+    :param exclude: 不同步的 glob，匹配相对路径或其中任意一级名字
+    :param workers: 并发传输的文件数
+    :param progress: progress(done_files, total_files)
+    """
+
+    def __init__(self, proc, src: str, dst: str, direction: str = "put", delete: bool = False,
+                 exclude: Sequence[str] = (), workers: int = 8, block_size: int = DefaultBlockSize, progress=None):
+        if direction not in ("put", "get"):
+            raise ValueError(f"direction must be put or get: {direction}")
+        self.proc = proc
+        self.src = str(src)
+        self.dst = str(dst)
+        self.direction = direction
+        self.delete = delete
+        self.exclude = tuple(exclude)
+        self.workers = max(1, workers)
+        self.block_size = block_size
+        self.progress = progress
+        self.result = SyncResult(self.src, self.dst, direction)
+        self._lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+
+    def __repr__(self):
+        return f"<DirSync {self.direction} {self.src} -> {self.dst}>"
+
+    def _step(self, n: int = 1, **counts) -> None:
+        with self._lock:
+            self._done += n
+            for name, value in counts.items():
+                setattr(self.result, name, getattr(self.result, name) + value)
+            done = self._done
+        if self.progress:
+            self.progress(done, self._total)
+
+    def _local_manifest(self, root: str) -> Dict[str, ManifestEntry]:
+        if not os.path.isdir(root):
+            return {}
+        return build_manifest(root, self.proc.local_digest, self.exclude)
+
+    def _remote_manifest(self, root: str, missing_ok: bool = True) -> Tuple[str, Dict[str, ManifestEntry]]:
+        # 旧版本的服务端不支持 exclude，返回的清单在本机再过滤一次
+        remote_root, remote = self.proc.remote_manifest(root, missing_ok=missing_ok, exclude=self.exclude)
+        return remote_root, {rel: e for rel, e in remote.items() if not excluded(rel, self.exclude)}
+
+    def run(self) -> SyncResult:
+        start = time.time()
+        if self.direction == "put":
+            self._put()
+        else:
+            self._get()
+        self.result.elapsed = time.time() - start
+        logger.info(f"{self.result}")
+        return self.result
+
+    def _put(self) -> None:
+        if not os.path.isdir(self.src):
+            raise FileNotFoundError(self.src)
+        local = self._local_manifest(self.src)
+        remote_root, remote = self._remote_manifest(self.dst)
+        self.result.dst = remote_root
+        changed, extra, self.result.unchanged = diff_manifest(local, remote, self.exclude)
+        self.result.files = len(local)
+        self._total = len(changed)
+        logger.info(f"sync put {self.src} -> {remote_root}, files: {len(local)}, changed: {len(changed)}, "
+                    f"extra: {len(extra)}")
+
+        # 服务端旧文件够大时按块比较，其余通过 blob 上传或链接
+        delta = [rel for rel in changed if rel in remote and remote[rel].size >= DeltaMinSize
+                 and local[rel].size >= DeltaMinSize]
+        present = self.proc.present_blobs([os.path.join(self.src, rel) for rel in delta])
+        delta = [rel for rel in delta if local[rel].sha256 not in present]
+        blobs = [rel for rel in changed if rel not in set(delta)]
+
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="vipytcl_sync") as executor:
+            futures = [executor.submit(self._put_delta, rel, f"{remote_root}/{rel}") for rel in delta]
+            if blobs:
+                files = [(os.path.join(self.src, rel), f"{remote_root}/{rel}") for rel in blobs]
+                _, uploaded, sent = self.proc._put_blobs(files, executor=executor)
+                self._step(len(blobs), linked=len(blobs) - uploaded, uploaded=uploaded, sent=sent)
+            for future in futures:
+                future.result()
+
+        if self.delete and extra:
+            self.proc.remove_remote_files(remote_root, extra)
+            self.result.deleted = len(extra)
+
+    def _put_delta(self, rel: str, remote_path: str) -> None:
+        local_path = os.path.join(self.src, rel)
+        sent = self.proc.grpc_put_delta(local_path, remote_path, self.block_size)
+        self._step(delta=1, sent=sent, saved=os.path.getsize(local_path) - sent)
+
+    def _get(self) -> None:
+        remote_root, remote = self._remote_manifest(self.src, missing_ok=False)
+        self.result.src = remote_root
+        local = self._local_manifest(self.dst)
+        changed, extra, self.result.unchanged = diff_manifest(remote, local, self.exclude)
+        self.result.files = len(remote)
+        self._total = len(changed)
+        logger.info(f"sync get {self.dst} <- {remote_root}, files: {len(remote)}, changed: {len(changed)}, "
+                    f"extra: {len(extra)}")
+
+        def get(rel: str):
+            dst = os.path.join(self.dst, *rel.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            self.proc.grpc_get_file(f"{remote_root}/{rel}", dst)
+            self._step(downloaded=1, sent=remote[rel].size)
+
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="vipytcl_sync") as executor:
+            for future in [executor.submit(get, rel) for rel in changed]:
+                future.result()
+
+        if self.delete:
+            for rel in extra:
+                os.remove(os.path.join(self.dst, *rel.split("/")))
+            self.result.deleted = len(extra)
+
+
+def sync_local_dir(src: str, dst: str, delete: bool = False, exclude: Sequence[str] = (),
+                   digest: Callable[[str], str] = None) -> SyncResult:
+    """ 本地工程的同步，只复制改变的文件 """
+    from ..utils.tools import file_digest
+    digest = digest if digest else file_digest
+    start = time.time()
+    result = SyncResult(src, dst, "put")
+    src_manifest = build_manifest(src, digest, exclude)
+    dst_manifest = build_manifest(dst, digest, exclude) if os.path.isdir(dst) else {}
+    changed, extra, result.unchanged = diff_manifest(src_manifest, dst_manifest, exclude)
+    result.files = len(src_manifest)
+    for rel in changed:
+        path = os.path.join(dst, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy2(os.path.join(src, *rel.split("/")), path)
+        result.uploaded += 1
+        result.sent += src_manifest[rel].size
+    if delete:
+        for rel in extra:
+            os.remove(os.path.join(dst, *rel.split("/")))
+        result.deleted = len(extra)
+    result.elapsed = time.time() - start
+    return result
+
+
+def iter_delta(path: str, remote_digests: List[bytes], block_size: int, chunk_size: int,
+               sha=None) -> Iterable[Tuple[int, int, bytes]]:
+    """
+    与服务端旧文件按块比较
+    :param sha: 读取时同时更新的整个文件的摘要
+    :return: (offset, copy_length, data)，copy_length > 0 时从旧文件复制，否则发送 data
+    """
+    offset = 0
+    copy_start, copy_length = 0, 0
+    pending_start, pending = 0, bytearray()
+    with open(path, "rb") as f:
+        index = 0
+        for block in iter(lambda: f.read(block_size), b""):
+            if sha is not None:
+                sha.update(block)
+            same = index < len(remote_digests) and \
+                hashlib.blake2b(block, digest_size=16).digest() == remote_digests[index]
+            if same:
+                if pending:
+                    yield pending_start, 0, bytes(pending)
+                    pending = bytearray()
+                if not copy_length:
+                    copy_start = offset
+                copy_length += len(block)
+            else:
+                if copy_length:
+                    yield copy_start, copy_length, b""
+                    copy_length = 0
+                if not pending:
+                    pending_start = offset
+                pending += block
+                if len(pending) >= chunk_size:
+                    yield pending_start, 0, bytes(pending)
+                    pending = bytearray()
+            offset += len(block)
+            index += 1
+    if copy_length:
+        yield copy_start, copy_length, b""
+    if pending:
+        yield pending_start, 0, bytes(pending)
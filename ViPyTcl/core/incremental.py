@@ -0,0 +1,68 @@
+import math
+from typing import Dict, Iterable
+
+from .utilization_report import parse_utilization_report
+
+r"""
+增量实现
+    每个 impl run 最近一次成功的 routed DCP 复制到 vivado 端工程目录下的 .vipytcl_incremental/<run>/，
+    下一次运行前设置为该 run 的 INCREMENTAL_CHECKPOINT
+    复用率来自 run 目录中 report_incremental_reuse 的报告（*_incremental_reuse_routed.rpt）的 Reuse Summary 表
+"""
+
+IncrementalDirName = ".vipytcl_incremental"
+RoutedDcpPattern = "*_routed.dcp"
+ReuseReportPatterns = ("*_incremental_reuse_routed.rpt", "*_incremental_reuse_pre_placed.rpt")
+TimingSummaryPatterns = ("*_timing_summary_routed.rpt",)
+
+
+def parse_reuse_report(lines: Iterable[str]) -> Dict[str, float]:
+    """
+    :return: {"Cells": 97.38, "Nets": 96.91, "Pins": 97.2, "Ports": 100.0}，即 Reuse % (of Total) 列
+    """
+    report = parse_utilization_report(lines)
+    try:
+        table = report.table("Reuse Summary")
+    except KeyError:
+        return {}
+
+    column = next((c for c in table.columns if c.startswith("Reuse")), "")
+    if not column or "Type" not in table.columns:
+        return {}
+    result = {}
+    for name, value in zip(table["Type"], table[column]):
+        try:
+            result[str(name)] = float(value)
+        except ValueError:
+            result[str(name)] = math.nan
+    return result
+
+
+class IncrementalResult:
+    """
+    一次增量实现的结果
+        reference: 本次使用的参考 DCP，为空表示没有参考，按完整流程运行
+        reuse: {"Cells": %, "Nets": %, ...}
+        fell_back: 带参考运行失败后去掉参考重新运行
+        poor_reuse: cell 复用率低于 min_reuse，复用报告缺失（复用率为 nan）时为 False
+        updated: 本次结果是否成为下一次的参考
+    """
+
+    def __init__(self, run: str, reference: str = ""):
+        self.run = run
+        self.reference = reference
+        self.reuse = {}  # type: Dict[str, float]
+        self.wns = math.nan
+        self.status = ""
+        self.fell_back = False
+        self.poor_reuse = False
+        self.updated = False
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (f"<IncrementalResult {self.run} reference: {bool(self.reference)}, "
+                f"cell reuse: {self.cell_reuse:.1f}%, WNS: {self.wns}, fell_back: {self.fell_back}>")
+
+    @property
+    def cell_reuse(self) -> float:
+        return self.reuse.get("Cells", math.nan)
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterable, List
+
+from .build_cache import select_outputs
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+生成 IP 的 output products 并并行运行 OOC synth run，和 vivado 界面中 Out of context per IP 的流程相同
+    1. 一次 tcl 调用取得全部 IP 的 IPDEF、是否 OOC、CONFIG.* 属性，计算配置 hash
+    2. 在工程中逐个 generate_target，已是最新的 target 不会重新生成；
+       IP 目录由工程管理，不在其它解释器中生成，避免和工程同时写入
+    3. 工程中 OOC synth run 已完成且不需要刷新的 IP 不重新综合，结果不在构建缓存中时写入缓存
+       配置 hash 在构建缓存中命中的 OOC IP 恢复 run 目录（包括 run 状态标记）和 IP 目录下的 DCP / stub，
+       恢复后 run 的 STATUS 不是完成时照常综合
+    4. 其余 OOC synth run 一次 launch_runs -jobs，并行数受核数和内存限制，完成后写入构建缓存
+IP 信息每项一行，tab 分隔:
+    V   version     part
+    I   ip  xci     IPDEF   GENERATE_SYNTH_CHECKPOINT   IS_LOCKED   synth run
+    C   ip  property    value
+"""
+
+IPInfoTcl = r"""
+namespace eval ::vipytcl {}
+
+proc ::vipytcl::ip_info {xcis} {
+    set lines [list [join [list V [version -short] [get_property -quiet PART [current_project]]] "\t"]]
+    foreach xci $xcis {
+        set ip [get_ips -quiet -all [file rootname [file tail $xci]]]
+        if {$ip eq ""} { continue }
+        set run [get_runs -quiet "${ip}_synth_1"]
+        lappend lines [join [list I $ip $xci [get_property -quiet IPDEF $ip] \
+            [get_property -quiet GENERATE_SYNTH_CHECKPOINT [get_files -quiet $xci]] \
+            [get_property -quiet IS_LOCKED $ip] $run] "\t"]
+        foreach p [lsort [list_property $ip CONFIG.*]] {
+            lappend lines [join [list C $ip $p [get_property -quiet $p $ip]] "\t"]
+        }
+    }
+    return [join $lines "\n"]
+}
+"""
+
+# OOC run 完成后被复制到 IP 目录、顶层综合时使用的文件
+IPDirPatterns = ("*.dcp", "*_stub.v", "*_stub.vhdl", "*_sim_netlist.v", "*_sim_netlist.vhdl")
+
+
+class IPInfo:
+    def __init__(self, name: str, xci: str, ipdef: str, ooc: bool, locked: bool, run: str):
+        self.name = name
+        self.xci = xci
+        self.ipdef = ipdef
+        self.ooc = ooc
+        self.locked = locked
+        self.run = run
+        self.config = {}  # type: Dict[str, str]
+        self.config_hash = ""
+
+    def __repr__(self):
+        return f"<IPInfo {self.name} {self.ipdef}{' ooc' if self.ooc else ''} {self.config_hash[:12]}>"
+
+
+def ip_config_hash(ip: IPInfo, version: str, part: str) -> str:
+    payload = json.dumps({"ipdef": ip.ipdef, "version": version, "part": part, "config": ip.config},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_ip_info(lines: Iterable[str]) -> List[IPInfo]:
+    ips = {}  # type: Dict[str, IPInfo]
+    version = part = ""
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        if fields[0] == "V":
+            fields += [""] * (3 - len(fields))
+            version, part = fields[1:3]
+        elif fields[0] == "I":
+            fields += [""] * (7 - len(fields))
+            ips[fields[1]] = IPInfo(fields[1], fields[2], fields[3], fields[4] == "1", fields[5] == "1", fields[6])
+        elif fields[0] == "C" and fields[1] in ips:
+            ips[fields[1]].config[fields[2]] = fields[3] if len(fields) > 3 else ""
+
+    for ip in ips.values():
+        ip.config_hash = ip_config_hash(ip, version, part)
+    return list(ips.values())
+
+
+class IPBuildResult:
+    """
+    单个 IP 的结果
+        cached: OOC 综合结果从构建缓存恢复
+        status: OOC synth run 的 STATUS，非 OOC IP 为 generated
+    """
+
+    def __init__(self, ip: IPInfo):
+        self.ip = ip.name
+        self.config_hash = ip.config_hash
+        self.run = ip.run
+        self.cached = False
+        self.status = ""
+        self.generate_time = 0.0
+        self.synth_time = 0.0
+
+    def __repr__(self):
+        return (f"<IPBuildResult {self.ip} {self.status!r}{' cached' if self.cached else ''} "
+                f"generate: {self.generate_time:.1f} s, synth: {self.synth_time:.1f} s>")
+
+    @property
+    def ok(self) -> bool:
+        return self.cached or self.status == "generated" or "Complete" in self.status
+
+
+def _elapsed_seconds(value: str) -> float:
+    """ run 属性 STATS.ELAPSED，00:01:23 """
+    try:
+        h, m, s = (int(v) for v in value.strip().split(":"))
+    except ValueError:
+        return 0.0
+    return float(h * 3600 + m * 60 + s)
+
+
+class IPBuilder:
+    """
+    :param prj: VivadoPrj
+    :param ips: IP 名字，为空时为工程中全部 IP
+    :param workers: 同时运行的 OOC synth run 数（launch_runs -jobs），0 时由 cores / mem_gb / mem_per_worker 决定
+    :param cores: 核数，同时也是 workers 的上限
+    :param mem_gb: 可用内存，0 为不限制
+    :param mem_per_worker: 每个 OOC synth run 的内存估计, GB
+    :param cache: BuildCache，为空时使用工程的 build_cache
+    :param launch_kwargs: launch_runs 的其它参数
+    """
+
+    def __init__(self, prj, ips: Iterable[str] = (), workers: int = 0, cores: int = 0, mem_gb: float = 0.0,
+                 mem_per_worker: float = 2.0, cache=None, **launch_kwargs):
+        self.prj = prj
+        self.names = set(ips)
+        self.cores = cores if cores else prj.max_core
+        self.mem_gb = mem_gb
+        self.mem_per_worker = mem_per_worker
+        self.workers = workers
+        self.cache = cache if cache else (prj.build_cache if prj.build_cache else prj.use_build_cache())
+        self.launch_kwargs = launch_kwargs
+        self.results = {}  # type: Dict[str, IPBuildResult]
+
+    def __repr__(self):
+        return f"<IPBuilder ips: {len(self.results)}, cores: {self.cores}>"
+
+    @staticmethod
+    def cache_key(ip: IPInfo) -> str:
+        return hashlib.sha256(f"ip:{ip.config_hash}".encode("utf-8")).hexdigest()
+
+    def _jobs(self, n: int) -> int:
+        workers = min(self.workers, self.cores) if self.workers else self.cores
+        if self.mem_gb and self.mem_per_worker:
+            workers = min(workers, int(self.mem_gb // self.mem_per_worker))
+        return max(1, min(workers, n))
+
+    def _generate(self, ips: List[IPInfo]) -> None:
+        for ip in ips:
+            start = time.time()
+            self.prj.tcl(f"generate_target all [get_files {{{ip.xci}}}]")
+            self.results[ip.name].generate_time = time.time() - start
+
+    def _restore(self, ip: IPInfo, files: List[str]) -> str:
+        """ 命中时恢复 run 目录，同时把 DCP / stub 复制到 IP 目录，:return: 恢复后 run 的 STATUS """
+        status = self.prj.restore_run_outputs(ip.run, files)
+        ip_dir = os.path.dirname(ip.xci)
+        for path in select_outputs(files, IPDirPatterns):
+            name = os.path.basename(path)
+            if name.startswith(ip.name):
+                self.prj.put_file(path, f"{ip_dir}/{name}")
+        return status
+
+    def _put_cache(self, ip: IPInfo, stage: str) -> None:
+        files = self.prj.fetch_run_outputs(ip.run, os.path.join(stage, ip.name))
+        self.cache.put(self.cache_key(ip), files, meta={"ip": ip.name, "ipdef": ip.ipdef,
+                                                        "config_hash": ip.config_hash})
+
+    def run(self) -> Dict[str, IPBuildResult]:
+        ips = [ip for ip in self.prj.get_ips_info() if not self.names or ip.name in self.names]
+        self.results = {ip.name: IPBuildResult(ip) for ip in ips}
+        ips = [ip for ip in ips if not ip.locked]
+        for name in set(self.results) - {ip.name for ip in ips}:
+            self.results[name].status = "locked"
+
+        logger.info(f"build ips: {len(ips)}")
+        self._generate(ips)
+
+        stage = os.path.join(self.prj.local_tmp_dir(), "ip_build")
+        snapshot = self.prj.snapshot()
+        runs = []
+        for ip in ips:
+            result = self.results[ip.name]
+            if not ip.ooc:
+                result.status = "generated"
+                continue
+            if not ip.run:
+                self.prj.tcl(f"create_ip_run [get_files {{{ip.xci}}}]")
+                ip.run = result.run = f"{ip.name}_synth_1"
+
+            info = snapshot.runs.get(ip.run)
+            if info is not None and "Complete" in info.status and not info.needs_refresh:
+                # 工程中的结果已经是最新的
+                result.status = info.status
+                if not self.cache.has(self.cache_key(ip)):
+                    self._put_cache(ip, stage)
+                continue
+
+            files = self.cache.get(self.cache_key(ip), os.path.join(stage, ip.name))
+            if files is not None:
+                status = self._restore(ip, files)
+                if "Complete" in status:
+                    result.cached, result.status = True, "restored from build cache"
+                    continue
+                logger.warning(f"ip {ip.name} restored from build cache but status is {status!r}, rerun")
+            self.prj.reset_runs(ip.run)
+            runs.append(ip)
+
+        if runs:
+            self.launch_kwargs.setdefault("jobs", self._jobs(len(runs)))
+            self.prj.launch_runs(" ".join(ip.run for ip in runs), **self.launch_kwargs)
+            for ip in runs:
+                self.prj.tcl(f"wait_on_run {{{ip.run}}}")
+
+            lines = self.prj.tcl(f"foreach r [get_runs [list {' '.join(ip.run for ip in runs)}]] "
+                                 f"{{puts \"$r\\t[get_property STATUS $r]\\t[get_property -quiet STATS.ELAPSED $r]\"}}")
+            stats = {f[0]: f[1:] for f in (line.split("\t") for line in lines) if len(f) == 3}
+            for ip in runs:
+                result = self.results[ip.name]
+                result.status, elapsed = stats.get(ip.run, ("", ""))
+                result.synth_time = _elapsed_seconds(elapsed)
+                if "Complete" not in result.status:
+                    logger.error(f"ip {ip.name} synth failed: {result.status}")
+                    continue
+                self._put_cache(ip, stage)
+
+        shutil.rmtree(stage, ignore_errors=True)
+        for result in self.results.values():
+            logger.info(f"{result}")
+        return self.results
+
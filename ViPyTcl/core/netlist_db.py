@@ -0,0 +1,235 @@
+import logging
+import os
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from .tcl_lib import WriteObjsTcl
+from ..utils.columnar import StringTable, encode_column, build_csr, save_npz, load_npz
+
+logger = logging.getLogger("ViPyTcl")
+
+NetlistDBVersion = 1
+
+DefaultCellProperties = ("REF_NAME", "PRIMITIVE_GROUP", "IS_PRIMITIVE", "IS_SEQUENTIAL", "BEL", "LOC")
+DefaultPinProperties = ("DIRECTION", "IS_CLOCK", "REF_PIN_NAME")
+DefaultNetProperties = ("TYPE",)
+DefaultPortProperties = ("DIRECTION",)
+
+r"""
+vivado 端一次性导出网表的脚本
+    每个对象一行，tab 分隔:
+    C   cell    parent  <cell props...>
+    P   pin     cell    <pin props...>
+    O   port    <port props...>
+    N   net     <net props...>  n_pins  <pins...>   <ports...>
+    N 中的 pins 为 -leaf pins，网表按 -top_net_of_hierarchical_group 展平
+"""
+ExportNetlistTcl = WriteObjsTcl + r"""
+proc ::vipytcl::export_netlist {path cell_props pin_props net_props port_props} {
+    set fh [open $path w]
+    fconfigure $fh -encoding utf-8 -translation lf
+
+    set cells [get_cells -quiet -hierarchical]
+    ::vipytcl::write_objs $fh C $cells [list [get_property -quiet PARENT $cells]] $cell_props
+
+    set pins [get_pins -quiet -of_objects [get_cells -quiet -hierarchical -filter IS_PRIMITIVE]]
+    ::vipytcl::write_objs $fh P $pins [list [get_property -quiet PARENT_CELL $pins]] $pin_props
+
+    ::vipytcl::write_objs $fh O [get_ports -quiet] [list] $port_props
+
+    set nets [get_nets -quiet -hierarchical -top_net_of_hierarchical_group]
+    set cols [list]
+    foreach p $net_props { lappend cols [get_property -quiet $p $nets] }
+    set n [llength $nets]
+    for {set i 0} {$i < $n} {incr i} {
+        set net [lindex $nets $i]
+        set net_pins [get_pins -quiet -leaf -of_objects $net]
+        set line [list N $net]
+        foreach col $cols { lappend line [lindex $col $i] }
+        lappend line [llength $net_pins]
+        puts $fh [join [concat $line $net_pins [get_ports -quiet -of_objects $net]] "\t"]
+    }
+    close $fh
+    return $path
+}
+"""
+
+
+class _ObjTable:
+    """ 解析过程中的临时对象表 """
+
+    def __init__(self, props: Sequence[str]):
+        self.props = tuple(props)
+        self.names = []  # type: List[str]
+        self.index = {}  # type: Dict[str, int]
+        self.columns = {p: [] for p in self.props}  # type: Dict[str, List[str]]
+
+    def add(self, name: str, values: Sequence[str] = ()) -> int:
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self.names)
+            self.names.append(name)
+            for k, p in enumerate(self.props):
+                self.columns[p].append(values[k] if k < len(values) else "")
+        return i
+
+
+def parse_netlist_dump(lines: Iterable[str],
+                       cell_props: Sequence[str] = DefaultCellProperties,
+                       pin_props: Sequence[str] = DefaultPinProperties,
+                       net_props: Sequence[str] = DefaultNetProperties,
+                       port_props: Sequence[str] = DefaultPortProperties) -> 'NetlistDB':
+    """
+    将 ExportNetlistTcl 导出的文本解析为 NetlistDB
+    :param lines: 可迭代的行，一般直接传入打开的文件对象，逐行流式处理
+    """
+    cells, pins, nets, ports = _ObjTable(cell_props), _ObjTable(pin_props), _ObjTable(net_props), _ObjTable(port_props)
+    cell_parent_names, pin_cell_names = [], []
+    net_pin_rows, net_pin_cols, net_port_rows, net_port_cols = [], [], [], []
+
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        tag = fields[0]
+        if tag == "C" and fields[1] not in cells.index:
+            cells.add(fields[1], fields[3:])
+            cell_parent_names.append(fields[2])
+        elif tag == "P" and fields[1] not in pins.index:
+            pins.add(fields[1], fields[3:])
+            pin_cell_names.append(fields[2])
+        elif tag == "O":
+            ports.add(fields[1], fields[2:])
+        elif tag == "N":
+            n_props = len(net_props)
+            net = nets.add(fields[1], fields[2:2 + n_props])
+            n_pins = int(fields[2 + n_props])
+            members = fields[3 + n_props:]
+            for pin in members[:n_pins]:
+                net_pin_rows.append(net)
+                net_pin_cols.append(pins.add(pin))
+            for port in members[n_pins:]:
+                net_port_rows.append(net)
+                net_port_cols.append(ports.add(port))
+
+    # 不在 P 行中的 pin（例如黑盒）也会出现在 N 行里，它们的 cell 为 -1
+    pin_cell_names += [""] * (len(pins.names) - len(pin_cell_names))
+    cell_parent = np.fromiter((cells.index.get(p, -1) for p in cell_parent_names), dtype=np.int32,
+                              count=len(cell_parent_names))
+    pin_cell = np.fromiter((cells.index.get(c, -1) for c in pin_cell_names), dtype=np.int32,
+                           count=len(pin_cell_names))
+
+    arrays = {"version": np.array([NetlistDBVersion], dtype=np.int32),
+              "cell_parent": cell_parent,
+              "pin_cell": pin_cell}
+    for kind, table in (("cell", cells), ("pin", pins), ("net", nets), ("port", ports)):
+        arrays.update(StringTable.from_strings(table.names).to_arrays(f"{kind}_names"))
+        for prop, values in table.columns.items():
+            values_table, codes = encode_column(values)
+            arrays.update(values_table.to_arrays(f"{kind}_prop_{prop}"))
+            arrays[f"{kind}_prop_{prop}_codes"] = codes
+
+    pin_rows = pin_cell[pin_cell >= 0]
+    arrays["cell_pin_indptr"], arrays["cell_pin_indices"] = build_csr(
+        pin_rows, np.flatnonzero(pin_cell >= 0), len(cells.names))
+    arrays["net_pin_indptr"], arrays["net_pin_indices"] = build_csr(
+        np.array(net_pin_rows, dtype=np.int64), np.array(net_pin_cols, dtype=np.int32), len(nets.names))
+    arrays["net_port_indptr"], arrays["net_port_indices"] = build_csr(
+        np.array(net_port_rows, dtype=np.int64), np.array(net_port_cols, dtype=np.int32), len(nets.names))
+
+    pin_net = np.full(len(pins.names), -1, dtype=np.int32)
+    pin_net[np.array(net_pin_cols, dtype=np.int64)] = np.array(net_pin_rows, dtype=np.int32)
+    port_net = np.full(len(ports.names), -1, dtype=np.int32)
+    port_net[np.array(net_port_cols, dtype=np.int64)] = np.array(net_port_rows, dtype=np.int32)
+    arrays["pin_net"], arrays["port_net"] = pin_net, port_net
+
+    return NetlistDB(arrays)
+
+
+class NetlistDB:
+    """
+    列式网表
+        cell / pin / net / port 的名字保存在 StringTable 中, 对象之间用 int32 下标互相引用
+        属性列为字典编码, 通过 get_property 取值
+        连接关系为 CSR: cell -> pins, net -> pins, net -> ports, 以及反向的 pin -> net, port -> net
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.cells = StringTable.from_arrays(arrays, "cell_names")
+        self.pins = StringTable.from_arrays(arrays, "pin_names")
+        self.nets = StringTable.from_arrays(arrays, "net_names")
+        self.ports = StringTable.from_arrays(arrays, "port_names")
+
+        self.cell_parent = arrays["cell_parent"]
+        self.pin_cell = arrays["pin_cell"]
+        self.pin_net = arrays["pin_net"]
+        self.port_net = arrays["port_net"]
+        self.cell_pin_indptr, self.cell_pin_indices = arrays["cell_pin_indptr"], arrays["cell_pin_indices"]
+        self.net_pin_indptr, self.net_pin_indices = arrays["net_pin_indptr"], arrays["net_pin_indices"]
+        self.net_port_indptr, self.net_port_indices = arrays["net_port_indptr"], arrays["net_port_indices"]
+        self._prop_tables = {}  # type: Dict[str, StringTable]
+
+    def __repr__(self):
+        return (f"<NetlistDB cells: {len(self.cells)}, pins: {len(self.pins)}, "
+                f"nets: {len(self.nets)}, ports: {len(self.ports)}>")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'NetlistDB':
+        arrays = load_npz(path, mmap=mmap)
+        if int(arrays["version"][0]) != NetlistDBVersion:
+            raise ValueError(f"netlist db version dont match: {int(arrays['version'][0])}, expect {NetlistDBVersion}")
+        return cls(arrays)
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return save_npz(path, self.arrays)
+
+    def properties(self, kind: str) -> List[str]:
+        """ kind: cell / pin / net / port """
+        prefix, suffix = f"{kind}_prop_", "_codes"
+        return [k[len(prefix):-len(suffix)] for k in self.arrays if k.startswith(prefix) and k.endswith(suffix)]
+
+    def property_codes(self, kind: str, name: str):
+        """
+        :return: (取值表, int32 编码数组), 便于向量化过滤
+        """
+        key = f"{kind}_prop_{name}"
+        if f"{key}_codes" not in self.arrays:
+            raise KeyError(f"{kind} property {name} not exported")
+        if key not in self._prop_tables:
+            self._prop_tables[key] = StringTable.from_arrays(self.arrays, key)
+        return self._prop_tables[key], self.arrays[f"{key}_codes"]
+
+    def get_property(self, kind: str, name: str, index: int) -> str:
+        values, codes = self.property_codes(kind, name)
+        return values[int(codes[index])]
+
+    def property_mask(self, kind: str, name: str, values: Iterable[str]) -> np.ndarray:
+        """ 属性值在 values 中的对象的 bool mask """
+        table, codes = self.property_codes(kind, name)
+        wanted = [table.get(str(v)) for v in values]
+        return np.isin(codes, [w for w in wanted if w >= 0])
+
+    def pins_of_cell(self, cell: int) -> np.ndarray:
+        return self.cell_pin_indices[self.cell_pin_indptr[cell]:self.cell_pin_indptr[cell + 1]]
+
+    def pins_of_net(self, net: int) -> np.ndarray:
+        return self.net_pin_indices[self.net_pin_indptr[net]:self.net_pin_indptr[net + 1]]
+
+    def ports_of_net(self, net: int) -> np.ndarray:
+        return self.net_port_indices[self.net_port_indptr[net]:self.net_port_indptr[net + 1]]
+
+    def net_of_pin(self, pin: int) -> int:
+        return int(self.pin_net[pin])
+
+    def cell_of_pin(self, pin: int) -> int:
+        return int(self.pin_cell[pin])
+
+
+def export_netlist_tcl_call(path: str,
+                            cell_props: Sequence[str],
+                            pin_props: Sequence[str],
+                            net_props: Sequence[str],
+                            port_props: Sequence[str]) -> str:
+    props = " ".join("{%s}" % " ".join(p) for p in (cell_props, pin_props, net_props, port_props))
+    return f"::vipytcl::export_netlist {{{path}}} {props}"
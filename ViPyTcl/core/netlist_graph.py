@@ -0,0 +1,456 @@
+import fnmatch
+import logging
+import re
+from typing import Callable, Dict, Iterable, List, Union
+
+import numpy as np
+
+from .netlist_db import NetlistDB
+from ..base.base import ViObj, ViObjList
+from ..base.filter import Filter
+from ..base.vivado_error import ViArgsError
+
+logger = logging.getLogger("ViPyTcl")
+
+TrueValues = ("1", "true", "TRUE", "True")
+
+
+def _gather(indptr: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+    """ CSR 中 frontier 所有行的边下标，一次向量化取出 """
+    starts = np.asarray(indptr[frontier], dtype=np.int64)
+    lens = np.asarray(indptr[frontier + 1], dtype=np.int64) - starts
+    total = int(lens.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    return np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(total, dtype=np.int64)
+
+
+FalseValues = ("0", "false", "FALSE", "False")
+
+_FilterToken = re.compile(r"\s*(\|\||&&|==|!=|=~|!~|<=|>=|<|>|!|\(|\)|\{[^}]*\}|\"[^\"]*\"|[^\s()!=<>~&|]+)")
+
+
+def _same(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if (a in TrueValues and b in TrueValues) or (a in FalseValues and b in FalseValues):
+        return True
+    try:
+        return float(a) == float(b)
+    except ValueError:
+        return False
+
+
+def _compare(op: str, a: str, b: str) -> bool:
+    if op == "==":
+        return _same(a, b)
+    if op == "!=":
+        return not _same(a, b)
+    if op == "=~":
+        return fnmatch.fnmatchcase(a, b)
+    if op == "!~":
+        return not fnmatch.fnmatchcase(a, b)
+    try:
+        a, b = float(a), float(b)
+    except ValueError:
+        return False
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+
+class _FilterParser:
+    """
+    在本地对 vivado -filter 表达式求值，支持 Filter/ViProperty 组合出来的语法:
+        PROP, !PROP, PROP == {v}, PROP != v, PROP =~ "glob", PROP !~ {v}, <, <=, >, >=, &&, ||, ()
+    column(prop) 返回 (取值列表, int32 编码) 或 None，比较只在去重后的取值上做一次
+    """
+
+    def __init__(self, expr: str, column: Callable, n: int):
+        self.tokens = [t for t in _FilterToken.findall(expr) if t]
+        self.pos = 0
+        self.column = column
+        self.n = n
+
+    def parse(self) -> np.ndarray:
+        mask = self._or()
+        if self.pos != len(self.tokens):
+            raise ViArgsError(f"can't parse filter near: {' '.join(self.tokens[self.pos:])}")
+        return mask
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise ViArgsError("unexpected end of filter")
+        self.pos += 1
+        return token
+
+    def _or(self):
+        mask = self._and()
+        while self._peek() == "||":
+            self._next()
+            mask = mask | self._and()
+        return mask
+
+    def _and(self):
+        mask = self._unary()
+        while self._peek() == "&&":
+            self._next()
+            mask = mask & self._unary()
+        return mask
+
+    def _unary(self):
+        token = self._next()
+        if token == "!":
+            return ~self._unary()
+        if token == "(":
+            mask = self._or()
+            if self._next() != ")":
+                raise ViArgsError("filter parentheses dont match")
+            return mask
+
+        op = self._peek()
+        if op in ("==", "!=", "=~", "!~", "<", "<=", ">", ">="):
+            self._next()
+            value = self._next()
+            if value[0] in "{\"":
+                value = value[1:-1]
+            return self._column_mask(token, lambda v: _compare(op, v, value))
+        return self._column_mask(token, lambda v: v in TrueValues)
+
+    def _column_mask(self, prop: str, predicate: Callable) -> np.ndarray:
+        column = self.column(prop)
+        if column is None:
+            return np.zeros(self.n, dtype=bool)
+        values, codes = column
+        hit = np.array([predicate(v) for v in values], dtype=bool)
+        return hit[np.asarray(codes)] if len(hit) else np.zeros(len(codes), dtype=bool)
+
+
+class Cone:
+    """ 一次 cone 查询的结果，nodes 按访问顺序排列，depth 为对应的层数 """
+
+    def __init__(self, graph: 'NetlistGraph', nodes: np.ndarray, depth: np.ndarray):
+        self.graph = graph
+        self.nodes = nodes
+        self.depth = depth
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __repr__(self):
+        return f"<Cone nodes: {len(self.nodes)}, max depth: {int(self.depth.max()) if len(self.depth) else 0}>"
+
+    def names(self) -> List[str]:
+        return [self.graph.node_name(int(n)) for n in self.nodes]
+
+    def cells(self) -> List[str]:
+        n_cells = self.graph.n_cells
+        return [self.graph.db.cells[int(n)] for n in self.nodes if n < n_cells]
+
+    def ports(self) -> List[str]:
+        n_cells = self.graph.n_cells
+        return [self.graph.db.ports[int(n) - n_cells] for n in self.nodes if n >= n_cells]
+
+    def filter(self, where: Union[Filter, str, Dict]) -> 'Cone':
+        mask = self.graph.node_mask(where)[self.nodes]
+        return Cone(self.graph, self.nodes[mask], self.depth[mask])
+
+
+class NetlistGraph:
+    """
+    由 NetlistDB 建立的连接关系索引
+        节点: cell 下标 [0, n_cells)，port 下标 n_cells + port
+        边:   driver 节点 -> load 节点，记录 driver pin、load pin 和 net
+        fanout / fanin 均为 CSR，cone 查询按层向量化 BFS，全部在本地完成
+    """
+
+    def __init__(self, db: NetlistDB):
+        self.db = db
+        self.n_cells = len(db.cells)
+        self.n_ports = len(db.ports)
+        self.n_nodes = self.n_cells + self.n_ports
+
+        pin_dir = self._direction("pin", len(db.pins))
+        port_dir = self._direction("port", self.n_ports)
+
+        # net -> pin 展开为 (net, node, pin) 端点
+        net_pin_indptr = np.asarray(db.net_pin_indptr, dtype=np.int64)
+        pins = np.asarray(db.net_pin_indices, dtype=np.int64)
+        pin_nets = np.repeat(np.arange(len(db.nets), dtype=np.int64), np.diff(net_pin_indptr))
+        pin_nodes = np.asarray(db.pin_cell, dtype=np.int64)[pins]
+
+        net_port_indptr = np.asarray(db.net_port_indptr, dtype=np.int64)
+        ports = np.asarray(db.net_port_indices, dtype=np.int64)
+        port_nets = np.repeat(np.arange(len(db.nets), dtype=np.int64), np.diff(net_port_indptr))
+        port_nodes = ports + self.n_cells
+
+        # 输入 port 在顶层驱动 net，输出 port 是 net 的 load，pin 则相反
+        ep_net = np.concatenate([pin_nets, port_nets])
+        ep_node = np.concatenate([pin_nodes, port_nodes])
+        ep_pin = np.concatenate([pins, np.full(len(ports), -1, dtype=np.int64)])
+        ep_dir = np.concatenate([pin_dir[pins], port_dir[ports]])
+        ep_is_port = np.concatenate([np.zeros(len(pins), bool), np.ones(len(ports), bool)])
+        is_driver = np.where(ep_is_port, ep_dir != 2, ep_dir != 1) & (ep_node >= 0)
+        is_load = np.where(ep_is_port, ep_dir != 1, ep_dir != 2) & (ep_node >= 0)
+
+        d = np.flatnonzero(is_driver)
+        s = np.flatnonzero(is_load)
+        s = s[np.argsort(ep_net[s], kind="stable")]
+        load_count = np.bincount(ep_net[s], minlength=len(db.nets))
+        load_start = np.cumsum(load_count) - load_count
+
+        per_driver = load_count[ep_net[d]]
+        within = np.arange(int(per_driver.sum()), dtype=np.int64) - np.repeat(np.cumsum(per_driver) - per_driver,
+                                                                               per_driver)
+        load_ep = s[np.repeat(load_start[ep_net[d]], per_driver) + within]
+        driver_ep = np.repeat(d, per_driver)
+        keep = driver_ep != load_ep
+
+        self.edge_src = ep_node[driver_ep[keep]]
+        self.edge_dst = ep_node[load_ep[keep]]
+        self.edge_src_pin = ep_pin[driver_ep[keep]]
+        self.edge_dst_pin = ep_pin[load_ep[keep]]
+        self.edge_net = ep_net[driver_ep[keep]]
+
+        self._fanout = self._csr(self.edge_src)
+        self._fanin = self._csr(self.edge_dst)
+
+        self.is_sequential = np.zeros(self.n_nodes, dtype=bool)
+        if "IS_SEQUENTIAL" in db.properties("cell"):
+            self.is_sequential[:self.n_cells] = db.property_mask("cell", "IS_SEQUENTIAL", TrueValues)
+        self.pin_is_clock = np.zeros(len(db.pins), dtype=bool)
+        if "IS_CLOCK" in db.properties("pin"):
+            self.pin_is_clock = db.property_mask("pin", "IS_CLOCK", TrueValues)
+
+    def __repr__(self):
+        return f"<NetlistGraph nodes: {self.n_nodes}, edges: {len(self.edge_src)}>"
+
+    def _direction(self, kind: str, n: int) -> np.ndarray:
+        """ 0: INOUT/未知, 1: IN, 2: OUT """
+        direction = np.zeros(n, dtype=np.int8)
+        if "DIRECTION" in self.db.properties(kind):
+            direction[self.db.property_mask(kind, "DIRECTION", ["IN"])] = 1
+            direction[self.db.property_mask(kind, "DIRECTION", ["OUT"])] = 2
+        return direction
+
+    def _csr(self, rows: np.ndarray):
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.n_nodes), out=indptr[1:])
+        return indptr, order
+
+    """ ============================ node =========================== """
+
+    def node_name(self, node: int) -> str:
+        return self.db.cells[node] if node < self.n_cells else self.db.ports[node - self.n_cells]
+
+    def _node_column(self, prop: str):
+        """ 节点上的属性列，cell 和 port 拼在一起，没有导出该属性的一方取空字符串 """
+        tables, codes = [], []
+        for kind, n in (("cell", self.n_cells), ("port", self.n_ports)):
+            if prop in self.db.properties(kind):
+                table, kind_codes = self.db.property_codes(kind, prop)
+                codes.append(np.asarray(kind_codes, dtype=np.int64) + sum(len(t) for t in tables))
+                tables.append(table.tolist())
+            else:
+                codes.append(np.full(n, sum(len(t) for t in tables), dtype=np.int64))
+                tables.append([""])
+        if all(t == [""] for t in tables):
+            return None
+        return [v for t in tables for v in t], np.concatenate(codes)
+
+    def node_mask(self, where: Union[Filter, str, Dict]) -> np.ndarray:
+        """
+        按属性过滤节点
+        :param where: Filter 表达式，例如 (REF_NAME == "FDRE") | (REF_NAME == "FDCE")、IS_SEQUENTIAL & ~IS_CLOCK，
+            也可以是 {属性名: 取值或取值列表}，多个条件取与
+            cell 和 port 分别按各自导出的属性判断，没有导出该属性的一方视为不满足
+        """
+        if isinstance(where, dict):
+            expr = " && ".join("(%s)" % " || ".join(f"{prop} == {{{v}}}" for v in
+                                                    (value if isinstance(value, (list, tuple, set)) else [value]))
+                               for prop, value in where.items())
+        else:
+            expr = str(where)
+        return _FilterParser(expr, self._node_column, self.n_nodes).parse()
+
+    def _seed_nodes(self, seeds, direction: str):
+        """
+        seeds 可以是 cell/port/pin/net 名字或对应的 ViObj
+        :return: (第 0 层节点, 第 1 层节点)
+            cell/port 本身是第 0 层；pin/net 沿传播方向直接相连的节点是第 1 层，
+            这样从 driver pin 出发不会把同一个 cell 其它输出的 fanout 也算进来
+        """
+        if isinstance(seeds, (str, ViObj)):
+            seeds = [seeds]
+        elif isinstance(seeds, ViObjList):
+            seeds = list(seeds)
+
+        level0, level1 = [], []
+        for seed in seeds:
+            if isinstance(seed, ViObj):
+                kind = {"get_cells": "cell", "get_ports": "port", "get_pins": "pin", "get_nets": "net"}.get(seed.tcl)
+                names = seed.name.split()
+            else:
+                kind, names = None, [str(seed)]
+
+            for name in names:
+                nodes0, nodes1 = self._name_to_nodes(name, kind, direction)
+                level0.extend(nodes0)
+                level1.extend(nodes1)
+        return np.unique(np.array(level0, dtype=np.int64)), np.unique(np.array(level1, dtype=np.int64))
+
+    def _name_to_nodes(self, name: str, kind: Union[str, None], direction: str):
+        db = self.db
+        if kind in (None, "cell") and name in db.cells:
+            return [db.cells.index(name)], []
+        if kind in (None, "port") and name in db.ports:
+            return [self.n_cells + db.ports.index(name)], []
+
+        if direction == "fanout":
+            edges_of_pin, edges_of_net, next_node = self.edge_src_pin, self.edge_net, self.edge_dst
+        else:
+            edges_of_pin, edges_of_net, next_node = self.edge_dst_pin, self.edge_net, self.edge_src
+
+        if kind in (None, "pin") and name in db.pins:
+            pin = db.pins.index(name)
+            edges = np.flatnonzero(edges_of_pin == pin)
+            if len(edges):
+                return [], next_node[edges].tolist()
+            # 逆着传播方向的 pin（例如 fanout 的输入 pin）把整个 cell 当作起点
+            cell = db.cell_of_pin(pin)
+            return ([cell] if cell >= 0 else []), []
+        if kind in (None, "net") and name in db.nets:
+            edges = np.flatnonzero(edges_of_net == db.nets.index(name))
+            return [], next_node[edges].tolist()
+        raise ViArgsError(f"object not found in netlist graph: {name}")
+
+    """ ============================ cone =========================== """
+
+    def cone(self, seeds, direction: str = "fanout", depth: int = None, stop_at_sequential: bool = True,
+             method: str = "bfs", where: Union[Filter, str, Dict] = None, stop_at: Union[Filter, str, Dict] = None,
+             include_seeds: bool = False) -> Cone:
+        """
+        fanout / fanin cone 查询
+        :param seeds: 起点，cell/port/pin/net 名字或 ViObj，可以是列表
+        :param direction: "fanout" 或 "fanin"
+        :param depth: 最大层数，None 为不限
+        :param stop_at_sequential: 到达时序单元后不再继续展开（起点除外）
+        :param method: "bfs" 返回按层排序的结果，"dfs" 返回深度优先的访问顺序
+        :param where: 结果过滤条件，见 node_mask
+        :param stop_at: 满足该条件的节点加入结果但不再展开，格式同 where
+        :param include_seeds: 结果中是否包含起点
+        """
+        if direction not in ("fanout", "fanin"):
+            raise ViArgsError("direction must be 'fanout' or 'fanin'")
+        indptr, order = self._fanout if direction == "fanout" else self._fanin
+        neighbor = self.edge_dst if direction == "fanout" else self.edge_src
+
+        level0, level1 = self._seed_nodes(seeds, direction)
+        stop = self.is_sequential.copy() if stop_at_sequential else np.zeros(self.n_nodes, dtype=bool)
+        if stop_at:
+            stop |= self.node_mask(stop_at)
+
+        if method == "bfs":
+            nodes, levels = self._bfs(level0, level1, indptr, order, neighbor, stop, depth)
+        elif method == "dfs":
+            nodes, levels = self._dfs(level0, level1, indptr, order, neighbor, stop, depth)
+        else:
+            raise ViArgsError("method must be 'bfs' or 'dfs'")
+
+        if not include_seeds:
+            keep = levels > 0
+            nodes, levels = nodes[keep], levels[keep]
+        result = Cone(self, nodes, levels)
+        return result.filter(where) if where else result
+
+    def _bfs(self, level0, level1, indptr, order, neighbor, stop, depth):
+        visited = np.zeros(self.n_nodes, dtype=bool)
+        visited[level0] = True
+        nodes, levels = [level0], [np.zeros(len(level0), dtype=np.int64)]
+        frontier, extra, level = level0, level1, 0
+        while (len(frontier) or len(extra)) and (depth is None or level < depth):
+            level += 1
+            nxt = np.unique(np.concatenate([neighbor[order[_gather(indptr, frontier)]], extra]))
+            nxt = nxt[~visited[nxt]]
+            visited[nxt] = True
+            nodes.append(nxt)
+            levels.append(np.full(len(nxt), level, dtype=np.int64))
+            frontier, extra = nxt[~stop[nxt]], extra[:0]
+        return np.concatenate(nodes), np.concatenate(levels)
+
+    def _dfs(self, level0, level1, indptr, order, neighbor, stop, depth):
+        visited = np.zeros(self.n_nodes, dtype=bool)
+        nodes, levels = [], []
+        stack = [(int(n), 1) for n in level1[::-1]] + [(int(n), 0) for n in level0[::-1]]
+        while stack:
+            node, level = stack.pop()
+            if visited[node] or (depth is not None and level > depth):
+                continue
+            visited[node] = True
+            nodes.append(node)
+            levels.append(level)
+            if level and stop[node]:
+                continue
+            children = neighbor[order[indptr[node]:indptr[node + 1]]]
+            stack.extend((int(c), level + 1) for c in children[::-1] if not visited[c])
+        return np.array(nodes, dtype=np.int64), np.array(levels, dtype=np.int64)
+
+    def fanout(self, seeds, depth: int = None, **kwargs) -> Cone:
+        return self.cone(seeds, "fanout", depth, **kwargs)
+
+    def fanin(self, seeds, depth: int = None, **kwargs) -> Cone:
+        return self.cone(seeds, "fanin", depth, **kwargs)
+
+    """ ============================ driver / load =========================== """
+
+    def _net_of(self, pin_or_net: str) -> int:
+        if pin_or_net in self.db.nets:
+            return self.db.nets.index(pin_or_net)
+        if pin_or_net in self.db.pins:
+            return self.db.net_of_pin(self.db.pins.index(pin_or_net))
+        if pin_or_net in self.db.ports:
+            return int(self.db.port_net[self.db.ports.index(pin_or_net)])
+        raise ViArgsError(f"pin or net not found in netlist graph: {pin_or_net}")
+
+    def _endpoint_names(self, edges: np.ndarray, pins: np.ndarray, nodes: np.ndarray) -> List[str]:
+        names = []
+        for pin, node in sorted(set(zip(pins[edges].tolist(), nodes[edges].tolist()))):
+            names.append(self.db.pins[pin] if pin >= 0 else self.node_name(node))
+        return names
+
+    def drivers(self, pin_or_net: str) -> List[str]:
+        """ net（或 pin/port 所在 net）的 driver pin/port """
+        edges = np.flatnonzero(self.edge_net == self._net_of(pin_or_net))
+        return self._endpoint_names(edges, self.edge_src_pin, self.edge_src)
+
+    def loads(self, pin_or_net: str) -> List[str]:
+        """ net（或 pin/port 所在 net）的 load pin/port """
+        edges = np.flatnonzero(self.edge_net == self._net_of(pin_or_net))
+        return self._endpoint_names(edges, self.edge_dst_pin, self.edge_dst)
+
+    def clock_domain(self, clock: Union[str, Iterable[str]], depth: int = None) -> List[str]:
+        """
+        时钟 net/pin/port 经过时钟树（BUFG、MMCM 等非时序单元）到达的时序单元，
+        只统计通过 IS_CLOCK pin 到达的单元
+        """
+        clocks = [clock] if isinstance(clock, str) else list(clock)
+        nets = np.array([self._net_of(c) for c in clocks], dtype=np.int64)
+        cone = self.cone([self.db.nets[int(n)] for n in nets], "fanout", depth, stop_at_sequential=True)
+
+        # 时钟 net 本身以及时钟树上的非时序单元发出的边
+        expanded = np.zeros(self.n_nodes, dtype=bool)
+        expanded[cone.nodes] = True
+        expanded &= ~self.is_sequential
+        from_clock_net = np.isin(self.edge_net, nets)
+
+        clock_pin = np.zeros(len(self.edge_dst_pin), dtype=bool)
+        has_pin = self.edge_dst_pin >= 0
+        clock_pin[has_pin] = self.pin_is_clock[self.edge_dst_pin[has_pin]]
+        hit = (expanded[self.edge_src] | from_clock_net) & self.is_sequential[self.edge_dst] & clock_pin
+        return [self.db.cells[int(n)] for n in np.unique(self.edge_dst[hit])]
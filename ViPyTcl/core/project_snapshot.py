@@ -0,0 +1,136 @@
+import time
+from typing import Iterable, Optional
+
+from ..base import RunsType
+from ..base.base import _runs_type_from_flags
+
+r"""
+一次 tcl 调用取得全部 run 和已打开 design 的状态
+    每个属性对全部 run 批量 get_property，不逐个 run 查询
+    R   run     IS_SYNTHESIS    IS_IMPLEMENTATION   STATUS  PROGRESS    PARENT  STRATEGY    NEEDS_REFRESH   DIRECTORY
+    D   design  is_current      IS_SYNTHESIS        IS_IMPLEMENTATION
+    P   project directory       part
+"""
+SnapshotRunProperties = ("IS_SYNTHESIS", "IS_IMPLEMENTATION", "STATUS", "PROGRESS", "PARENT", "STRATEGY",
+                         "NEEDS_REFRESH", "DIRECTORY")
+
+SnapshotTcl = r"""
+namespace eval ::vipytcl {}
+
+proc ::vipytcl::snapshot {props} {
+    set lines [list]
+    set prj [current_project -quiet]
+    if {$prj ne ""} {
+        lappend lines [join [list P $prj [get_property -quiet DIRECTORY $prj] [get_property -quiet PART $prj]] "\t"]
+    }
+
+    set runs [get_runs -quiet]
+    set cols [list]
+    set n [llength $runs]
+    foreach p $props {
+        set col [get_property -quiet $p $runs]
+        # 只有一个 run 时 get_property 返回的是值而不是列表，"Not started" 这样的值不能再按列表取
+        if {$n == 1} { set col [list $col] }
+        lappend cols $col
+    }
+    for {set i 0} {$i < $n} {incr i} {
+        set row [list R [lindex $runs $i]]
+        foreach col $cols { lappend row [lindex $col $i] }
+        lappend lines [join $row "\t"]
+    }
+
+    set cur [current_design -quiet]
+    foreach d [get_designs -quiet] {
+        set r [get_runs -quiet $d]
+        lappend lines [join [list D $d [expr {$d eq $cur}] \
+            [get_property -quiet IS_SYNTHESIS $r] [get_property -quiet IS_IMPLEMENTATION $r]] "\t"]
+    }
+    return [join $lines "\n"]
+}
+"""
+
+
+def runs_type(is_synth: str, is_impl: str) -> RunsType:
+    return _runs_type_from_flags([f"1 {is_synth} {is_impl}"])
+
+
+class RunInfo:
+    __slots__ = ("name", "type", "status", "progress", "parent", "strategy", "needs_refresh", "directory")
+
+    def __init__(self, name: str, type_: RunsType, status: str, progress: str, parent: str, strategy: str,
+                 needs_refresh: bool, directory: str):
+        self.name = name
+        self.type = type_
+        self.status = status
+        self.progress = progress
+        self.parent = parent
+        self.strategy = strategy
+        self.needs_refresh = needs_refresh
+        self.directory = directory
+
+    def __repr__(self):
+        return f"<RunInfo {self.name} {self.type.name} {self.progress} {self.status!r}>"
+
+
+class DesignInfo:
+    __slots__ = ("name", "type", "current")
+
+    def __init__(self, name: str, type_: RunsType, current: bool):
+        self.name = name
+        self.type = type_
+        self.current = current
+
+    def __repr__(self):
+        return f"<DesignInfo {self.name} {self.type.name}{' current' if self.current else ''}>"
+
+
+class ProjectSnapshot:
+    """ 某一时刻的工程状态 """
+
+    def __init__(self):
+        self.time = time.time()
+        self.project = ""
+        self.project_dir = ""
+        self.part = ""
+        self.runs = {}  # run: RunInfo
+        self.designs = {}  # design: DesignInfo
+
+    def __repr__(self):
+        return f"<ProjectSnapshot {self.project} runs: {len(self.runs)}, designs: {list(self.designs)}>"
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.time
+
+    @property
+    def current_design(self) -> Optional[DesignInfo]:
+        return next((d for d in self.designs.values() if d.current), None)
+
+    def runs_of_type(self, type_: RunsType):
+        return [r for r in self.runs.values() if r.type is type_]
+
+
+def parse_snapshot(lines: Iterable[str]) -> ProjectSnapshot:
+    snapshot = ProjectSnapshot()
+    n = len(SnapshotRunProperties)
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        tag = fields[0]
+        if tag == "R":
+            fields += [""] * (2 + n - len(fields))
+            values = dict(zip(SnapshotRunProperties, fields[2:]))
+            snapshot.runs[fields[1]] = RunInfo(fields[1], runs_type(values["IS_SYNTHESIS"], values["IS_IMPLEMENTATION"]),
+                                               values["STATUS"], values["PROGRESS"], values["PARENT"],
+                                               values["STRATEGY"], values["NEEDS_REFRESH"] == "1",
+                                               values["DIRECTORY"])
+        elif tag == "D":
+            fields += [""] * (5 - len(fields))
+            snapshot.designs[fields[1]] = DesignInfo(fields[1], runs_type(fields[3], fields[4]), fields[2] == "1")
+        elif tag == "P":
+            fields += [""] * (4 - len(fields))
+            snapshot.project, snapshot.project_dir, snapshot.part = fields[1:4]
+    return snapshot
+
+
+def snapshot_tcl_call() -> str:
+    return f"::vipytcl::snapshot {{{' '.join(SnapshotRunProperties)}}}"
@@ -0,0 +1,486 @@
+import asyncio
+import hashlib
+import inspect
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Union
+
+import apscheduler.schedulers.asyncio
+import grpc
+import grpc.aio
+
+from . import remote_tcl_pb2
+from .remote_tcl_pb2_grpc import RemoteTclStub
+from ..base.remote_base import *
+from ..base.vivado_error import ViFileChecksumError, get_err_from_str
+from .admission import AioAdmissionControl
+from .channel_pool import ControlDeadline, ServerOptions, call_deadline, channel_options
+from .compression import CompressionStats, available_encodings, decode_chunk, file_encoding, negotiate
+from .remote_session import Session, SessionMetadataKey, session_id_from_context
+from .remote_tcl import DefaultChunkSize, MaxChunkSize, GRPCRemoteTclServicer, RemoteTclProcessPopen, \
+    _ChunkReceiver, batch_deadline, batch_futures, batch_request, ipv4_parser, iter_file_chunks, part_path, tcl_output
+from .tcl_process import aiter_in_executor
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+grpc.aio 版本的服务端和客户端
+    同步的 grpc 服务端每个进行中的 rpc 占用一个线程，空闲的会话、慢客户端的文件流、排队的请求都是如此
+    aio 服务端在事件循环中等待，线程只在解释器运行命令、读写文件块时使用（AioRemoteTclServicer 的 executor），
+    大量空闲的会话、流和监控调用不会增加线程
+    解释器命令和文件 / 会话操作使用两个 executor，长时间运行的命令占满线程时文件传输和会话管理仍然可以进行
+    服务端的处理逻辑和 GRPCRemoteTclServicer 相同，只是在 executor 中运行，协议不变，同步和 aio 的客户端、服务端可以混用
+"""
+
+DefaultAioWorkers = 32
+DefaultAioIoWorkers = 16
+
+
+class AioGRPCServer:
+    """
+    接口和 GRPCServer 相同，start / stop 为协程
+    :param admission: AioAdmissionControl，True 时使用默认的限制，False 时不限制，排队时不占用线程
+    """
+
+    def __init__(self, use_aps: bool = True, admission: AioAdmissionControl or bool = True):
+        self.admission = AioAdmissionControl() if admission is True else (admission if admission else None)
+        self._server = grpc.aio.server(interceptors=(self.admission,) if self.admission is not None else None,
+                                       options=ServerOptions)
+        self._is_run = False
+        if use_aps:
+            self._aps = apscheduler.schedulers.asyncio.AsyncIOScheduler(timezone='Asia/Shanghai')
+        else:
+            self._aps = None
+        self._stop_callback = {}
+
+    def add_aps_job(self, *args, **kwargs):
+        self._aps.add_job(*args, **kwargs)
+
+    def add_servicer(self, add_servicer_func, servicer):
+        if hasattr(servicer, "admission"):
+            servicer.admission = self.admission
+        add_servicer_func(servicer, self._server)
+        logger.info(f"GRPC aio Server add servicer {servicer.__class__.__name__}")
+
+    def add_insecure_port(self, ip: str, port: int):
+        use_port = self._server.add_insecure_port(f'{ip}:{int(port)}')
+        logger.info(f"GRPC aio Server add insecure port {ip}:{use_port}")
+        return use_port
+
+    def add_stop_callback(self, func, args: tuple = (), kwargs: dict = None):
+        """ func 可以是协程函数 """
+        kwargs = kwargs if kwargs else {}
+        self._stop_callback[func] = (args, kwargs)
+
+    async def start(self):
+        if self._is_run:
+            return
+        if self._aps is not None:
+            self._aps.start()
+        await self._server.start()
+        self._is_run = True
+        logger.info("GRPC aio Server start")
+
+    async def stop(self, grace: float = None):
+        if not self._is_run:
+            return
+
+        logger.info("GRPC aio Server stop ...")
+        await self._server.stop(grace)
+        for func, _ in self._stop_callback.items():
+            result = func(*_[0], **_[1])
+            if inspect.isawaitable(result):
+                await result
+
+        if self._aps is not None and self._aps.running:
+            self._aps.shutdown()
+
+        self._is_run = False
+        logger.info("GRPC aio Server stop done")
+
+    async def wait_for_termination(self):
+        await self._server.wait_for_termination()
+
+
+class AioRemoteTclServicer(GRPCRemoteTclServicer):
+    """
+    GRPCRemoteTclServicer 的 grpc.aio 版本，参数相同
+    :param workers: 运行解释器命令的线程数
+    :param io_workers: 文件读写、blob 和会话操作的线程数
+    """
+
+    def __init__(self, *args, workers: int = DefaultAioWorkers, io_workers: int = DefaultAioIoWorkers, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="vipytcl_aio")
+        self._io_executor = ThreadPoolExecutor(io_workers, thread_name_prefix="vipytcl_aio_io")
+
+    def stop(self):
+        super().stop()
+        self._executor.shutdown(wait=False)
+        self._io_executor.shutdown(wait=False)
+
+    def _session(self, context) -> Optional[Session]:
+        """ 在线程中调用，不能 abort，会话不存在时由 _check_session 先行中止 """
+        session_id = session_id_from_context(context)
+        if not session_id:
+            return None
+        session = self.sessions.get(session_id) if self.sessions is not None else None
+        if session is None:
+            raise GRPCSessionErr(f"session not found: {session_id}")
+        return session
+
+    async def _check_session(self, context) -> None:
+        try:
+            self._session(context)
+        except GRPCSessionErr as err:
+            await context.abort(grpc.StatusCode.NOT_FOUND, str(err))
+
+    async def _run(self, func, *args, executor: ThreadPoolExecutor = None):
+        """ :param executor: 默认为文件 / 会话的 executor """
+        executor = executor if executor is not None else self._io_executor
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def _unary(self, method, request, context, executor: ThreadPoolExecutor = None):
+        """ 在 executor 中运行同步的处理函数 """
+        await self._check_session(context)
+        return await self._run(method, request, context, executor=executor)
+
+    async def _stream(self, generator, context, executor: ThreadPoolExecutor = None) -> AsyncIterator:
+        await self._check_session(context)
+        executor = executor if executor is not None else self._io_executor
+        async for response in aiter_in_executor(generator, executor):
+            yield response
+
+    async def _recv_stream_async(self, request_iterator, addr, resolve, name: str):
+        """ _recv_stream 的 asyncio 版本，等待下一个块时不占用线程 """
+        receiver = _ChunkReceiver(addr, resolve, name, self.compression_stats)
+        try:
+            async for chunk in request_iterator:
+                await self._run(receiver.feed, chunk)
+            await self._run(receiver.finish)
+        except asyncio.CancelledError as err:
+            receiver.response(err)
+            raise
+        except Exception as err:
+            return receiver.response(err)
+        return receiver.response()
+
+    # 不涉及解释器和文件的在事件循环中直接运行
+    async def encodings(self, request, context):
+        return super().encodings(request, context)
+
+    async def keepalive(self, request, context):
+        return super().keepalive(request, context)
+
+    async def server_stats(self, request, context):
+        return super().server_stats(request, context)
+
+    async def open_session(self, request, context):
+        return await self._run(super().open_session, request, context)
+
+    async def close_session(self, request, context):
+        return await self._run(super().close_session, request, context)
+
+    async def tcl(self, request, context):
+        return await self._unary(super().tcl, request, context, executor=self._executor)
+
+    async def tcl_batch(self, request, context):
+        return await self._unary(super().tcl_batch, request, context, executor=self._executor)
+
+    async def tcl_stream(self, request, context):
+        async for response in self._stream(super().tcl_stream(request, context), context, executor=self._executor):
+            yield response
+
+    async def put_file(self, request, context):
+        return await self._unary(super().put_file, request, context)
+
+    async def get_file(self, request, context):
+        return await self._unary(super().get_file, request, context)
+
+    async def get_file_stream(self, request, context):
+        async for response in self._stream(super().get_file_stream(request, context), context):
+            yield response
+
+    async def put_file_stream(self, request_iterator, context):
+        await self._check_session(context)
+        return await self._recv_stream_async(request_iterator, ipv4_parser(context.peer()),
+                                             self._put_file_resolver(context), "put file stream")
+
+    async def put_blob_stream(self, request_iterator, context):
+        return await self._recv_stream_async(request_iterator, ipv4_parser(context.peer()), self._blob_resolver(),
+                                             "put blob stream")
+
+    async def has_blobs(self, request, context):
+        return await self._run(super().has_blobs, request, context)
+
+    async def link_blobs(self, request, context):
+        return await self._unary(super().link_blobs, request, context)
+
+    async def dir_manifest(self, request, context):
+        return await self._unary(super().dir_manifest, request, context)
+
+    async def block_digests(self, request, context):
+        return await self._unary(super().block_digests, request, context)
+
+    async def remove_files(self, request, context):
+        return await self._unary(super().remove_files, request, context)
+
+
+class AioRemoteTclProcess:
+    """
+    RemoteTclProcessPopen 的 grpc.aio 版本，用于在一个事件循环中同时管理大量远程会话
+        async with AioRemoteTclProcess(ip, port, session=True) as proc:
+            await proc.tcl("open_project ...")
+            async for lines in proc.tcl_stream("launch_runs impl_1 -jobs 8; wait_on_run impl_1"): ...
+    :param compress: 和服务端协商压缩 tcl 输出和文件块
+    :param session: 在服务端打开会话，独占一个解释器，close 时关闭
+    :param idle_timeout: 会话空闲超时, sec，0 为服务端默认，每 1/3 超时发送一次 keepalive
+    :param error_check: 输出中有 ERROR 时抛出对应的异常
+    aio 的 channel 绑定在创建它的事件循环上，不放入 ChannelPool，keepalive、重试和 deadline 与同步版本相同
+    """
+
+    def __init__(self, ip: str, port: int, compress: bool = True, session: bool = False, idle_timeout: float = 0,
+                 error_check: bool = True):
+        self.server_ip = ip
+        self.server_port = int(port)
+        self._compress = compress
+        self._session = session
+        self._idle_timeout = idle_timeout
+        self._error_check = error_check
+        self._channel = None  # type: grpc.aio.Channel or None
+        self._client = None  # type: RemoteTclStub or None
+        self._encodings = None  # type: List[str] or None
+        self._keepalive_task = None  # type: asyncio.Task or None
+        self.session_id = ""
+        self.session_info = None  # type: remote_tcl_pb2.SessionResponse or None
+        self.compression_stats = CompressionStats()
+
+    def __repr__(self):
+        return f"<AioRemoteTclProcess {self.server_ip}:{self.server_port} session: {self.session_id[:8]}>"
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    _check_grpc_resp_err = staticmethod(RemoteTclProcessPopen._check_grpc_resp_err)
+
+    def _metadata(self):
+        return ((SessionMetadataKey, self.session_id),) if self.session_id else None
+
+    async def open(self):
+        if self._channel is not None:
+            return
+        self._channel = grpc.aio.insecure_channel(f"{self.server_ip}:{self.server_port}",
+                                                  options=channel_options())
+        self._client = RemoteTclStub(self._channel)
+        if self._session:
+            await self.open_session()
+
+    async def close(self):
+        if self._channel is None:
+            return
+        await self.close_session()
+        await self._channel.close()
+        self._channel = None
+
+    async def open_session(self) -> str:
+        """ :return: session id，服务端不支持会话时为空 """
+        if self.session_id:
+            return self.session_id
+        try:
+            response = await self._client.open_session(remote_tcl_pb2.SessionRequest(
+                client_name=socket.gethostname(), idle_timeout=self._idle_timeout,
+                common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)), timeout=ControlDeadline)
+        except grpc.aio.AioRpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server does not support session, use the shared interpreter")
+            return ""
+        self._check_grpc_resp_err(response)
+
+        self.session_id = response.session_id
+        self.session_info = response
+        self._keepalive_task = asyncio.ensure_future(self._keepalive(response.session_id,
+                                                                     response.idle_timeout / 3))
+        logger.info(f"open session {response.session_id}, work dir: {response.work_dir}")
+        return response.session_id
+
+    async def _keepalive(self, session_id: str, interval: float):
+        while True:
+            await asyncio.sleep(max(interval, 1.0))
+            try:
+                self._check_grpc_resp_err(await self._client.keepalive(
+                    remote_tcl_pb2.SessionRequest(session_id=session_id), timeout=ControlDeadline))
+            except GRPCSessionErr as err:
+                logger.error(f"session {session_id} lost: {err}")
+                return
+            except grpc.aio.AioRpcError as err:
+                logger.warning(f"session {session_id} keepalive failed: {err.code()}")
+
+    async def close_session(self) -> None:
+        session_id = self.session_id
+        if not session_id:
+            return
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        self.session_id = ""
+        self.session_info = None
+        try:
+            await self._client.close_session(remote_tcl_pb2.SessionRequest(session_id=session_id),
+                                             timeout=ControlDeadline)
+        except grpc.aio.AioRpcError as err:
+            logger.warning(f"close session {session_id} failed: {err.code()}")
+        logger.info(f"close session {session_id}")
+
+    async def server_encodings(self) -> List[str]:
+        if self._encodings is None:
+            if not self._compress:
+                self._encodings = []
+                return self._encodings
+            try:
+                response = await self._client.encodings(
+                    remote_tcl_pb2.EncodingMessage(encodings=available_encodings()), timeout=ControlDeadline)
+                self._encodings = negotiate(response.encodings)
+            except grpc.aio.AioRpcError as err:
+                if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                    raise
+                self._encodings = []
+        return self._encodings
+
+    async def server_stats(self) -> Dict[str, float]:
+        response = await self._client.server_stats(remote_tcl_pb2.StatsRequest(), timeout=ControlDeadline)
+        return dict(response.values)
+
+    def _request(self, tcl: str, raw: bool, timeout: int, **kwargs):
+        tcl = tcl.strip(" ").strip("\n")
+        if not tcl:
+            raise ValueError("tcl can't be empty")
+        return remote_tcl_pb2.TclRequest(cmd=tcl, raw=bool(raw), timeout=int(timeout) if timeout else 0, block=True,
+                                         accept_encoding=available_encodings() if self._compress else [],
+                                         common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value), **kwargs)
+
+    async def tcl(self, tcl: str, raw: bool = False, timeout: int = None, error_check: bool = None) -> List[str]:
+        response = await self._client.tcl(self._request(tcl, raw, timeout), timeout=call_deadline(timeout),
+                                          metadata=self._metadata())
+        self._check_grpc_resp_err(response)
+        output = tcl_output(response, self.compression_stats)
+        logger.info(f"run tcl: {tcl}")
+
+        error_check = self._error_check if error_check is None else error_check
+        errors = [line for line in output if line.startswith("ERROR")] if error_check else []
+        if errors:
+            raise get_err_from_str(errors[-1])
+        return output
+
+    async def tcl_batch(self, cmds: Iterable[Union[str, dict]], stop_on_error: bool = True,
+                        error_check: bool = None) -> list:
+        """ 见 RemoteTclProcessPopen.tcl_batch，:return: List[TclFuture] """
+        from .tcl_batch import tcl_batch_options
+
+        error_check = self._error_check if error_check is None else error_check
+        options = [tcl_batch_options(cmd, error_check) for cmd in cmds]
+        response = await self._client.tcl_batch(batch_request(options, stop_on_error, self._compress),
+                                                 timeout=batch_deadline(options), metadata=self._metadata())
+        self._check_grpc_resp_err(response)
+        logger.info(f"run tcl batch: {len(response.results)}/{len(options)}")
+        return batch_futures(options, response, self.compression_stats)
+
+    async def tcl_stream(self, tcl: str, raw: bool = False, timeout: int = None, error_check: bool = None,
+                         batch_lines: int = 256, batch_interval: float = 0.5) -> AsyncIterator[List[str]]:
+        """ 见 RemoteTclProcessPopen.tcl_stream，命令出错时在输出全部返回后抛出 """
+        error_check = self._error_check if error_check is None else error_check
+        call = self._client.tcl_stream(self._request(tcl, raw, timeout, batch_lines=batch_lines,
+                                                     batch_interval=batch_interval),
+                                       timeout=call_deadline(timeout), metadata=self._metadata())
+        err = None
+        try:
+            async for frame in call:
+                self._check_grpc_resp_err(frame)
+                if frame.encoding:
+                    lines = decode_chunk(frame.encoding, frame.data, self.compression_stats).decode("utf-8").split("\n")
+                else:
+                    lines = list(frame.lines)
+                if error_check:
+                    for line in lines:
+                        if line.startswith("ERROR"):
+                            err = get_err_from_str(line)
+                if lines:
+                    yield lines
+        finally:
+            call.cancel()
+
+        logger.info(f"run tcl stream: {tcl}")
+        if err:
+            raise err
+
+    async def grpc_put_file(self, src_path, dst_path: str = "", timeout: int = 0, progress=None,
+                            chunk_size: int = DefaultChunkSize) -> str:
+        """ 分块上传，读文件和压缩在线程池中进行，见 RemoteTclProcessPopen.grpc_put_file """
+        start = time.time()
+        src_path = str(src_path)
+        if not os.path.isfile(src_path):
+            raise FileNotFoundError(src_path)
+        encoding = file_encoding(await self.server_encodings(), src_path)
+        chunks = iter_file_chunks(src_path, str(dst_path), min(chunk_size, MaxChunkSize), encoding,
+                                  self.compression_stats, progress)
+        response = await self._client.put_file_stream(aiter_in_executor(chunks), timeout=timeout if timeout else None,
+                                                      metadata=self._metadata())
+        self._check_grpc_resp_err(response)
+        logger.info(f"response put file {src_path} -> {response.dst_path}, size: {response.total_size}, "
+                    f"time_usage: {time.time() - start:.2f} s")
+        return response.dst_path
+
+    async def grpc_get_file(self, src_path, dst_path: str = "", timeout: int = 0, progress=None,
+                            chunk_size: int = DefaultChunkSize) -> Path:
+        """ 分块下载，先写入 .part，校验 sha256 后再 rename """
+        start = time.time()
+        loop = asyncio.get_running_loop()
+        dst = RemoteTclProcessPopen._local_dst(src_path, dst_path)
+        part = part_path(dst)
+        sha = hashlib.sha256()
+        size = 0
+        expect = None
+
+        call = self._client.get_file_stream(
+            remote_tcl_pb2.GetFileRequest(src_path=str(src_path), dst_path=str(dst_path), chunk_size=chunk_size,
+                                          accept_encoding=available_encodings() if self._compress else [],
+                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)),
+            timeout=timeout if timeout else None, metadata=self._metadata())
+
+        def write(f, chunk) -> int:
+            data = decode_chunk(chunk.encoding, chunk.content, self.compression_stats, MaxChunkSize)
+            f.write(data)
+            sha.update(data)
+            return len(data)
+
+        try:
+            with open(part, "wb") as f:
+                async for chunk in call:
+                    self._check_grpc_resp_err(chunk)
+                    if chunk.content:
+                        size += await loop.run_in_executor(None, write, f, chunk)
+                        if progress:
+                            progress(size, chunk.total_size)
+                    if chunk.last:
+                        expect = chunk.sha256
+
+            if expect is None:
+                raise ViFileChecksumError(f"get file stream ended without last chunk: {src_path}")
+            if expect != sha.hexdigest():
+                raise ViFileChecksumError(f"sha256 dont match, expect: {expect}, recv: {sha.hexdigest()}")
+            os.replace(part, dst)
+        finally:
+            if part.exists():
+                os.remove(part)
+
+        logger.info(f"request get file {dst} <- {src_path}, file_size: {size}, "
+                    f"time_usage: {time.time() - start:.2f} s")
+        return dst
@@ -0,0 +1,275 @@
+import logging
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import grpc
+
+from ..base.remote_base import GRPCSessionErr
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+远程服务端的会话
+    客户端 open_session 得到 session id，之后每个 rpc 在 metadata 中带上 vipytcl-session
+    每个会话独占一个解释器，工作目录和文件缓存目录在 <cache>/sessions/<id>/ 下，互不影响
+    解释器从预先启动的池中取出，会话关闭后终止（不复用，避免残留的工程状态），池在后台补充
+    解释器在会话的工作目录中启动，vivado.log / .Xil 也在其中，会话关闭时整个目录删除
+    没有 session id 的请求使用共享的解释器和按客户端地址区分的缓存目录，和旧版本一致
+    空闲超过 idle_timeout 或存在超过 max_age 的会话被回收，正在运行命令的会话不会被回收
+"""
+
+SessionMetadataKey = "vipytcl-session"
+
+
+class SessionLimitError(GRPCSessionErr):
+    pass
+
+
+class Session:
+    def __init__(self, session_id: str, client: str, root: Path, tcl_proc, idle_timeout: float):
+        self.id = session_id
+        self.client = client
+        self.root = root
+        self.work_dir = root / "work"
+        self.cache_dir = root / "files"
+        self.tcl_proc = tcl_proc
+        self.idle_timeout = idle_timeout
+        self.created = time.time()
+        self.last_seen = self.created
+        self.requests = 0
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Session {self.id} {self.client} busy: {self._busy}, idle: {self.idle:.0f} s>"
+
+    @property
+    def idle(self) -> float:
+        return 0.0 if self._busy else time.time() - self.last_seen
+
+    @property
+    def busy(self) -> bool:
+        return self._busy > 0
+
+    def __enter__(self):
+        with self._lock:
+            self._busy += 1
+            self.requests += 1
+            self.last_seen = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self._lock:
+            self._busy -= 1
+            self.last_seen = time.time()
+
+    def touch(self) -> None:
+        self.last_seen = time.time()
+
+
+class SessionManager:
+    """
+    :param factory: factory(work_dir) -> 在 work_dir 中启动的新解释器（BaseTclProcess）
+    :param root: 会话目录的父目录
+    :param max_sessions: 同时存在的会话上限
+    :param max_sessions_per_client: 每个客户端地址的会话上限，0 为不限制
+    :param idle_timeout: 默认空闲超时, sec，客户端可以要求更短
+    :param max_age: 会话最长存在时间, sec，0 为不限制
+    :param pool_size: 预先启动的空闲解释器数
+    """
+
+    def __init__(self, factory: Callable, root: str or Path, max_sessions: int = 8, max_sessions_per_client: int = 2,
+                 idle_timeout: float = 1800, max_age: float = 0, pool_size: int = 0):
+        self.factory = factory
+        self.root = Path(root)
+        self.max_sessions = max_sessions
+        self.max_sessions_per_client = max_sessions_per_client
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.pool_size = pool_size
+        self._sessions = {}  # session id: Session
+        self._opening = {}  # 正在启动解释器的会话，计入上限
+        self._pool = []  # type: List[Tuple[Path, object]]   # (会话目录, 解释器)
+        self._lock = threading.Lock()
+        self._filling = False
+        self._stopped = False
+        self.fill_pool()
+
+    def __repr__(self):
+        return f"<SessionManager sessions: {len(self._sessions)}/{self.max_sessions}, pool: {len(self._pool)}>"
+
+    def fill_pool(self) -> None:
+        """ 在后台启动解释器补足池 """
+        with self._lock:
+            if self._stopped or self._filling or len(self._pool) >= self.pool_size:
+                return
+            self._filling = True
+
+        def fill():
+            try:
+                while True:
+                    with self._lock:
+                        if len(self._pool) >= self.pool_size or \
+                                len(self._pool) + len(self._sessions) + len(self._opening) >= self.max_sessions:
+                            return
+                    root, proc = self._new_proc()
+                    with self._lock:
+                        if not self._stopped:
+                            self._pool.append((root, proc))
+                            continue
+                    proc.terminate()
+                    shutil.rmtree(root, ignore_errors=True)
+                    return
+            except Exception as err:
+                logger.error(f"session pool start interpreter failed: {err}")
+            finally:
+                with self._lock:
+                    self._filling = False
+
+        threading.Thread(target=fill, daemon=True, name="vipytcl_session_pool").start()
+
+    def _new_proc(self) -> Tuple[Path, object]:
+        root = self.root / uuid.uuid4().hex
+        (root / "work").mkdir(parents=True)
+        (root / "files").mkdir()
+        try:
+            return root, self.factory(root / "work")
+        except Exception:
+            shutil.rmtree(root, ignore_errors=True)
+            raise
+
+    def _take_proc(self) -> Tuple[Path, object]:
+        with self._lock:
+            if self._pool:
+                return self._pool.pop(0)
+        return self._new_proc()
+
+    def open(self, client: str, idle_timeout: float = 0) -> Session:
+        with self._lock:
+            if self._stopped:
+                raise SessionLimitError("session manager stopped")
+            n = len(self._sessions) + len(self._opening)
+            if n >= self.max_sessions:
+                raise SessionLimitError(f"too many sessions: {n}/{self.max_sessions}")
+            n = sum(1 for s in self._sessions.values() if s.client == client) + \
+                sum(1 for c in self._opening.values() if c == client)
+            if self.max_sessions_per_client and n >= self.max_sessions_per_client:
+                raise SessionLimitError(f"too many sessions for {client}: {n}/{self.max_sessions_per_client}")
+            ticket = uuid.uuid4().hex
+            self._opening[ticket] = client
+
+        try:
+            root, proc = self._take_proc()
+        finally:
+            with self._lock:
+                self._opening.pop(ticket, None)
+
+        timeout = min(idle_timeout, self.idle_timeout) if idle_timeout > 0 else self.idle_timeout
+        session = Session(root.name, client, root, proc, timeout)
+        session_id = session.id
+        with self._lock:
+            self._sessions[session_id] = session
+        logger.info(f"open session {session_id} for {client}, work dir: {session.work_dir}")
+        self.fill_pool()
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def close(self, session_id: str, remove_files: bool = True) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            del self._sessions[session_id]
+
+        logger.info(f"close session {session_id} for {session.client}, requests: {session.requests}")
+        try:
+            session.tcl_proc.terminate()
+        except Exception as err:
+            logger.error(f"terminate session {session_id} interpreter failed: {err}")
+        if remove_files:
+            shutil.rmtree(session.root, ignore_errors=True)
+        self.fill_pool()
+        return True
+
+    def sessions(self) -> List[Session]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def reap(self) -> List[str]:
+        """ 回收空闲超时或超过最长存在时间的会话，:return: 回收的 session id """
+        now = time.time()
+        expired = []
+        for session in self.sessions():
+            if session.busy:
+                continue
+            if session.idle > session.idle_timeout or (self.max_age and now - session.created > self.max_age):
+                expired.append(session.id)
+        for session_id in expired:
+            logger.info(f"reap session {session_id}")
+            self.close(session_id)
+        return expired
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+        for session in self.sessions():
+            self.close(session.id)
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for root, proc in pool:
+            proc.terminate()
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def session_id_from_context(context) -> str:
+    for key, value in context.invocation_metadata():
+        if key == SessionMetadataKey:
+            return value
+    return ""
+
+
+class _ClientCallDetails(grpc.ClientCallDetails):
+    def __init__(self, details, metadata):
+        self.method = details.method
+        self.timeout = details.timeout
+        self.metadata = metadata
+        self.credentials = details.credentials
+        self.wait_for_ready = getattr(details, "wait_for_ready", None)
+        self.compression = getattr(details, "compression", None)
+
+
+class SessionInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                         grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """ 客户端拦截器，session_id 不为空时在每个 rpc 的 metadata 中带上 """
+
+    def __init__(self):
+        self.session_id = ""
+
+    def _details(self, details):
+        if not self.session_id:
+            return details
+        metadata = list(details.metadata) if details.metadata else []
+        metadata.append((SessionMetadataKey, self.session_id))
+        return _ClientCallDetails(details, metadata)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return continuation(self._details(client_call_details), request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return continuation(self._details(client_call_details), request)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return continuation(self._details(client_call_details), request_iterator)
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return continuation(self._details(client_call_details), request_iterator)
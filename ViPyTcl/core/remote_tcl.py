@@ -1,23 +1,44 @@
+import hashlib
 import logging
 import os
+import socket
 import sys
+import threading
 import time
 import traceback
+import uuid
 from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import apscheduler.schedulers.background
 import grpc
 
 from . import remote_tcl_pb2
-from .remote_tcl_pb2_grpc import RemoteTclServicer, RemoteTclStub, RemoteTcl, add_RemoteTclServicer_to_server
+from .remote_tcl_pb2_grpc import RemoteTclServicer, RemoteTclStub
 from ..base.remote_base import *
-from .tcl_process import TclProcessPopen, BaseTclProcess
+from ..base.vivado_error import ViFileChecksumError, ViTclCantRunError, get_err_from_str
+from ..utils.tools import file_digest
+from .admission import AdmissionControl, ControlThreads
+from .blob_store import BlobStore
+from .channel_pool import ChannelPool, ControlDeadline, ServerOptions, call_deadline, default_pool
+from .dir_sync import DefaultBlockSize, DirSync, ManifestEntry, SyncResult, block_digests, build_manifest, \
+    iter_delta, walk_files
+from .compression import ChunkEncoder, CompressionStats, available_encodings, choose_encoding, decode_chunk, \
+    file_encoding, negotiate
+from .remote_session import Session, SessionInterceptor, SessionLimitError, SessionManager, \
+    session_id_from_context
+from .tcl_process import TclProcessPopen, BaseTclProcess, clean_vivado_cache
 
 logger = logging.getLogger("ViPyTcl")
 
+DefaultChunkSize = 1 << 20
+# gRPC 默认单条消息上限 4 MB
+MaxChunkSize = 3 << 20
+
 
 def clean_file_cache(cache, expire_days: int = 15):
     if not os.path.isdir(cache):
@@ -63,8 +84,19 @@ def ipv4_parser(ip_str: str) -> Tuple[str, int]:
 
 
 class GRPCServer:
-    def __init__(self, worker: int = 10, use_aps: bool = True):
-        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=worker))
+    def __init__(self, worker: int = 10, use_aps: bool = True, admission: AdmissionControl or bool = True):
+        """
+        :param admission: 准入控制，True 时使用默认的限制，False 时不限制
+            受限的 rpc 排队时占用线程，worker 至少为 admission.max_threads + ControlThreads，
+            超过 worker 的请求由 grpc 直接以 RESOURCE_EXHAUSTED 拒绝，不在线程池中无限排队
+        """
+        self.admission = AdmissionControl() if admission is True else (admission if admission else None)
+        if self.admission is not None:
+            worker = max(worker, self.admission.max_threads + ControlThreads)
+            self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=worker), options=ServerOptions,
+                                       interceptors=(self.admission,), maximum_concurrent_rpcs=worker)
+        else:
+            self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=worker), options=ServerOptions)
         self._is_run = False
         if use_aps:
             self._aps = apscheduler.schedulers.background.BackgroundScheduler(timezone='Asia/Shanghai')
@@ -76,6 +108,8 @@ class GRPCServer:
         self._aps.add_job(*args, **kwargs)
 
     def add_servicer(self, add_servicer_func, servicer):
+        if hasattr(servicer, "admission"):
+            servicer.admission = self.admission
         add_servicer_func(servicer, self._server)
         logger.info(f"GRPC Server add servicer {servicer.__class__.__name__}")
 
@@ -91,7 +125,8 @@ class GRPCServer:
     def start(self):
         if self._is_run:
             return
-        self._aps.start()
+        if self._aps is not None:
+            self._aps.start()
         self._server.start()
         self._is_run = True
         logger.info("GRPC Server start")
@@ -104,7 +139,7 @@ class GRPCServer:
         for func, _ in self._stop_callback.items():
             func(*_[0], **_[1])
 
-        if self._aps.running:
+        if self._aps is not None and self._aps.running:
             self._aps.shutdown()
 
         self._server.stop(0)
@@ -112,21 +147,239 @@ class GRPCServer:
         logger.info("GRPC Server stop done")
 
 
+def part_path(dst: Path) -> Path:
+    """ 接收中的临时文件，每次传输唯一，同一个目标被同时写入时互不影响 """
+    return dst.with_name(f"{dst.name}.{uuid.uuid4().hex[:8]}.part")
+
+
+class _ChunkReceiver:
+    """ 分块接收的状态，同步和 asyncio 的服务端共用，feed / finish 可以在线程池中调用 """
+
+    def __init__(self, addr: Tuple[str, int], resolve, name: str, stats: CompressionStats):
+        self.addr = addr
+        self.resolve = resolve
+        self.name = name
+        self.stats = stats
+        self.src = self.dst = self.part = None
+        self.commit = None
+        self.f = self.base = None
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.expect = ""
+
+    def feed(self, chunk) -> None:
+        if self.f is None:
+            self.src = Path(chunk.src_path)
+            self.dst, self.part, self.commit = self.resolve(chunk)
+            logger.debug(f"{self.name} from {self.addr}: size: {chunk.total_size}, {self.src} -> {self.dst}")
+            self.f = open(self.part, "wb")
+        if chunk.copy_length:
+            # 块比较上传，未改变的部分从目标文件的旧内容复制
+            self.base = self.base if self.base is not None else open(self.dst, "rb")
+            self.base.seek(chunk.offset)
+            remain = chunk.copy_length
+            while remain:
+                data = self.base.read(min(remain, DefaultChunkSize))
+                if not data:
+                    raise ViFileChecksumError(f"copy range out of base file: {self.dst}")
+                self.f.write(data)
+                self.sha.update(data)
+                remain -= len(data)
+            self.size += chunk.copy_length
+        if chunk.content:
+            data = decode_chunk(chunk.encoding, chunk.content, self.stats, MaxChunkSize)
+            self.f.write(data)
+            self.sha.update(data)
+            self.size += len(data)
+        if chunk.last:
+            self.expect = chunk.sha256
+
+    def finish(self) -> None:
+        if self.base is not None:
+            self.base.close()
+        if self.f is None:
+            raise FileNotFoundError(f"empty {self.name}")
+        self.f.close()
+
+        if self.expect and self.expect != self.sha.hexdigest():
+            raise ViFileChecksumError(f"sha256 dont match, expect: {self.expect}, recv: {self.sha.hexdigest()}")
+        self.commit(self.part, self.sha.hexdigest())
+        logger.debug(f"{self.name} from {self.addr}: {self.src} -> {self.dst}, size: {self.size}")
+
+    def response(self, exc: Exception = None):
+        """ 清理临时文件，在 except 中调用时 err_info 为当前的 traceback """
+        src, dst, name = self.src, self.dst, self.name
+        if exc is None:
+            stat, err, err_info = MsgStat.Done, 0, ""
+        elif isinstance(exc, FileNotFoundError):
+            logger.error(f"{name} failed, file not found: {src} -> {dst}")
+            stat, err, err_info = MsgStat.Fail, GRPCErrCode.FileNotFoundErr, traceback.format_exc()
+            logger.error(err_info)
+        elif isinstance(exc, ViFileChecksumError):
+            logger.error(f"{name} failed, checksum: {src} -> {dst}")
+            stat, err, err_info = MsgStat.Fail, GRPCErrCode.FileChecksumErr, traceback.format_exc()
+            logger.error(err_info)
+        else:
+            logger.error(f"{name} failed: {src} -> {dst}")
+            stat, err, err_info = MsgStat.Fail, GRPCErrCode.UnknownErr, traceback.format_exc()
+            logger.error(err_info)
+
+        if self.f is not None and not self.f.closed:
+            self.f.close()
+        if self.base is not None and not self.base.closed:
+            self.base.close()
+        if self.part is not None and self.part.exists():
+            os.remove(self.part)
+
+        return remote_tcl_pb2.PutFileResponse(src_path=str(src) if src else "",
+                                              dst_path=str(dst) if dst else "",
+                                              size=min(self.size, 2 ** 31 - 1), total_size=self.size,
+                                              sha256=self.sha.hexdigest() if not err else "",
+                                              common=remote_tcl_pb2.Common(stat=stat.value, err=err, err_info=err_info))
+
+
 class GRPCRemoteTclServicer(RemoteTclServicer):
-    def __init__(self, *args, **kwargs):
-        self._tcl_proc = TclProcessPopen(*args, error_check=False, **kwargs)  # type: TclProcessPopen or None
-        self._cache = Path(".cache")
+    _tcl_factory = None
+    _shared_lock = threading.Lock()
+    sessions = None  # type: SessionManager or None
+    admission = None  # type: AdmissionControl or None   # GRPCServer.add_servicer 设置
+
+    def __init__(self, *args, max_sessions: int = 8, max_sessions_per_client: int = 2, idle_timeout: float = 1800,
+                 max_age: float = 0, pool_size: int = 0, hardlink_blobs: bool = False, **kwargs):
+        """
+        没有会话的请求共用一个解释器，第一次使用时启动；open_session 的客户端各自使用一个解释器
+        会话参数见 SessionManager，其余参数传给 TclProcessPopen
+        :param hardlink_blobs: 文件系统不支持 reflink 时 link_blobs 使用硬链接而不是复制，链接出的文件只读，见 BlobStore
+        """
+
+        def factory(cwd=None):
+            return TclProcessPopen(*args, error_check=False, **(dict(kwargs, cwd=str(cwd)) if cwd else kwargs))
+
+        self._tcl_factory = factory
+        self._tcl_proc = None  # type: TclProcessPopen or None
+        self._init_cache(Path(".cache"), hardlink_blobs)
+        self.sessions = SessionManager(factory, self._cache / "sessions", max_sessions=max_sessions,
+                                       max_sessions_per_client=max_sessions_per_client, idle_timeout=idle_timeout,
+                                       max_age=max_age, pool_size=pool_size)
+
+    def _init_cache(self, cache: Path, hardlink_blobs: bool = False):
+        self._cache = cache
         self._cache.mkdir(exist_ok=True)
+        self._blob_store = BlobStore(self._cache / "blobs", hardlink_blobs)
+        self.compression_stats = CompressionStats()
+        self._digest_memo = {}  # type: Dict[Tuple[str, int, int], str]
 
     def stop(self):
-        self._tcl_proc.terminate()
+        if self.sessions is not None:
+            self.sessions.stop()
+        if self._tcl_proc is not None:
+            self._tcl_proc.terminate()
+
+    def clean_vivado_cache(self, expire_days: int = 15):
+        clean_vivado_cache(os.getcwd(), expire_days)
+
+    def clean_file_cache(self, expire_days: int = 15):
+        """ 会话目录由会话自己清理 """
+        for path in self._cache.iterdir():
+            if path.is_dir() and path.name != "sessions":
+                clean_file_cache(path, expire_days)
+
+    def reap_sessions(self):
+        if self.sessions is not None:
+            self.sessions.reap()
+
+    def _shared_proc(self) -> BaseTclProcess:
+        """ 没有会话的请求共用的解释器 """
+        with self._shared_lock:
+            if self._tcl_proc is None:
+                if self._tcl_factory is None:
+                    raise ViTclCantRunError("no tcl interpreter on this server")
+                self._tcl_proc = self._tcl_factory()
+            return self._tcl_proc
+
+    def _session(self, context) -> Optional[Session]:
+        """ metadata 中的会话，没有时为 None，会话已关闭或被回收时中止 rpc """
+        session_id = session_id_from_context(context)
+        if not session_id:
+            return None
+        session = self.sessions.get(session_id) if self.sessions is not None else None
+        if session is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"session not found: {session_id}")
+        return session
+
+    @contextmanager
+    def _using(self, session: Optional[Session]):
+        """ 运行命令期间会话为 busy，不会被回收 """
+        if session is None:
+            yield self._shared_proc()
+        else:
+            with session:
+                yield session.tcl_proc
+
+    def _session_response(self, session: Optional[Session], err_info: str = "", err: int = 0):
+        stat = MsgStat.Fail if err else MsgStat.Done
+        common = remote_tcl_pb2.Common(stat=stat.value, err=err, err_info=err_info)
+        if session is None:
+            return remote_tcl_pb2.SessionResponse(common=common)
+        return remote_tcl_pb2.SessionResponse(session_id=session.id, work_dir=str(session.work_dir.absolute()),
+                                              cache_dir=str(session.cache_dir.absolute()),
+                                              idle_timeout=session.idle_timeout, common=common)
+
+    def server_stats(self, request, context):
+        """ 准入控制的队列深度、等待时间，会话数 """
+        values = {}
+        if self.admission is not None:
+            for name, stats in self.admission.snapshot().items():
+                values.update({f"admission.{name}.{key}": value for key, value in stats.items()})
+        if self.sessions is not None:
+            values["sessions.active"] = len(self.sessions.sessions())
+            values["sessions.busy"] = sum(1 for s in self.sessions.sessions() if s.busy)
+        values["compression.saved_bytes"] = self.compression_stats.saved_bytes
+        return remote_tcl_pb2.StatsResponse(values=values, common=remote_tcl_pb2.Common(stat=MsgStat.Done.value))
+
+    def open_session(self, request, context):
+        addr = ipv4_parser(context.peer())
+        # 会话上限按地址计算，client_name 只用于日志
+        client = addr[0]
+        logger.info(f"open session request from {addr}, name: {request.client_name}")
+        if self.sessions is None:
+            return self._session_response(None, "sessions not supported", GRPCErrCode.SessionLimitErr)
+        try:
+            session = self.sessions.open(client, request.idle_timeout)
+        except SessionLimitError as err:
+            logger.warning(f"open session from {addr} refused: {err}")
+            return self._session_response(None, str(err), GRPCErrCode.SessionLimitErr)
+        except Exception:
+            logger.error(f"open session from {addr} failed")
+            logger.error(traceback.format_exc())
+            return self._session_response(None, traceback.format_exc(), GRPCErrCode.UnknownErr)
+        return self._session_response(session)
+
+    def close_session(self, request, context):
+        if self.sessions is None or not self.sessions.close(request.session_id):
+            return self._session_response(None, f"session not found: {request.session_id}",
+                                          GRPCErrCode.SessionNotFoundErr)
+        return self._session_response(None)
+
+    def keepalive(self, request, context):
+        session = self.sessions.get(request.session_id) if self.sessions is not None else None
+        if session is None:
+            return self._session_response(None, f"session not found: {request.session_id}",
+                                          GRPCErrCode.SessionNotFoundErr)
+        return self._session_response(session)
+
+    def encodings(self, request, context):
+        return remote_tcl_pb2.EncodingMessage(encodings=negotiate(request.encodings),
+                                              common=remote_tcl_pb2.Common(stat=MsgStat.Done.value))
 
     def tcl(self, request, context):
         logger.info(
             f"tcl request from {ipv4_parser(context.peer())}: '{request.cmd}', raw: {request.raw}, timeout: {request.timeout}, block: {request.block}")
+        session = self._session(context)
 
         try:
-            output = self._tcl_proc.tcl(request.cmd, timeout=request.timeout, raw=request.raw, block=request.block)
+            with self._using(session) as proc:
+                output = proc.tcl(request.cmd, timeout=request.timeout, raw=request.raw, block=request.block)
             output = "\n".join(output)
             stat = MsgStat.Done
             err = 0
@@ -136,14 +389,14 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             logger.debug(
                 f"tcl resp to {ipv4_parser(context.peer())}: \n{resp}")
 
-        except TimeoutError as err:
+        except TimeoutError:
             err_info = f"tcl exec timeout {request.timeout}: '{request.cmd}'"
             logger.error(err_info)
             stat = MsgStat.Timeout
             err = GRPCErrCode.TclRunTimeoutErr
             output = ""
 
-        except Exception as err:
+        except Exception:
             logger.error(
                 f"tcl exec failed: '{request.cmd}'"
             )
@@ -153,32 +406,142 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             output = ""
             logger.error(err_info)
 
+        return self._tcl_response(request, output, stat, err, err_info, request.accept_encoding)
+
+    def _tcl_response(self, request, output: str, stat: MsgStat, err: int, err_info: str, accept_encoding):
+        """ 输出较大且客户端支持时压缩 """
+        encoding = choose_encoding(accept_encoding, len(output))
+        output_data = b""
+        if encoding:
+            encoding, output_data = ChunkEncoder(encoding, self.compression_stats).encode(output.encode("utf-8"))
+            if encoding:
+                output = ""
+            else:
+                output_data = b""
+
         return remote_tcl_pb2.TclResponse(cmd=request.cmd, output=output, raw=request.raw,
                                           timeout=request.timeout, block=request.block,
+                                          encoding=encoding, output_data=output_data,
                                           common=remote_tcl_pb2.Common(stat=stat.value, err=err, err_info=err_info))
 
+    def tcl_batch(self, request, context):
+        """
+        连续运行多条命令，期间不会插入其它客户端的命令
+        error_check 的命令输出中有 ERROR 时为 TclRunErr，err_info 为最后一条 ERROR
+        """
+        addr = ipv4_parser(context.peer())
+        logger.info(f"tcl batch request from {addr}: cmds: {len(request.cmds)}, stop_on_error: {request.stop_on_error}")
+        session = self._session(context)
+        start = time.time()
+        results = []
+        with self._using(session) as proc, proc._lock:
+            for req in request.cmds:
+                logger.debug(f"tcl batch cmd from {addr}: '{req.cmd}'")
+                try:
+                    output = proc.tcl(req.cmd, timeout=req.timeout, raw=req.raw, error_check=False)
+                    errors = [line for line in output if line.startswith("ERROR")] if req.error_check else []
+                    output = "\n".join(output)
+                    if errors:
+                        stat, err, err_info = MsgStat.Fail, GRPCErrCode.TclRunErr, errors[-1]
+                    else:
+                        stat, err, err_info = MsgStat.Done, 0, ""
+
+                except TimeoutError:
+                    err_info = f"tcl exec timeout {req.timeout}: '{req.cmd}'"
+                    logger.error(err_info)
+                    output, stat, err = "", MsgStat.Timeout, GRPCErrCode.TclRunTimeoutErr
+
+                except Exception:
+                    logger.error(f"tcl batch exec failed: '{req.cmd}'")
+                    output, stat, err, err_info = "", MsgStat.Fail, GRPCErrCode.UnknownErr, traceback.format_exc()
+                    logger.error(err_info)
+
+                results.append(self._tcl_response(req, output, stat, err, err_info, request.accept_encoding))
+                if err and request.stop_on_error:
+                    break
+
+        logger.info(f"tcl batch resp to {addr}: run: {len(results)}/{len(request.cmds)}, "
+                    f"time_usage: {time.time() - start:.2f} s")
+        return remote_tcl_pb2.TclBatchResponse(results=results,
+                                               common=remote_tcl_pb2.Common(stat=MsgStat.Done.value))
+
+    def tcl_stream(self, request, context):
+        """ 按批转发输出，grpc 发送不出去时生成器不再取，tcl_stream 的队列满后 vivado 输出随之阻塞 """
+        addr = ipv4_parser(context.peer())
+        logger.info(f"tcl stream request from {addr}: '{request.cmd}', raw: {request.raw}, timeout: {request.timeout}")
+        batch_lines = request.batch_lines if request.batch_lines > 0 else 256
+        batch_interval = request.batch_interval if request.batch_interval > 0 else 0.5
+        session = self._session(context)
+        try:
+            with self._using(session) as proc:
+                for batch in proc.tcl_stream(request.cmd, raw=request.raw, timeout=request.timeout,
+                                             batch_lines=batch_lines, batch_interval=batch_interval):
+                    lines, encoding, data = batch, "", b""
+                    text = "\n".join(batch)
+                    encoding = choose_encoding(request.accept_encoding, len(text))
+                    if encoding:
+                        encoding, data = ChunkEncoder(encoding, self.compression_stats).encode(text.encode("utf-8"))
+                        lines = [] if encoding else batch
+                        data = data if encoding else b""
+                    yield remote_tcl_pb2.TclOutput(lines=lines, encoding=encoding, data=data,
+                                                   common=remote_tcl_pb2.Common(stat=MsgStat.Run.value))
+            stat, err, err_info = MsgStat.Done, 0, ""
+
+        except TimeoutError:
+            err_info = f"tcl exec timeout {request.timeout}: '{request.cmd}'"
+            logger.error(err_info)
+            stat, err = MsgStat.Timeout, GRPCErrCode.TclRunTimeoutErr
+
+        except Exception:
+            logger.error(f"tcl stream exec failed: '{request.cmd}'")
+            stat, err, err_info = MsgStat.Fail, GRPCErrCode.UnknownErr, traceback.format_exc()
+            logger.error(err_info)
+
+        yield remote_tcl_pb2.TclOutput(last=True, common=remote_tcl_pb2.Common(stat=stat.value, err=err,
+                                                                                err_info=err_info))
+
+    def _client_dir(self, context) -> Path:
+        """ 相对路径的根目录: 会话的缓存目录，没有会话时按客户端地址区分 """
+        session = self._session(context)
+        if session is not None:
+            return session.cache_dir
+        addr = ipv4_parser(context.peer())
+        return self._cache / f"{addr[0]}_{addr[1]}"
+
+    def _put_dst(self, src: Path, dst: Path, client_dir: Path) -> Path:
+        """ 绝对路径要求父目录存在，相对路径放在该客户端的缓存目录下，目录时使用 src 的文件名 """
+        if dst.is_absolute():
+            if not dst.parent.exists():
+                raise FileNotFoundError
+
+            elif dst.is_dir():
+                dst = dst / src.name
+
+        else:
+            dst = client_dir / dst
+            if dst.is_dir():
+                dst = dst / src.name
+            os.makedirs(dst.parent, exist_ok=True)
+
+        return dst.absolute()
+
+    def _get_src(self, src: Path, client_dir: Path) -> Path:
+        if not src.is_absolute():
+            src = client_dir / src
+        if not src.is_file():
+            raise FileNotFoundError
+        return src.absolute()
+
     def put_file(self, request, context):
         addr = ipv4_parser(context.peer())
         logger.debug(
             f"put file request from {addr}: size: {request.size}, {request.src_path} -> {request.dst_path}, ")
         src = Path(request.src_path)
         dst = Path(request.dst_path)
+        client_dir = self._client_dir(context)
 
         try:
-            if dst.is_absolute():
-                if not dst.parent.exists():
-                    raise FileNotFoundError
-
-                elif dst.is_dir():
-                    dst = dst / src.name
-
-            else:
-                dst = self._cache / f"{addr[0]}_{addr[1]}" / dst
-                if dst.is_dir():
-                    dst = dst / src.name
-                os.makedirs(dst.parent, exist_ok=True)
-
-            dst = dst.absolute()
+            dst = self._put_dst(src, dst, client_dir)
             with open(dst, "wb") as f:
                 f.write(request.content)
             size = os.path.getsize(dst)
@@ -188,7 +551,7 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             err_info = ""
             logger.debug(f"put file req from {ipv4_parser(context.peer())}: {src} -> {dst}, size: {size}")
 
-        except FileNotFoundError as err:
+        except FileNotFoundError:
             logger.error(
                 f"put file failed, file not found: {request.src_path} -> {request.dst_path}"
             )
@@ -198,7 +561,7 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             err_info = traceback.format_exc()
             logger.error(err_info)
 
-        except Exception as err:
+        except Exception:
             logger.error(
                 f"put file failed: {request.src_path} -> {request.dst_path}"
             )
@@ -220,15 +583,10 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
         logger.debug(
             f"get file request from {addr}: {request.dst_path} <- {request.src_path}, ")
         src = Path(request.src_path)
+        client_dir = self._client_dir(context)
 
         try:
-            if src.is_absolute() and not src.is_file():
-                raise FileNotFoundError
-            else:
-                src = self._cache / "-".join(addr) / src
-                if not os.path.isfile(src):
-                    raise FileNotFoundError
-
+            src = self._get_src(src, client_dir)
             with open(src, "rb") as f:
                 file_bytes = f.read()
                 file_bytes_len = len(file_bytes)
@@ -240,7 +598,7 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             logger.debug(
                 f"get file req from {ipv4_parser(context.peer())}: {request.dst_path} <- {src}, size: {file_bytes_len}")
 
-        except FileNotFoundError as err:
+        except FileNotFoundError:
             logger.error(
                 f"put file failed, file not found: {request.src_path} -> {request.dst_path}"
             )
@@ -251,7 +609,7 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             err_info = traceback.format_exc()
             logger.error(err_info)
 
-        except Exception as err:
+        except Exception:
             logger.error(
                 f"get file failed: {request.dst_path} <- {request.src_path}"
             )
@@ -269,16 +627,311 @@ class GRPCRemoteTclServicer(RemoteTclServicer):
             size=file_bytes_len, content=file_bytes,
             common=remote_tcl_pb2.Common(stat=stat.value, err=err, err_info=err_info))
 
+    def _recv_stream(self, request_iterator, addr: Tuple[str, int], resolve, name: str):
+        """
+        分块接收，先写入 .part，校验 sha256 后由 commit 放到最终位置
+        :param resolve: resolve(first_chunk) -> (dst, part, commit)
+        """
+        receiver = _ChunkReceiver(addr, resolve, name, self.compression_stats)
+        try:
+            for chunk in request_iterator:
+                receiver.feed(chunk)
+            receiver.finish()
+        except Exception as err:
+            return receiver.response(err)
+        return receiver.response()
+
+    def _put_file_resolver(self, context):
+        client_dir = self._client_dir(context)
+
+        def resolve(chunk):
+            dst = self._put_dst(Path(chunk.src_path), Path(chunk.dst_path), client_dir)
+            return dst, part_path(dst), lambda part, _: os.replace(part, dst)
+
+        return resolve
+
+    def _blob_resolver(self):
+        """ 第一个块的 sha256 为 blob 的摘要，接收后的摘要必须和它一致 """
+
+        def resolve(chunk):
+            expect = chunk.sha256
+
+            def commit(part, digest):
+                if digest != expect:
+                    raise ViFileChecksumError(f"blob sha256 dont match, expect: {expect}, recv: {digest}")
+                self._blob_store.add(expect, part)
+
+            return self._blob_store.path(expect), self._blob_store.part_path(expect), commit
+
+        return resolve
+
+    def put_file_stream(self, request_iterator, context):
+        return self._recv_stream(request_iterator, ipv4_parser(context.peer()), self._put_file_resolver(context),
+                                 "put file stream")
+
+    def put_blob_stream(self, request_iterator, context):
+        return self._recv_stream(request_iterator, ipv4_parser(context.peer()), self._blob_resolver(),
+                                 "put blob stream")
+
+    def _blob_response(self, blobs, err_info: str = "", err: int = 0):
+        stat = MsgStat.Fail if err else MsgStat.Done
+        return remote_tcl_pb2.BlobResponse(blobs=blobs,
+                                           common=remote_tcl_pb2.Common(stat=stat.value, err=err, err_info=err_info))
+
+    def has_blobs(self, request, context):
+        """ 返回缺少的 blob """
+        try:
+            missing = [b for b in request.blobs if not self._blob_store.has(b.sha256, b.size)]
+        except Exception:
+            logger.error(f"has blobs failed from {ipv4_parser(context.peer())}")
+            logger.error(traceback.format_exc())
+            return self._blob_response([], traceback.format_exc(), GRPCErrCode.UnknownErr)
+        logger.debug(f"has blobs from {ipv4_parser(context.peer())}: {len(request.blobs)}, missing: {len(missing)}")
+        return self._blob_response(missing)
+
+    def link_blobs(self, request, context):
+        """ 在每个 dst_path 处生成对应 blob 的内容，目标路径规则和 put_file 相同，绝对路径时会创建父目录 """
+        addr = ipv4_parser(context.peer())
+        client_dir = self._client_dir(context)
+        linked = []
+        try:
+            for blob in request.blobs:
+                if not self._blob_store.has(blob.sha256, blob.size):
+                    raise FileNotFoundError(f"blob not found: {blob.sha256} for {blob.dst_path}")
+                dst = Path(blob.dst_path)
+                if dst.is_absolute():
+                    os.makedirs(dst.parent, exist_ok=True)
+                dst = self._put_dst(Path(blob.src_path), dst, client_dir)
+                method = self._blob_store.link(blob.sha256, dst)
+                linked.append(remote_tcl_pb2.Blob(sha256=blob.sha256, size=blob.size, src_path=blob.src_path,
+                                                  dst_path=str(dst), method=method))
+        except FileNotFoundError:
+            logger.error(f"link blobs failed, file not found, from {addr}")
+            logger.error(traceback.format_exc())
+            return self._blob_response(linked, traceback.format_exc(), GRPCErrCode.FileNotFoundErr)
+        except Exception:
+            logger.error(f"link blobs failed from {addr}")
+            logger.error(traceback.format_exc())
+            return self._blob_response(linked, traceback.format_exc(), GRPCErrCode.UnknownErr)
+
+        logger.debug(f"link blobs from {addr}: {len(linked)}")
+        return self._blob_response(linked)
+
+    def _dir_path(self, dir_path: Path, client_dir: Path) -> Path:
+        if not dir_path.is_absolute():
+            dir_path = client_dir / dir_path
+        return dir_path.absolute()
+
+    def _local_digest(self, path: str) -> str:
+        stat = os.stat(path)
+        memo = (path, stat.st_size, stat.st_mtime_ns)
+        if memo not in self._digest_memo:
+            self._digest_memo[memo] = file_digest(path)
+        return self._digest_memo[memo]
+
+    def _manifest_response(self, dir_path, entries, err_info: str = "", err: int = 0):
+        stat = MsgStat.Fail if err else MsgStat.Done
+        return remote_tcl_pb2.ManifestResponse(dir_path=str(dir_path).replace("\\", "/"), entries=entries,
+                                               common=remote_tcl_pb2.Common(stat=stat.value, err=err,
+                                                                            err_info=err_info))
+
+    def dir_manifest(self, request, context):
+        """ 目录下每个文件的大小、修改时间和 sha256，摘要按 (path, size, mtime_ns) 缓存，paths 不为空时只列出这些文件 """
+        addr = ipv4_parser(context.peer())
+        dir_path = self._dir_path(Path(request.dir_path), self._client_dir(context))
+        if not dir_path.is_dir():
+            return self._manifest_response(dir_path, [], f"dir not found: {dir_path}", GRPCErrCode.FileNotFoundErr)
+        try:
+            root = dir_path.resolve()
+            for rel in request.paths:
+                if root not in (dir_path / rel).resolve().parents:
+                    raise PermissionError(f"path out of dir: {rel}")
+            manifest = build_manifest(str(dir_path), self._local_digest, request.exclude, request.paths)
+        except Exception:
+            logger.error(f"dir manifest failed: {dir_path}")
+            logger.error(traceback.format_exc())
+            return self._manifest_response(dir_path, [], traceback.format_exc(), GRPCErrCode.UnknownErr)
+
+        logger.debug(f"dir manifest from {addr}: {dir_path}, files: {len(manifest)}")
+        return self._manifest_response(dir_path, [
+            remote_tcl_pb2.ManifestEntry(path=e.path, size=e.size, mtime=e.mtime, sha256=e.sha256)
+            for e in manifest.values()])
+
+    def remove_files(self, request, context):
+        """ 删除目录下的文件，不允许删除目录以外的文件 """
+        addr = ipv4_parser(context.peer())
+        dir_path = self._dir_path(Path(request.dir_path), self._client_dir(context))
+        removed = []
+        try:
+            root = dir_path.resolve()
+            for rel in request.paths:
+                path = (dir_path / rel).resolve()
+                if root not in path.parents:
+                    raise PermissionError(f"path out of dir: {rel}")
+                if path.is_file():
+                    os.remove(path)
+                    removed.append(remote_tcl_pb2.ManifestEntry(path=rel))
+        except Exception:
+            logger.error(f"remove files failed: {dir_path}")
+            logger.error(traceback.format_exc())
+            return self._manifest_response(dir_path, removed, traceback.format_exc(), GRPCErrCode.UnknownErr)
+
+        logger.debug(f"remove files from {addr}: {dir_path}, files: {len(removed)}")
+        return self._manifest_response(dir_path, removed)
+
+    def block_digests(self, request, context):
+        """ 文件每个块的 blake2b-128，用于块比较上传 """
+        common = remote_tcl_pb2.Common(stat=MsgStat.Done.value)
+        block_size = request.block_size if request.block_size > 0 else DefaultBlockSize
+        client_dir = self._client_dir(context)
+        try:
+            path = self._get_src(Path(request.path), client_dir)
+            digests = block_digests(str(path), block_size)
+        except FileNotFoundError:
+            return remote_tcl_pb2.BlockDigestResponse(path=request.path, common=remote_tcl_pb2.Common(
+                stat=MsgStat.Fail.value, err=GRPCErrCode.FileNotFoundErr, err_info=f"file not found: {request.path}"))
+        return remote_tcl_pb2.BlockDigestResponse(path=str(path), size=os.path.getsize(path), block_size=block_size,
+                                                  digests=digests, common=common)
+
+    def get_file_stream(self, request, context):
+        """ 分块发送，最后一个块带整个文件的 sha256 """
+        addr = ipv4_parser(context.peer())
+        chunk_size = min(request.chunk_size, MaxChunkSize) if request.chunk_size > 0 else DefaultChunkSize
+        src = Path(request.src_path)
+        logger.debug(f"get file stream request from {addr}: {request.dst_path} <- {request.src_path}")
+        client_dir = self._client_dir(context)
+
+        try:
+            src = self._get_src(src, client_dir)
+            total = os.path.getsize(src)
+        except FileNotFoundError:
+            logger.error(f"get file stream failed, file not found: {request.dst_path} <- {request.src_path}")
+            yield remote_tcl_pb2.FileChunk(src_path=request.src_path, dst_path=request.dst_path, last=True,
+                                           common=remote_tcl_pb2.Common(stat=MsgStat.Fail.value,
+                                                                        err=GRPCErrCode.FileNotFoundErr,
+                                                                        err_info=traceback.format_exc()))
+            return
+
+        sha = hashlib.sha256()
+        offset = 0
+        encoder = ChunkEncoder(choose_encoding(request.accept_encoding, total, str(src)), self.compression_stats)
+        with open(src, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                sha.update(data)
+                encoding, payload = encoder.encode(data)
+                yield remote_tcl_pb2.FileChunk(src_path=str(src), dst_path=request.dst_path, total_size=total,
+                                               offset=offset, content=payload, encoding=encoding,
+                                               common=remote_tcl_pb2.Common(stat=MsgStat.Run.value))
+                offset += len(data)
+
+        logger.debug(f"get file stream to {addr}: {request.dst_path} <- {src}, size: {offset}")
+        yield remote_tcl_pb2.FileChunk(src_path=str(src), dst_path=request.dst_path, total_size=total, offset=offset,
+                                       last=True, sha256=sha.hexdigest(),
+                                       common=remote_tcl_pb2.Common(stat=MsgStat.Done.value))
+
+
+def iter_file_chunks(src_path: str, dst_path: str, chunk_size: int, encoding: str = "",
+                     stats: CompressionStats = None, progress=None, sha256: str = "") -> Iterator:
+    """
+    逐块读取文件生成 FileChunk，最后一个块带整个文件的 sha256，sha256 不为空时每个块都带上
+    :param encoding: file_encoding 的结果，为空时不压缩
+    """
+    total = os.path.getsize(src_path)
+    sha = hashlib.sha256()
+    offset = 0
+    encoder = ChunkEncoder(encoding, stats)
+    with open(src_path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            sha.update(data)
+            encoding, payload = encoder.encode(data)
+            yield remote_tcl_pb2.FileChunk(src_path=src_path, dst_path=dst_path, total_size=total,
+                                           offset=offset, content=payload, encoding=encoding, sha256=sha256)
+            offset += len(data)
+            if progress:
+                progress(offset, total)
+    yield remote_tcl_pb2.FileChunk(src_path=src_path, dst_path=dst_path, total_size=total,
+                                   offset=offset, last=True, sha256=sha.hexdigest())
+
+
+def tcl_output(response, stats: CompressionStats = None) -> List[str]:
+    """ TclResponse 的输出行 """
+    if response.encoding:
+        output = decode_chunk(response.encoding, response.output_data, stats).decode("utf-8")
+        return output.split("\n") if output else []
+    elif response.output:
+        return response.output.split("\n")
+    return []
+
+
+def batch_request(options: List[dict], stop_on_error: bool, compress: bool):
+    """ :param options: tcl_batch_options 的结果 """
+    reqs = [remote_tcl_pb2.TclRequest(cmd=o["cmd"], raw=o["raw"], timeout=int(o["timeout"]) if o["timeout"] else 0,
+                                      block=True, error_check=o["error_check"]) for o in options]
+    return remote_tcl_pb2.TclBatchRequest(cmds=reqs, stop_on_error=stop_on_error,
+                                          accept_encoding=available_encodings() if compress else [],
+                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value))
+
+
+def batch_deadline(options: List[dict]):
+    """ 所有命令都有 timeout 时为它们的和加上余量，否则不限制 """
+    timeouts = [o["timeout"] for o in options]
+    return call_deadline(sum(timeouts)) if timeouts and all(timeouts) else None
+
+
+def batch_futures(options: List[dict], response, stats: CompressionStats = None) -> list:
+    """ TclBatchResponse 转为每条命令的 TclFuture，没有运行的为 ViTclCantRunError """
+    from .tcl_batch import TclFuture
+
+    futures = []
+    for i, o in enumerate(options):
+        future = TclFuture(i, o["cmd"])
+        futures.append(future)
+        if i >= len(response.results):
+            future.set_exception(ViTclCantRunError(f"tcl not run in batch: {o['cmd']}"))
+            continue
+        result = response.results[i]
+        if result.common.err == GRPCErrCode.TclRunErr:
+            future.set_exception(get_err_from_str(result.common.err_info))
+        elif result.common.err:
+            future.set_exception(GRPCErrCode2Err.get(result.common.err, GRPCErr)(result.common.err_info))
+        else:
+            future.set_result(tcl_output(result, stats))
+    return futures
+
 
 class RemoteTclProcessPopen(BaseTclProcess):
-    def __init__(self, ip: str, port: int, delay: bool = False):
+    def __init__(self, ip: str, port: int, delay: bool = False, compress: bool = True, session: bool = False,
+                 idle_timeout: float = 0, channel_pool: ChannelPool = None):
+        """
+        :param compress: 和服务端协商压缩 tcl 输出和文件块
+        :param session: 在服务端打开会话，独占一个解释器和工作、缓存目录，terminate 时关闭；服务端不支持时使用共享的解释器
+        :param idle_timeout: 会话空闲超时, sec，0 为服务端默认，客户端每 1/3 超时发送一次 keepalive
+        :param channel_pool: 连接同一服务端的实例共享 channel，默认为进程内共享的 channel_pool.default_pool
+        """
         super().__init__()
         self.server_ip = ip
         self.server_port = int(port)
 
         self._is_open = False
         self._channel = None
+        self._channel_pool = channel_pool if channel_pool is not None else default_pool
         self._client = None
+        self._dedup = True
+        self._digest_memo = {}  # type: Dict[Tuple[str, int, int], str]
+        self._compress = compress
+        self._encodings = None  # type: List[str] or None
+        self.compression_stats = CompressionStats()
+        self._session = session
+        self._idle_timeout = idle_timeout
+        self._interceptor = SessionInterceptor()
+        self._keepalive_stop = threading.Event()
+        self.session_info = None  # type: remote_tcl_pb2.SessionResponse or None
         if not delay:
             self.open()
 
@@ -294,32 +947,503 @@ class RemoteTclProcessPopen(BaseTclProcess):
             return
 
         super().open()
-        self._channel = grpc.insecure_channel(f"{self.server_ip}:{self.server_port}")
-        self._channel.__enter__()
-        self._client = RemoteTclStub(channel=self._channel)
+        self._channel = self._channel_pool.acquire(self.server_ip, self.server_port)
+        self._client = RemoteTclStub(channel=grpc.intercept_channel(self._channel, self._interceptor))
         self._is_open = True
+        if self._session:
+            self.open_session()
 
     def terminate(self):
+        self.close_session()
         super().terminate()
-        self._channel.__exit__(None, None, None)
+        if self._channel is not None:
+            self._channel = None
+            self._channel_pool.release(self.server_ip, self.server_port)
+
+    @property
+    def session_id(self) -> str:
+        return self._interceptor.session_id
+
+    def open_session(self) -> str:
+        """ :return: session id，服务端不支持会话时为空，之后使用共享的解释器 """
+        if self._interceptor.session_id:
+            return self._interceptor.session_id
+        try:
+            response = self._client.open_session(remote_tcl_pb2.SessionRequest(
+                client_name=socket.gethostname(), idle_timeout=self._idle_timeout,
+                common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)), timeout=ControlDeadline)
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server does not support session, use the shared interpreter")
+            return ""
+        self._check_grpc_resp_err(response)
+
+        self._interceptor.session_id = response.session_id
+        self.session_info = response
+        self._keepalive_stop.clear()
+        threading.Thread(target=self._keepalive_th, args=(response.session_id, response.idle_timeout / 3),
+                         daemon=True, name="vipytcl_keepalive").start()
+        logger.info(f"open session {response.session_id}, work dir: {response.work_dir}, "
+                    f"idle timeout: {response.idle_timeout:.0f} s")
+        return response.session_id
+
+    def _keepalive_th(self, session_id: str, interval: float):
+        while not self._keepalive_stop.wait(max(interval, 1.0)):
+            try:
+                self._check_grpc_resp_err(self._client.keepalive(remote_tcl_pb2.SessionRequest(session_id=session_id),
+                                                                 timeout=ControlDeadline))
+            except GRPCSessionErr as err:
+                logger.error(f"session {session_id} lost: {err}")
+                return
+            except grpc.RpcError as err:
+                logger.warning(f"session {session_id} keepalive failed: {err.code()}")
+
+    def server_stats(self) -> Dict[str, float]:
+        """ 服务端的准入控制和会话统计，见 GRPCRemoteTclServicer.server_stats，不支持的服务端为空 """
+        try:
+            response = self._client.server_stats(remote_tcl_pb2.StatsRequest(), timeout=ControlDeadline)
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            return {}
+        return dict(response.values)
+
+    def close_session(self) -> None:
+        """ 关闭会话，服务端终止会话的解释器并删除它的目录 """
+        session_id = self._interceptor.session_id
+        if not session_id:
+            return
+        self._keepalive_stop.set()
+        self._interceptor.session_id = ""
+        self.session_info = None
+        try:
+            self._client.close_session(remote_tcl_pb2.SessionRequest(session_id=session_id), timeout=ControlDeadline)
+        except grpc.RpcError as err:
+            logger.warning(f"close session {session_id} failed: {err.code()}")
+        logger.info(f"close session {session_id}")
+
+    def server_encodings(self) -> List[str]:
+        """ 双方都支持的压缩编码，第一次调用时协商，不支持的服务端为空 """
+        if self._encodings is None:
+            if not self._compress:
+                self._encodings = []
+                return self._encodings
+            try:
+                response = self._client.encodings(remote_tcl_pb2.EncodingMessage(encodings=available_encodings()),
+                                                  timeout=ControlDeadline)
+                self._encodings = negotiate(response.encodings)
+            except grpc.RpcError as err:
+                if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                    raise
+                self._encodings = []
+            logger.info(f"compression encodings: {self._encodings}")
+        return self._encodings
 
     def _send_cmd(self, tcl: str, raw: bool = False, timeout: int = 0, block: bool = True):
         timeout = int(timeout) if timeout else 0
 
         req = remote_tcl_pb2.TclRequest(cmd=tcl, raw=bool(raw), timeout=timeout, block=block,
+                                        accept_encoding=available_encodings() if self._compress else [],
                                         common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value))
-        response = self._client.tcl(req)
+        # 服务端在 timeout 后返回超时错误，deadline 只在服务端没有响应（排队、断线）时生效
+        response = self._client.tcl(req, timeout=call_deadline(timeout))
         self._check_grpc_resp_err(response)
 
-        if response.output:
-            output = response.output.split("\n")
-        else:
-            output = []
+        output = self._tcl_output(response)
         logger.info(f"run tcl: {tcl}")
         return output
 
-    def grpc_put_file(self, src_path, dst_path: str = "", timeout: int = 0) -> Union[str, Path]:
-        """ 将本机src_path文件发送到远端dst_path文件 """
+    def _tcl_output(self, response) -> List[str]:
+        return tcl_output(response, self.compression_stats)
+
+    def tcl_batch(self, cmds: Iterable[Union[str, dict]], stop_on_error: bool = True,
+                  error_check: bool = None) -> list:
+        """
+        一次请求运行多条命令，服务端连续运行，只有一次往返
+        不支持的服务端逐条运行
+        """
+        if self._is_terminate:
+            raise ValueError("Tcl process has terminate")
+        from .tcl_batch import tcl_batch_options
+
+        error_check = self._error_check if error_check is None else error_check
+        options = [tcl_batch_options(cmd, error_check) for cmd in cmds]
+        try:
+            response = self._client.tcl_batch(batch_request(options, stop_on_error, self._compress),
+                                              timeout=batch_deadline(options))
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server dont support tcl_batch, fall back to tcl")
+            return super().tcl_batch(options, stop_on_error, error_check)
+        self._check_grpc_resp_err(response)
+        logger.info(f"run tcl batch: {len(response.results)}/{len(options)}")
+        return batch_futures(options, response, self.compression_stats)
+
+    def tcl_stream(self, tcl, raw: bool = False, timeout: int = None, error_check: bool = None,
+                   batch_lines: int = 256, batch_interval: float = 0.5, **kwargs) -> Iterator[List[str]]:
+        """
+        服务端边运行边返回输出，按批 yield，命令出错时在输出全部返回后抛出
+        grpc 的流控使得客户端不读取时服务端随之等待
+        不支持的服务端整个命令完成后一次返回
+        """
+        if self._is_terminate:
+            raise ValueError("Tcl process has terminate")
+        tcl = tcl.strip(" ").strip("\n")
+        if not tcl:
+            raise ValueError("tcl can't be empty")
+
+        error_check = self._error_check if error_check is None else error_check
+        req = remote_tcl_pb2.TclRequest(cmd=tcl, raw=bool(raw), timeout=int(timeout) if timeout else 0, block=True,
+                                        batch_lines=batch_lines, batch_interval=batch_interval,
+                                        accept_encoding=available_encodings() if self._compress else [],
+                                        common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value))
+        stream = self._client.tcl_stream(req, timeout=call_deadline(timeout))
+        err = None
+        try:
+            for frame in stream:
+                self._check_grpc_resp_err(frame)
+                if frame.encoding:
+                    lines = decode_chunk(frame.encoding, frame.data, self.compression_stats).decode("utf-8").split("\n")
+                else:
+                    lines = list(frame.lines)
+                if error_check:
+                    for line in lines:
+                        if line.startswith("ERROR"):
+                            err = get_err_from_str(line)
+                if lines:
+                    yield lines
+        except grpc.RpcError as rpc_err:
+            if rpc_err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server dont support tcl_stream, fall back to tcl")
+            yield self.tcl(tcl, raw=raw, timeout=timeout, error_check=error_check)
+            return
+        finally:
+            stream.cancel()
+
+        logger.info(f"run tcl stream: {tcl}")
+        if err:
+            raise err
+
+    @staticmethod
+    def _local_dst(src_path, dst_path) -> Path:
+        dst_path = Path(dst_path)
+        src_path = Path(src_path)
+
+        if dst_path.is_absolute():
+            if not dst_path.parent.exists():
+                raise FileNotFoundError
+
+            elif dst_path.is_dir():
+                dst_path = dst_path / src_path.name
+
+        else:
+            if dst_path.is_dir():
+                dst_path = dst_path / src_path.name
+            os.makedirs(dst_path.parent, exist_ok=True)
+
+        return dst_path.absolute()
+
+    def _file_chunks(self, src_path: str, dst_path: str, chunk_size: int, progress=None, sha256: str = ""):
+        """ 服务端支持时按文件大小和类型压缩每个块，见 iter_file_chunks """
+        return iter_file_chunks(src_path, dst_path, chunk_size, file_encoding(self.server_encodings(), src_path),
+                                self.compression_stats, progress, sha256)
+
+    def grpc_put_file(self, src_path, dst_path: str = "", timeout: int = 0, progress=None,
+                      chunk_size: int = DefaultChunkSize, dedup: bool = True) -> Union[str, Path]:
+        """
+        将本机src_path文件分块发送到远端dst_path文件，内存中只保留一个块，服务端校验 sha256
+        :param progress: progress(sent_bytes, total_bytes)
+        :param chunk_size: 块大小，不超过 MaxChunkSize
+        :param dedup: 服务端已有相同内容时不再上传，见 grpc_put_files
+        """
+        if dedup and self._dedup:
+            return self.grpc_put_files([(src_path, dst_path)], timeout, progress, chunk_size)[0]
+
+        start = time.time()
+        logger.info(f"request put file {src_path} -> {dst_path}")
+        src_path = str(src_path)
+        if not os.path.isfile(src_path):
+            raise FileNotFoundError
+
+        chunk_size = min(chunk_size, MaxChunkSize)
+        total = os.path.getsize(src_path)
+        try:
+            response = self._client.put_file_stream(self._file_chunks(src_path, str(dst_path), chunk_size, progress),
+                                                    timeout=timeout if timeout else None)
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server dont support put_file_stream, fall back to put_file")
+            return self._grpc_put_file_unary(src_path, dst_path, timeout)
+        self._check_grpc_resp_err(response)
+
+        time_usage = max(time.time() - start, 1e-6)
+        logger.info(f"response put file {src_path} -> {response.dst_path}, file_size: {total}, "
+                    f"send_size: {response.total_size}, time_usage: {time_usage:.2f} s, "
+                    f"speed: {total / time_usage / 1024 ** 2:.2f} MB/s")
+        return response.dst_path
+
+    def local_digest(self, path: str) -> str:
+        """ 本机文件的 sha256，(path, size, mtime_ns) 不变时不重新计算 """
+        stat = os.stat(path)
+        memo = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._digest_memo:
+            self._digest_memo[memo] = file_digest(path)
+        return self._digest_memo[memo]
+
+    def _local_blob(self, src_path: str, dst_path: str):
+        return remote_tcl_pb2.Blob(sha256=self.local_digest(src_path), size=os.path.getsize(src_path),
+                                   src_path=src_path, dst_path=dst_path)
+
+    def _missing_blobs(self, blobs, timeout: int = None):
+        """ :return: 服务端缺少的 blob，不支持 blob 的服务端返回 None """
+        try:
+            response = self._client.has_blobs(remote_tcl_pb2.BlobRequest(blobs=blobs), timeout=timeout)
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server dont support blobs, fall back to put_file_stream")
+            self._dedup = False
+            return None
+        self._check_grpc_resp_err(response)
+        return list(response.blobs)
+
+    def present_blobs(self, paths: Iterable[str]) -> set:
+        """ 服务端已有内容的本机文件的 sha256 """
+        blobs = [self._local_blob(str(path), "") for path in paths]
+        if not blobs or not self._dedup:
+            return set()
+        missing = self._missing_blobs(blobs)
+        if missing is None:
+            return set()
+        return {b.sha256 for b in blobs} - {b.sha256 for b in missing}
+
+    def grpc_put_files(self, files: Iterable[Tuple[str, str]], timeout: int = 0, progress=None,
+                       chunk_size: int = DefaultChunkSize, workers: int = 4) -> List[str]:
+        """
+        按内容去重上传多个文件: 发送摘要，只上传服务端缺少的内容，服务端在 dst_path 处硬链接 / reflink
+        不支持的服务端逐个分块上传
+        :param files: [(本机路径, 远端路径)]，远端路径规则和 grpc_put_file 相同
+        :param progress: progress(sent_bytes, total_bytes)，只统计需要上传的内容
+        :param workers: 同时上传的 blob 数
+        :return: 每个文件的服务端路径
+        """
+        if workers <= 1:
+            return self._put_blobs(files, timeout, progress, chunk_size)[0]
+        with ThreadPoolExecutor(workers, thread_name_prefix="vipytcl_put") as executor:
+            return self._put_blobs(files, timeout, progress, chunk_size, executor)[0]
+
+    def _put_blobs(self, files: Iterable[Tuple[str, str]], timeout: int = 0, progress=None,
+                   chunk_size: int = DefaultChunkSize, executor: ThreadPoolExecutor = None) -> Tuple[List[str], int, int]:
+        """ :return: (服务端路径, 上传的 blob 数, 上传的字节数) """
+        start = time.time()
+        files = [(str(src), str(dst)) for src, dst in files]
+        for src, _ in files:
+            if not os.path.isfile(src):
+                raise FileNotFoundError(src)
+        if not files:
+            return [], 0, 0
+        if self._dedup:
+            timeout = timeout if timeout else None
+            blobs = [self._local_blob(src, dst) for src, dst in files]
+            missing = self._missing_blobs(blobs, timeout)
+        if not self._dedup:
+            return [self.grpc_put_file(src, dst, timeout, dedup=False) for src, dst in files], \
+                len(files), sum(os.path.getsize(src) for src, _ in files)
+
+        missing = list({b.sha256: b for b in missing}.values())
+        total = sum(b.size for b in missing)
+        lock = threading.Lock()
+        sent = [0]
+        chunk_size = min(chunk_size, MaxChunkSize)
+
+        def put(blob):
+            last = [0]
+
+            def blob_progress(offset, _):
+                with lock:
+                    sent[0] += offset - last[0]
+                    done = sent[0]
+                last[0] = offset
+                if progress:
+                    progress(done, total)
+
+            response = self._client.put_blob_stream(
+                self._file_chunks(blob.src_path, "", chunk_size, blob_progress, blob.sha256), timeout=timeout)
+            self._check_grpc_resp_err(response)
+
+        if executor is not None and len(missing) > 1:
+            for future in [executor.submit(put, blob) for blob in missing]:
+                future.result()
+        else:
+            for blob in missing:
+                put(blob)
+
+        response = self._client.link_blobs(remote_tcl_pb2.BlobRequest(blobs=blobs), timeout=timeout)
+        self._check_grpc_resp_err(response)
+
+        time_usage = max(time.time() - start, 1e-6)
+        methods = {}
+        for blob in response.blobs:
+            methods[blob.method] = methods.get(blob.method, 0) + 1
+        logger.info(f"response put files: {len(files)}, upload blobs: {len(missing)}, upload_size: {sent[0]}, "
+                    f"skip_size: {sum(b.size for b in blobs) - sent[0]}, link: {methods}, "
+                    f"time_usage: {time_usage:.2f} s")
+        return [blob.dst_path for blob in response.blobs], len(missing), sent[0]
+
+    def grpc_put_dir(self, src_dir, dst_dir: str = "", timeout: int = 0, progress=None) -> List[str]:
+        """
+        上传整个目录，保持相对路径，未改变的文件只发送摘要
+        :param dst_dir: 远端目录，相对路径时放在该客户端的缓存目录下，为空时使用 src_dir 的目录名
+        """
+        src_dir = str(src_dir)
+        dst_dir = str(dst_dir) if dst_dir else os.path.basename(os.path.abspath(src_dir))
+        files = [(path, f"{dst_dir.rstrip('/')}/{rel}") for rel, path in walk_files(src_dir)]
+        return self.grpc_put_files(files, timeout, progress)
+
+    def remote_manifest(self, dir_path: str, missing_ok: bool = True, timeout: int = 0,
+                        paths: Iterable[str] = (), exclude: Sequence[str] = ()) -> Tuple[str, Dict[str, ManifestEntry]]:
+        """
+        服务端目录的清单
+        :param missing_ok: 目录不存在时返回空清单，否则抛出 FileNotFoundError
+        :param paths: 不为空时只取这些相对路径，服务端只计算它们的摘要
+        :param exclude: 服务端不列出、不计算摘要的 glob，和 DirSync 的 exclude 相同
+        :return: (服务端绝对路径, {相对路径: ManifestEntry})
+        """
+        response = self._client.dir_manifest(remote_tcl_pb2.ManifestRequest(dir_path=str(dir_path), paths=paths,
+                                                                            exclude=exclude),
+                                             timeout=timeout if timeout else None)
+        if response.common.err == GRPCErrCode.FileNotFoundErr and missing_ok:
+            return response.dir_path, {}
+        self._check_grpc_resp_err(response)
+        return response.dir_path, {e.path: ManifestEntry(e.path, e.size, e.mtime, e.sha256) for e in response.entries}
+
+    def remove_remote_files(self, dir_path: str, paths: Iterable[str], timeout: int = 0) -> List[str]:
+        """ 删除服务端目录下的文件，:return: 删除的相对路径 """
+        response = self._client.remove_files(remote_tcl_pb2.ManifestRequest(dir_path=str(dir_path), paths=list(paths)),
+                                             timeout=timeout if timeout else None)
+        self._check_grpc_resp_err(response)
+        return [e.path for e in response.entries]
+
+    def grpc_put_delta(self, src_path: str, dst_path: str, block_size: int = DefaultBlockSize,
+                       timeout: int = 0, chunk_size: int = DefaultChunkSize) -> int:
+        """
+        和服务端已有的 dst_path 按块比较，只发送改变的块，服务端用旧文件中未改变的块重建，校验 sha256
+        服务端不支持或 dst_path 不存在时整个上传
+        :return: 发送的文件内容字节数（压缩前）
+        """
+        src_path = str(src_path)
+        timeout = timeout if timeout else None
+        try:
+            response = self._client.block_digests(
+                remote_tcl_pb2.BlockDigestRequest(path=str(dst_path), block_size=block_size), timeout=timeout)
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            response = None
+        if response is None or response.common.err:
+            self.grpc_put_file(src_path, dst_path, timeout, dedup=False)
+            return os.path.getsize(src_path)
+
+        total = os.path.getsize(src_path)
+        chunk_size = min(chunk_size, MaxChunkSize)
+        encoder = ChunkEncoder(file_encoding(self.server_encodings(), src_path), self.compression_stats)
+        sent = [0]
+
+        def chunks():
+            sha = hashlib.sha256()
+            for offset, copy_length, data in iter_delta(src_path, list(response.digests), response.block_size,
+                                                        chunk_size, sha):
+                if copy_length:
+                    yield remote_tcl_pb2.FileChunk(src_path=src_path, dst_path=str(dst_path), total_size=total,
+                                                   offset=offset, copy_length=copy_length)
+                else:
+                    sent[0] += len(data)
+                    encoding, payload = encoder.encode(data)
+                    yield remote_tcl_pb2.FileChunk(src_path=src_path, dst_path=str(dst_path), total_size=total,
+                                                   offset=offset, content=payload, encoding=encoding)
+            yield remote_tcl_pb2.FileChunk(src_path=src_path, dst_path=str(dst_path), total_size=total,
+                                           offset=total, last=True, sha256=sha.hexdigest())
+
+        put = self._client.put_file_stream(chunks(), timeout=timeout)
+        self._check_grpc_resp_err(put)
+        logger.info(f"response put delta {src_path} -> {put.dst_path}, file_size: {total}, send_size: {sent[0]}")
+        return sent[0]
+
+    def sync_dir(self, src: str, dst: str = "", direction: str = "put", delete: bool = False,
+                 exclude: Sequence[str] = (), workers: int = 8, progress=None) -> SyncResult:
+        """
+        增量同步目录，只传输改变的文件或块，见 DirSync
+        :param src: put 时为本机目录，get 时为服务端目录
+        :param dst: put 时为服务端目录，为空时使用 src 的目录名; get 时为本机目录
+        :param delete: 删除 dst 中 src 没有的文件
+        :param exclude: 不同步的 glob，例如 (".Xil", "*.jou")
+        """
+        if not dst:
+            if direction != "put":
+                raise ValueError("dst can't be empty when get")
+            dst = os.path.basename(os.path.abspath(src))
+        return DirSync(self, src, dst, direction, delete, exclude, workers, progress=progress).run()
+
+    def grpc_get_file(self, src_path, dst_path: str = "", timeout: int = 0, progress=None,
+                      chunk_size: int = DefaultChunkSize) -> Union[str, Path]:
+        """
+        将远端src_path文件分块接收到本机dst_path文件，先写入 .part，校验 sha256 后再 rename
+        :param progress: progress(recv_bytes, total_bytes)
+        """
+        start = time.time()
+        logger.info(f"request get file {dst_path} <- {src_path}")
+        dst = self._local_dst(src_path, dst_path)
+        part = part_path(dst)
+        sha = hashlib.sha256()
+        size = 0
+        expect = None
+
+        stream = self._client.get_file_stream(
+            remote_tcl_pb2.GetFileRequest(src_path=str(src_path), dst_path=str(dst_path), chunk_size=chunk_size,
+                                          accept_encoding=available_encodings() if self._compress else [],
+                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)),
+            timeout=timeout if timeout else None)
+        try:
+            with open(part, "wb") as f:
+                for chunk in stream:
+                    self._check_grpc_resp_err(chunk)
+                    if chunk.content:
+                        data = decode_chunk(chunk.encoding, chunk.content, self.compression_stats, MaxChunkSize)
+                        f.write(data)
+                        sha.update(data)
+                        size += len(data)
+                        if progress:
+                            progress(size, chunk.total_size)
+                    if chunk.last:
+                        expect = chunk.sha256
+
+            if expect is None:
+                raise ViFileChecksumError(f"get file stream ended without last chunk: {src_path}")
+            if expect != sha.hexdigest():
+                raise ViFileChecksumError(f"sha256 dont match, expect: {expect}, recv: {sha.hexdigest()}")
+            os.replace(part, dst)
+
+        except grpc.RpcError as err:
+            if err.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            logger.warning("server dont support get_file_stream, fall back to get_file")
+            return self._grpc_get_file_unary(src_path, dst_path, timeout)
+
+        finally:
+            if part.exists():
+                os.remove(part)
+
+        time_usage = max(time.time() - start, 1e-6)
+        logger.info(f"request get file {dst} <- {src_path}, file_size: {size}, time_usage: {time_usage:.2f} s, "
+                    f"speed: {size / time_usage / 1024 ** 2:.2f} MB/s")
+        return dst
+
+    def _grpc_put_file_unary(self, src_path, dst_path: str = "", timeout: int = 0) -> Union[str, Path]:
+        """ 整个文件一条消息，用于不支持分块传输的旧服务端 """
         start = time.time()
         logger.info(f"request put file {src_path} -> {dst_path}")
         if not os.path.isfile(src_path):
@@ -334,39 +1458,26 @@ class RemoteTclProcessPopen(BaseTclProcess):
                                           dst_path=dst_path,
                                           size=file_bytes_len,
                                           content=file_bytes,
-                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)))
+                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)),
+            timeout=timeout if timeout else None)
         self._check_grpc_resp_err(response)
         time_usage = time.time() - start
         logger.info(
             f"response put file {src_path} -> {dst_path}, file_size: {file_bytes_len}, send_size: {response.size}, time_usage: {time_usage:.2f} s, speed: {file_bytes_len / time_usage / 1024:.2f} KB/s")
         return response.dst_path
 
-    def grpc_get_file(self, src_path, dst_path: str = "", timeout: int = 0) -> Union[str, Path]:
-        """ 将远端src_path文件发送到本机dst_path文件 """
+    def _grpc_get_file_unary(self, src_path, dst_path: str = "", timeout: int = 0) -> Union[str, Path]:
+        """ 整个文件一条消息，用于不支持分块传输的旧服务端 """
         start = time.time()
         logger.info(f"request get file {dst_path} <- {src_path}")
         response = self._client.get_file(
             remote_tcl_pb2.GetFileRequest(src_path=src_path,
                                           dst_path=dst_path,
-                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)))
+                                          common=remote_tcl_pb2.Common(stat=MsgStat.Receive.value)),
+            timeout=timeout if timeout else None)
         self._check_grpc_resp_err(response)
 
-        dst_path = Path(dst_path)
-        src_path = Path(src_path)
-
-        if dst_path.is_absolute():
-            if not dst_path.parent.exists():
-                raise FileNotFoundError
-
-            elif dst_path.is_dir():
-                dst_path = dst_path / src_path.name
-
-        else:
-            if dst_path.is_dir():
-                dst_path = dst_path / src_path.name
-            os.makedirs(dst_path.parent, exist_ok=True)
-
-        dst_path = dst_path.absolute()
+        dst_path = self._local_dst(src_path, dst_path)
         with open(dst_path, "wb") as f:
             f.write(response.content)
         file_bytes_len = os.path.getsize(dst_path)
@@ -14,27 +14,65 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n!lib/ViPyTcl/core/remote_tcl.proto\x12\nremote_tcl\"T\n\x06\x43ommon\x12\x0c\n\x04stat\x18\x01 \x01(\x05\x12\x10\n\x03\x65rr\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12\x15\n\x08\x65rr_info\x18\x03 \x01(\tH\x01\x88\x01\x01\x42\x06\n\x04_errB\x0b\n\t_err_info\"j\n\nTclRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x0f\n\x07timeout\x18\x02 \x01(\x05\x12\x0b\n\x03raw\x18\x03 \x01(\x08\x12\r\n\x05\x62lock\x18\x04 \x01(\x08\x12\x0b\n\x03\x63md\x18\x05 \x01(\t\"{\n\x0bTclResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x0f\n\x07timeout\x18\x02 \x01(\x05\x12\x0b\n\x03raw\x18\x03 \x01(\x08\x12\r\n\x05\x62lock\x18\x04 \x01(\x08\x12\x0b\n\x03\x63md\x18\x05 \x01(\t\x12\x0e\n\x06output\x18\x06 \x01(\t\"w\n\x0ePutFileRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x06 \x01(\x0c\"g\n\x0fPutFileResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x05\"X\n\x0eGetFileRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x02 \x01(\t\x12\x10\n\x08\x64st_path\x18\x03 \x01(\t\"x\n\x0fGetFileResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x06 \x01(\x0c\x32\xd3\x01\n\tRemoteTcl\x12\x38\n\x03tcl\x12\x16.remote_tcl.TclRequest\x1a\x17.remote_tcl.TclResponse\"\x00\x12\x45\n\x08get_file\x12\x1a.remote_tcl.GetFileRequest\x1a\x1b.remote_tcl.GetFileResponse\"\x00\x12\x45\n\x08put_file\x12\x1a.remote_tcl.PutFileRequest\x1a\x1b.remote_tcl.PutFileResponse\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n!lib/ViPyTcl/core/remote_tcl.proto\x12\nremote_tcl\"T\n\x06\x43ommon\x12\x0c\n\x04stat\x18\x01 \x01(\x05\x12\x10\n\x03\x65rr\x18\x02 \x01(\x05H\x00\x88\x01\x01\x12\x15\n\x08\x65rr_info\x18\x03 \x01(\tH\x01\x88\x01\x01\x42\x06\n\x04_errB\x0b\n\t_err_info\"\xc5\x01\n\nTclRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x0f\n\x07timeout\x18\x02 \x01(\x05\x12\x0b\n\x03raw\x18\x03 \x01(\x08\x12\r\n\x05\x62lock\x18\x04 \x01(\x08\x12\x0b\n\x03\x63md\x18\x05 \x01(\t\x12\x17\n\x0f\x61\x63\x63\x65pt_encoding\x18\x06 \x03(\t\x12\x13\n\x0b\x62\x61tch_lines\x18\x07 \x01(\x05\x12\x16\n\x0e\x62\x61tch_interval\x18\x08 \x01(\x02\x12\x13\n\x0b\x65rror_check\x18\t \x01(\x08\"\xa2\x01\n\x0bTclResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x0f\n\x07timeout\x18\x02 \x01(\x05\x12\x0b\n\x03raw\x18\x03 \x01(\x08\x12\r\n\x05\x62lock\x18\x04 \x01(\x08\x12\x0b\n\x03\x63md\x18\x05 \x01(\t\x12\x0e\n\x06output\x18\x06 \x01(\t\x12\x10\n\x08\x65ncoding\x18\x07 \x01(\t\x12\x13\n\x0boutput_data\x18\x08 \x01(\x0c\"w\n\x0ePutFileRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x06 \x01(\x0c\"\x8b\x01\n\x0fPutFileResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x05\x12\x0e\n\x06sha256\x18\x06 \x01(\t\x12\x12\n\ntotal_size\x18\x07 \x01(\x03\"\x85\x01\n\x0eGetFileRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x02 \x01(\t\x12\x10\n\x08\x64st_path\x18\x03 \x01(\t\x12\x12\n\nchunk_size\x18\x04 \x01(\x05\x12\x17\n\x0f\x61\x63\x63\x65pt_encoding\x18\x05 \x03(\t\"x\n\x0fGetFileResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0c\n\x04size\x18\x05 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x06 \x01(\x0c\"\xcd\x01\n\tFileChunk\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08src_path\x18\x02 \x01(\t\x12\x10\n\x08\x64st_path\x18\x03 \x01(\t\x12\x12\n\ntotal_size\x18\x04 \x01(\x03\x12\x0e\n\x06offset\x18\x05 \x01(\x03\x12\x0f\n\x07\x63ontent\x18\x06 \x01(\x0c\x12\x0c\n\x04last\x18\x07 \x01(\x08\x12\x0e\n\x06sha256\x18\x08 \x01(\t\x12\x10\n\x08\x65ncoding\x18\t \x01(\t\x12\x13\n\x0b\x63opy_length\x18\n \x01(\x03\"X\n\x04\x42lob\x12\x0e\n\x06sha256\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\x10\n\x08src_path\x18\x03 \x01(\t\x12\x10\n\x08\x64st_path\x18\x04 \x01(\t\x12\x0e\n\x06method\x18\x05 \x01(\t\"R\n\x0b\x42lobRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x1f\n\x05\x62lobs\x18\x02 \x03(\x0b\x32\x10.remote_tcl.Blob\"S\n\x0c\x42lobResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x1f\n\x05\x62lobs\x18\x02 \x03(\x0b\x32\x10.remote_tcl.Blob\"H\n\x0f\x45ncodingMessage\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x11\n\tencodings\x18\x02 \x03(\t\"J\n\rManifestEntry\x12\x0c\n\x04path\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\r\n\x05mtime\x18\x03 \x01(\x01\x12\x0e\n\x06sha256\x18\x04 \x01(\t\"g\n\x0fManifestRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08\x64ir_path\x18\x02 \x01(\t\x12\r\n\x05paths\x18\x03 \x03(\t\x12\x0f\n\x07\x65xclude\x18\x04 \x03(\t\"t\n\x10ManifestResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x10\n\x08\x64ir_path\x18\x02 \x01(\t\x12*\n\x07\x65ntries\x18\x03 \x03(\x0b\x32\x19.remote_tcl.ManifestEntry\"Z\n\x12\x42lockDigestRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x12\n\nblock_size\x18\x03 \x01(\x05\"z\n\x13\x42lockDigestResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x0c\n\x04size\x18\x03 \x01(\x03\x12\x12\n\nblock_size\x18\x04 \x01(\x05\x12\x0f\n\x07\x64igests\x18\x05 \x03(\x0c\"l\n\tTclOutput\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\r\n\x05lines\x18\x02 \x03(\t\x12\x0c\n\x04last\x18\x03 \x01(\x08\x12\x10\n\x08\x65ncoding\x18\x04 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x05 \x01(\x0c\"\x8b\x01\n\x0fTclBatchRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12$\n\x04\x63mds\x18\x02 \x03(\x0b\x32\x16.remote_tcl.TclRequest\x12\x15\n\rstop_on_error\x18\x03 \x01(\x08\x12\x17\n\x0f\x61\x63\x63\x65pt_encoding\x18\x04 \x03(\t\"`\n\x10TclBatchResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12(\n\x07results\x18\x02 \x03(\x0b\x32\x17.remote_tcl.TclResponse\"s\n\x0eSessionRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\x13\n\x0b\x63lient_name\x18\x03 \x01(\t\x12\x14\n\x0cidle_timeout\x18\x04 \x01(\x02\"\x84\x01\n\x0fSessionResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\x10\n\x08work_dir\x18\x03 \x01(\t\x12\x11\n\tcache_dir\x18\x04 \x01(\t\x12\x14\n\x0cidle_timeout\x18\x05 \x01(\x02\"2\n\x0cStatsRequest\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\"\x99\x01\n\rStatsResponse\x12\"\n\x06\x63ommon\x18\x01 \x01(\x0b\x32\x12.remote_tcl.Common\x12\x35\n\x06values\x18\x02 \x03(\x0b\x32%.remote_tcl.StatsResponse.ValuesEntry\x1a-\n\x0bValuesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\x32\xa0\n\n\tRemoteTcl\x12\x38\n\x03tcl\x12\x16.remote_tcl.TclRequest\x1a\x17.remote_tcl.TclResponse\"\x00\x12?\n\ntcl_stream\x12\x16.remote_tcl.TclRequest\x1a\x15.remote_tcl.TclOutput\"\x00\x30\x01\x12H\n\ttcl_batch\x12\x1b.remote_tcl.TclBatchRequest\x1a\x1c.remote_tcl.TclBatchResponse\"\x00\x12\x45\n\x08get_file\x12\x1a.remote_tcl.GetFileRequest\x1a\x1b.remote_tcl.GetFileResponse\"\x00\x12\x45\n\x08put_file\x12\x1a.remote_tcl.PutFileRequest\x1a\x1b.remote_tcl.PutFileResponse\"\x00\x12I\n\x0fput_file_stream\x12\x15.remote_tcl.FileChunk\x1a\x1b.remote_tcl.PutFileResponse\"\x00(\x01\x12H\n\x0fget_file_stream\x12\x1a.remote_tcl.GetFileRequest\x1a\x15.remote_tcl.FileChunk\"\x00\x30\x01\x12@\n\thas_blobs\x12\x17.remote_tcl.BlobRequest\x1a\x18.remote_tcl.BlobResponse\"\x00\x12I\n\x0fput_blob_stream\x12\x15.remote_tcl.FileChunk\x1a\x1b.remote_tcl.PutFileResponse\"\x00(\x01\x12\x41\n\nlink_blobs\x12\x17.remote_tcl.BlobRequest\x1a\x18.remote_tcl.BlobResponse\"\x00\x12G\n\tencodings\x12\x1b.remote_tcl.EncodingMessage\x1a\x1b.remote_tcl.EncodingMessage\"\x00\x12K\n\x0c\x64ir_manifest\x12\x1b.remote_tcl.ManifestRequest\x1a\x1c.remote_tcl.ManifestResponse\"\x00\x12R\n\rblock_digests\x12\x1e.remote_tcl.BlockDigestRequest\x1a\x1f.remote_tcl.BlockDigestResponse\"\x00\x12K\n\x0cremove_files\x12\x1b.remote_tcl.ManifestRequest\x1a\x1c.remote_tcl.ManifestResponse\"\x00\x12I\n\x0copen_session\x12\x1a.remote_tcl.SessionRequest\x1a\x1b.remote_tcl.SessionResponse\"\x00\x12J\n\rclose_session\x12\x1a.remote_tcl.SessionRequest\x1a\x1b.remote_tcl.SessionResponse\"\x00\x12\x46\n\tkeepalive\x12\x1a.remote_tcl.SessionRequest\x1a\x1b.remote_tcl.SessionResponse\"\x00\x12\x45\n\x0cserver_stats\x12\x18.remote_tcl.StatsRequest\x1a\x19.remote_tcl.StatsResponse\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'lib.ViPyTcl.core.remote_tcl_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_STATSRESPONSE_VALUESENTRY']._loaded_options = None
+  _globals['_STATSRESPONSE_VALUESENTRY']._serialized_options = b'8\001'
   _globals['_COMMON']._serialized_start=49
   _globals['_COMMON']._serialized_end=133
-  _globals['_TCLREQUEST']._serialized_start=135
-  _globals['_TCLREQUEST']._serialized_end=241
-  _globals['_TCLRESPONSE']._serialized_start=243
-  _globals['_TCLRESPONSE']._serialized_end=366
-  _globals['_PUTFILEREQUEST']._serialized_start=368
-  _globals['_PUTFILEREQUEST']._serialized_end=487
-  _globals['_PUTFILERESPONSE']._serialized_start=489
-  _globals['_PUTFILERESPONSE']._serialized_end=592
-  _globals['_GETFILEREQUEST']._serialized_start=594
-  _globals['_GETFILEREQUEST']._serialized_end=682
-  _globals['_GETFILERESPONSE']._serialized_start=684
-  _globals['_GETFILERESPONSE']._serialized_end=804
-  _globals['_REMOTETCL']._serialized_start=807
-  _globals['_REMOTETCL']._serialized_end=1018
+  _globals['_TCLREQUEST']._serialized_start=136
+  _globals['_TCLREQUEST']._serialized_end=333
+  _globals['_TCLRESPONSE']._serialized_start=336
+  _globals['_TCLRESPONSE']._serialized_end=498
+  _globals['_PUTFILEREQUEST']._serialized_start=500
+  _globals['_PUTFILEREQUEST']._serialized_end=619
+  _globals['_PUTFILERESPONSE']._serialized_start=622
+  _globals['_PUTFILERESPONSE']._serialized_end=761
+  _globals['_GETFILEREQUEST']._serialized_start=764
+  _globals['_GETFILEREQUEST']._serialized_end=897
+  _globals['_GETFILERESPONSE']._serialized_start=899
+  _globals['_GETFILERESPONSE']._serialized_end=1019
+  _globals['_FILECHUNK']._serialized_start=1022
+  _globals['_FILECHUNK']._serialized_end=1227
+  _globals['_BLOB']._serialized_start=1229
+  _globals['_BLOB']._serialized_end=1317
+  _globals['_BLOBREQUEST']._serialized_start=1319
+  _globals['_BLOBREQUEST']._serialized_end=1401
+  _globals['_BLOBRESPONSE']._serialized_start=1403
+  _globals['_BLOBRESPONSE']._serialized_end=1486
+  _globals['_ENCODINGMESSAGE']._serialized_start=1488
+  _globals['_ENCODINGMESSAGE']._serialized_end=1560
+  _globals['_MANIFESTENTRY']._serialized_start=1562
+  _globals['_MANIFESTENTRY']._serialized_end=1636
+  _globals['_MANIFESTREQUEST']._serialized_start=1638
+  _globals['_MANIFESTREQUEST']._serialized_end=1741
+  _globals['_MANIFESTRESPONSE']._serialized_start=1743
+  _globals['_MANIFESTRESPONSE']._serialized_end=1859
+  _globals['_BLOCKDIGESTREQUEST']._serialized_start=1861
+  _globals['_BLOCKDIGESTREQUEST']._serialized_end=1951
+  _globals['_BLOCKDIGESTRESPONSE']._serialized_start=1953
+  _globals['_BLOCKDIGESTRESPONSE']._serialized_end=2075
+  _globals['_TCLOUTPUT']._serialized_start=2077
+  _globals['_TCLOUTPUT']._serialized_end=2185
+  _globals['_TCLBATCHREQUEST']._serialized_start=2188
+  _globals['_TCLBATCHREQUEST']._serialized_end=2327
+  _globals['_TCLBATCHRESPONSE']._serialized_start=2329
+  _globals['_TCLBATCHRESPONSE']._serialized_end=2425
+  _globals['_SESSIONREQUEST']._serialized_start=2427
+  _globals['_SESSIONREQUEST']._serialized_end=2542
+  _globals['_SESSIONRESPONSE']._serialized_start=2545
+  _globals['_SESSIONRESPONSE']._serialized_end=2677
+  _globals['_STATSREQUEST']._serialized_start=2679
+  _globals['_STATSREQUEST']._serialized_end=2729
+  _globals['_STATSRESPONSE']._serialized_start=2732
+  _globals['_STATSRESPONSE']._serialized_end=2885
+  _globals['_STATSRESPONSE_VALUESENTRY']._serialized_start=2840
+  _globals['_STATSRESPONSE_VALUESENTRY']._serialized_end=2885
+  _globals['_REMOTETCL']._serialized_start=2888
+  _globals['_REMOTETCL']._serialized_end=4200
 # @@protoc_insertion_point(module_scope)
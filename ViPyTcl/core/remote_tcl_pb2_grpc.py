@@ -5,7 +5,7 @@ import warnings
 
 from lib.ViPyTcl.core import remote_tcl_pb2 as lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2
 
-GRPC_GENERATED_VERSION = '1.65.2'
+GRPC_GENERATED_VERSION = '1.65.1'
 GRPC_VERSION = grpc.__version__
 EXPECTED_ERROR_RELEASE = '1.66.0'
 SCHEDULED_RELEASE_DATE = 'August 6, 2024'
@@ -48,6 +48,16 @@ class RemoteTclStub(object):
                 request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclRequest.SerializeToString,
                 response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclResponse.FromString,
                 _registered_method=True)
+        self.tcl_stream = channel.unary_stream(
+                '/remote_tcl.RemoteTcl/tcl_stream',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclOutput.FromString,
+                _registered_method=True)
+        self.tcl_batch = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/tcl_batch',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclBatchRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclBatchResponse.FromString,
+                _registered_method=True)
         self.get_file = channel.unary_unary(
                 '/remote_tcl.RemoteTcl/get_file',
                 request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.GetFileRequest.SerializeToString,
@@ -58,6 +68,71 @@ class RemoteTclStub(object):
                 request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileRequest.SerializeToString,
                 response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.FromString,
                 _registered_method=True)
+        self.put_file_stream = channel.stream_unary(
+                '/remote_tcl.RemoteTcl/put_file_stream',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.FromString,
+                _registered_method=True)
+        self.get_file_stream = channel.unary_stream(
+                '/remote_tcl.RemoteTcl/get_file_stream',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.GetFileRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.FromString,
+                _registered_method=True)
+        self.has_blobs = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/has_blobs',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobResponse.FromString,
+                _registered_method=True)
+        self.put_blob_stream = channel.stream_unary(
+                '/remote_tcl.RemoteTcl/put_blob_stream',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.FromString,
+                _registered_method=True)
+        self.link_blobs = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/link_blobs',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobResponse.FromString,
+                _registered_method=True)
+        self.encodings = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/encodings',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.EncodingMessage.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.EncodingMessage.FromString,
+                _registered_method=True)
+        self.dir_manifest = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/dir_manifest',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestResponse.FromString,
+                _registered_method=True)
+        self.block_digests = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/block_digests',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlockDigestRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlockDigestResponse.FromString,
+                _registered_method=True)
+        self.remove_files = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/remove_files',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestResponse.FromString,
+                _registered_method=True)
+        self.open_session = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/open_session',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.FromString,
+                _registered_method=True)
+        self.close_session = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/close_session',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.FromString,
+                _registered_method=True)
+        self.keepalive = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/keepalive',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.FromString,
+                _registered_method=True)
+        self.server_stats = channel.unary_unary(
+                '/remote_tcl.RemoteTcl/server_stats',
+                request_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.StatsRequest.SerializeToString,
+                response_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.StatsResponse.FromString,
+                _registered_method=True)
 
 
 class RemoteTclServicer(object):
@@ -73,6 +148,20 @@ class RemoteTclServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def tcl_stream(self, request, context):
+        """边运行边返回输出，最后一帧 last = true 并带错误信息
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def tcl_batch(self, request, context):
+        """一次请求运行多条命令，服务端连续运行，返回每条命令的输出和状态
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def get_file(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -85,6 +174,90 @@ class RemoteTclServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def put_file_stream(self, request_iterator, context):
+        """分块传输，两端都只在内存中保留一个块
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def get_file_stream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def has_blobs(self, request, context):
+        """按内容寻址上传: 先查询缺少的 blob，只上传缺少的，再在 dst_path 处链接
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def put_blob_stream(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def link_blobs(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def encodings(self, request, context):
+        """压缩协商，返回双方都支持的编码
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def dir_manifest(self, request, context):
+        """目录同步: 服务端目录清单、文件的块摘要、删除文件
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def block_digests(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def remove_files(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def open_session(self, request, context):
+        """会话: 每个客户端独占一个解释器和工作、缓存目录，之后的 rpc 在 metadata vipytcl-session 中带上 session_id
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def close_session(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def keepalive(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def server_stats(self, request, context):
+        """准入控制的队列深度和等待时间等统计，不受准入控制限制
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RemoteTclServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -93,6 +266,16 @@ def add_RemoteTclServicer_to_server(servicer, server):
                     request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclRequest.FromString,
                     response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclResponse.SerializeToString,
             ),
+            'tcl_stream': grpc.unary_stream_rpc_method_handler(
+                    servicer.tcl_stream,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclOutput.SerializeToString,
+            ),
+            'tcl_batch': grpc.unary_unary_rpc_method_handler(
+                    servicer.tcl_batch,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclBatchRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclBatchResponse.SerializeToString,
+            ),
             'get_file': grpc.unary_unary_rpc_method_handler(
                     servicer.get_file,
                     request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.GetFileRequest.FromString,
@@ -103,6 +286,71 @@ def add_RemoteTclServicer_to_server(servicer, server):
                     request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileRequest.FromString,
                     response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.SerializeToString,
             ),
+            'put_file_stream': grpc.stream_unary_rpc_method_handler(
+                    servicer.put_file_stream,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.SerializeToString,
+            ),
+            'get_file_stream': grpc.unary_stream_rpc_method_handler(
+                    servicer.get_file_stream,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.GetFileRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.SerializeToString,
+            ),
+            'has_blobs': grpc.unary_unary_rpc_method_handler(
+                    servicer.has_blobs,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobResponse.SerializeToString,
+            ),
+            'put_blob_stream': grpc.stream_unary_rpc_method_handler(
+                    servicer.put_blob_stream,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.SerializeToString,
+            ),
+            'link_blobs': grpc.unary_unary_rpc_method_handler(
+                    servicer.link_blobs,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobResponse.SerializeToString,
+            ),
+            'encodings': grpc.unary_unary_rpc_method_handler(
+                    servicer.encodings,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.EncodingMessage.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.EncodingMessage.SerializeToString,
+            ),
+            'dir_manifest': grpc.unary_unary_rpc_method_handler(
+                    servicer.dir_manifest,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestResponse.SerializeToString,
+            ),
+            'block_digests': grpc.unary_unary_rpc_method_handler(
+                    servicer.block_digests,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlockDigestRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlockDigestResponse.SerializeToString,
+            ),
+            'remove_files': grpc.unary_unary_rpc_method_handler(
+                    servicer.remove_files,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestResponse.SerializeToString,
+            ),
+            'open_session': grpc.unary_unary_rpc_method_handler(
+                    servicer.open_session,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.SerializeToString,
+            ),
+            'close_session': grpc.unary_unary_rpc_method_handler(
+                    servicer.close_session,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.SerializeToString,
+            ),
+            'keepalive': grpc.unary_unary_rpc_method_handler(
+                    servicer.keepalive,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.SerializeToString,
+            ),
+            'server_stats': grpc.unary_unary_rpc_method_handler(
+                    servicer.server_stats,
+                    request_deserializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.StatsRequest.FromString,
+                    response_serializer=lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.StatsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'remote_tcl.RemoteTcl', rpc_method_handlers)
@@ -145,6 +393,60 @@ class RemoteTcl(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def tcl_stream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/tcl_stream',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclOutput.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def tcl_batch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/tcl_batch',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclBatchRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.TclBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def get_file(request,
             target,
@@ -198,3 +500,354 @@ class RemoteTcl(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def put_file_stream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/remote_tcl.RemoteTcl/put_file_stream',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def get_file_stream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/get_file_stream',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.GetFileRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def has_blobs(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/has_blobs',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def put_blob_stream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/remote_tcl.RemoteTcl/put_blob_stream',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.FileChunk.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.PutFileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def link_blobs(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/link_blobs',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlobResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def encodings(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/encodings',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.EncodingMessage.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.EncodingMessage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def dir_manifest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/dir_manifest',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def block_digests(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/block_digests',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlockDigestRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.BlockDigestResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def remove_files(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/remove_files',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.ManifestResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def open_session(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/open_session',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def close_session(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/close_session',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def keepalive(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/keepalive',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.SessionResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def server_stats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/remote_tcl.RemoteTcl/server_stats',
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.StatsRequest.SerializeToString,
+            lib_dot_ViPyTcl_dot_core_dot_remote__tcl__pb2.StatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..utils.tools import file_digest
+
+logger = logging.getLogger("ViPyTcl")
+
+DefaultReportCacheRoot = os.path.join(os.path.expanduser("~"), ".ViPyTcl", "report_cache")
+DefaultReportCacheBytes = 2 * 1024 ** 3
+
+r"""
+报告缓存，key 为 sha256(DCP 内容摘要, 报告命令, 参数)
+    <root>/<key[:2]>/<key>.rpt.gz     gzip 压缩的报告
+    <root>/index.jsonl                每行一条记录，只追加:
+        {"key", "dcp", "digest", "cmd", "args", "size", "created"}     报告
+        {"dcp", "size", "mtime_ns", "digest"}                           DCP 摘要，(path, size, mtime_ns) 不变时不重新计算
+    读取报告只需要 DCP 文件本身，不需要 vivado
+    远程工程的 DCP 不在本机时摘要由服务端计算，服务端按 (path, size, mtime_ns) 缓存，不写入 index
+"""
+
+
+def report_key(digest: str, cmd: str, args: Dict = None) -> str:
+    """ 参数按名字排序，调用时的顺序不影响 key """
+    args = {k: str(v) for k, v in sorted((args if args else {}).items())}
+    payload = json.dumps([digest, cmd.strip(), args], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """
+    :param root: 缓存目录，可以是多台机器共享的目录
+    :param max_bytes: 压缩后的总大小上限，超过时按最近使用时间淘汰
+    """
+
+    def __init__(self, root: str = "", max_bytes: int = DefaultReportCacheBytes):
+        self.root = root if root else DefaultReportCacheRoot
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._digests = {}  # type: Dict[Tuple[str, int, int], str]
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"<ReportCache {self.root} hits: {self.hits}, misses: {self.misses}>"
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, "index.jsonl")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.rpt.gz")
+
+    def _append_index(self, record: dict) -> None:
+        # 单行追加，多个进程同时写入时不会交错
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def index(self) -> List[dict]:
+        """ 读取 index 并同步其它进程写入的 DCP 摘要 """
+        records = []
+        if not os.path.isfile(self.index_path):
+            return records
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                # 旧版本的记录只有秒级的 mtime，不再使用
+                if "key" not in record and "mtime_ns" in record:
+                    self._digests[(record["dcp"], record["size"], record["mtime_ns"])] = record["digest"]
+                records.append(record)
+        return records
+
+    def dcp_digest(self, dcp: str) -> str:
+        """ 本机可读的 DCP 的内容摘要 """
+        stat = os.stat(dcp)
+        memo = (os.path.abspath(dcp), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._digests:
+            self.index()
+        if memo not in self._digests:
+            self._digests[memo] = file_digest(dcp)
+            self._append_index({"dcp": memo[0], "size": memo[1], "mtime_ns": memo[2], "digest": self._digests[memo]})
+        return self._digests[memo]
+
+    def has(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return text
+
+    def get_report(self, dcp: str, cmd: str, **kwargs) -> Optional[str]:
+        """ 不经过 vivado，直接按 DCP 文件取得缓存的报告，没有时返回 None """
+        return self.get(report_key(self.dcp_digest(dcp), cmd, kwargs))
+
+    def put(self, key: str, report_path: str, meta: dict = None) -> str:
+        """
+        :param report_path: 未压缩的报告文件
+        :param meta: 写入 index 的其它信息，例如 dcp、cmd、args
+        :return: 压缩后的文件路径
+        """
+        path = self._path(key)
+        if os.path.isfile(path):
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{key[:8]}_", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            with open(report_path, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, path)
+        finally:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+
+        record = {"key": key, "size": os.path.getsize(path), "created": time.time()}
+        record.update(meta if meta else {})
+        self._append_index(record)
+        self.evict()
+        return path
+
+    def entries(self, digest: str = "") -> List[dict]:
+        """ index 中仍然存在的报告记录，digest 不为空时只返回该 DCP 的报告 """
+        result, seen = [], set()
+        for record in reversed(self.index()):
+            key = record.get("key")
+            if not key or key in seen or (digest and record.get("digest") != digest) or not self.has(key):
+                continue
+            seen.add(key)
+            result.append(record)
+        return result
+
+    def evict(self) -> int:
+        """ :return: 淘汰的报告数 """
+        files = []
+        for prefix in os.scandir(self.root):
+            if prefix.is_dir():
+                files.extend(e for e in os.scandir(prefix.path) if e.name.endswith(".rpt.gz"))
+        files = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in files))
+        total = sum(f[1] for f in files)
+        n = 0
+        while files and total > self.max_bytes:
+            _, size, path = files.pop(0)
+            os.remove(path)
+            total -= size
+            n += 1
+        if n:
+            logger.info(f"report cache evict {n} reports, size: {total / 1024 ** 2:.1f} MB")
+        return n
+
+    def compact(self) -> None:
+        """ 去掉 index 中已经被淘汰的报告、重复的和旧版本的 DCP 摘要 """
+        records, seen = [], set()
+        for record in reversed(self.index()):
+            if "key" not in record and "mtime_ns" not in record:
+                continue
+            ident = record.get("key") or (record["dcp"], record["size"], record["mtime_ns"])
+            if ident in seen or ("key" in record and not self.has(record["key"])):
+                continue
+            seen.add(ident)
+            records.append(record)
+
+        fd, tmp = tempfile.mkstemp(prefix=".index_", dir=self.root)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in reversed(records):
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp, self.index_path)
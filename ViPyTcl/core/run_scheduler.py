@@ -0,0 +1,367 @@
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from ..base import ViRunFailed, ViArgsError
+
+logger = logging.getLogger("ViPyTcl")
+
+DefaultFetchPatterns = ("*.dcp",)
+
+r"""
+多 run 调度
+    RunHost: 一个 vivado 解释器（本机 TclProcessPopen 或远程 GRPCRemoteTclServicer）以及它的 cores / 内存预算，
+             各 host 打开的是同一个工程（远程 host 上为该机器上的副本）
+    RunJob: 一个 run 以及它依赖的 run
+    RunScheduler: 按关键路径优先把就绪的 job 放到有空闲预算的 host 上 launch_runs，
+                  launch_runs 本身不阻塞，调度线程定期在每个 host 上一次性查询全部运行中 run 的状态，
+                  完成后把 checkpoint 取回本机
+    依赖某个 job 的 job 固定在同一个 host 上运行，因为 parent run 的结果只存在于那个 host 的工程目录中
+"""
+
+
+class JobState:
+    Pending = "pending"
+    Running = "running"
+    Done = "done"
+    Failed = "failed"
+    Skipped = "skipped"
+    Cancelled = "cancelled"
+
+
+class RunEvent:
+    """ 调度事件, kind: queued / started / progress / done / failed / skipped / cancelled / fetched """
+
+    def __init__(self, kind: str, job: 'RunJob', message: str = ""):
+        self.kind = kind
+        self.job = job
+        self.message = message
+        self.time = time.time()
+
+    def __repr__(self):
+        return f"<RunEvent {self.kind} {self.job.run} @{self.job.host} {self.job.progress} {self.message}>"
+
+
+class RunJob:
+    """
+    :param run: run 名
+    :param depends: 依赖的 run 名
+    :param cores: 占用的 cores，同时作为 launch_runs 的 -jobs
+    :param mem_gb: 占用的内存
+    :param weight: 预计耗时（任意单位），用于计算关键路径
+    :param host: 指定 host 名，为空时由调度器选择
+    :param launch_kwargs: launch_runs 的其它参数，例如 to_step="write_bitstream"
+    """
+
+    def __init__(self, run: str, depends: Sequence[str] = (), cores: int = 1, mem_gb: float = 0.0,
+                 weight: float = 1.0, host: str = "", **launch_kwargs):
+        self.run = run
+        self.depends = list(depends)
+        self.cores = cores
+        self.mem_gb = mem_gb
+        self.weight = weight
+        self.host = host
+        self.launch_kwargs = launch_kwargs
+
+        self.state = JobState.Pending
+        self.status = ""
+        self.progress = ""
+        self.priority = 0.0
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self.outputs = []  # type: List[str]
+
+    def __repr__(self):
+        return f"<RunJob {self.run} {self.state} host: {self.host or '-'} status: {self.status!r}>"
+
+    @property
+    def elapsed(self) -> float:
+        if not self.start_time:
+            return 0.0
+        return (self.end_time if self.end_time else time.time()) - self.start_time
+
+
+class RunHost:
+    """
+    一个执行 run 的 vivado 解释器
+    :param prj: 已经打开工程的 VivadoPrj
+    :param cores: 可用 cores
+    :param mem_gb: 可用内存, 0 为不限制
+    :param name: host 名
+    :param owned: 调度器 close 时是否退出该解释器
+    """
+
+    def __init__(self, prj, cores: int, mem_gb: float = 0.0, name: str = "", owned: bool = False):
+        self.prj = prj
+        self.cores = cores
+        self.mem_gb = mem_gb
+        self.name = name if name else (":".join(map(str, prj.server_addr)) if prj.server_addr else "local")
+        self.owned = owned
+        self.running = {}  # type: Dict[str, RunJob]
+
+    def __repr__(self):
+        return f"<RunHost {self.name} cores: {self.free_cores}/{self.cores}, running: {list(self.running)}>"
+
+    @classmethod
+    def local(cls, prj_path: str, cores: int = 0, mem_gb: float = 0.0, name: str = "", **kwargs) -> 'RunHost':
+        """ 新建本机 vivado 解释器并打开工程 """
+        from .vivado_prj import VivadoPrj
+        cores = cores if cores else os.cpu_count()
+        prj = VivadoPrj(prj_path, delay_open=False, max_core=cores, **kwargs)
+        return cls(prj, cores, mem_gb, name if name else "local", owned=True)
+
+    @classmethod
+    def remote(cls, server_addr: str or tuple, prj_path: str, cores: int, mem_gb: float = 0.0,
+               name: str = "") -> 'RunHost':
+        """ 连接远程服务端并打开它本机上的工程，prj_path 为服务端路径 """
+        from .vivado_prj import VivadoPrj
+        prj = VivadoPrj(server_addr=server_addr, max_core=cores)
+        prj.tcl(f"open_project {{{prj_path}}}".replace("\\", "/"))
+        return cls(prj, cores, mem_gb, name, owned=True)
+
+    @property
+    def free_cores(self) -> int:
+        return self.cores - sum(j.cores for j in self.running.values())
+
+    @property
+    def free_mem_gb(self) -> float:
+        if not self.mem_gb:
+            return float("inf")
+        return self.mem_gb - sum(j.mem_gb for j in self.running.values())
+
+    def fits(self, job: RunJob) -> bool:
+        return job.cores <= self.free_cores and job.mem_gb <= self.free_mem_gb
+
+    def launch(self, job: RunJob) -> None:
+        self.prj.reset_runs(job.run)
+        kwargs = dict(job.launch_kwargs)
+        kwargs.setdefault("jobs", job.cores)
+        self.prj.launch_runs(job.run, **kwargs)
+        self.running[job.run] = job
+
+    def poll(self) -> Dict[str, tuple]:
+        """
+        一次 tcl 调用查询全部运行中的 run
+        :return: {run: (PROGRESS, STATUS)}
+        """
+        if not self.running:
+            return {}
+        runs = " ".join(f"{{{r}}}" for r in self.running)
+        lines = self.prj.tcl(f"foreach r [list {runs}] {{puts \"$r\\t[get_property PROGRESS [get_runs $r]]"
+                             f"\\t[get_property STATUS [get_runs $r]]\"}}")
+        result = {}
+        for line in lines:
+            fields = line.split("\t")
+            if len(fields) == 3 and fields[0] in self.running:
+                result[fields[0]] = (fields[1], fields[2])
+        return result
+
+    def close(self) -> None:
+        if self.owned:
+            self.prj.exit()
+
+
+def run_is_done(progress: str, status: str) -> Optional[bool]:
+    """ :return: 成功 True，失败 False，仍在运行 None """
+    if "ERROR" in status or "failed" in status.lower() or "Cancelled" in status:
+        return False
+    if progress.strip() == "100%" and "Complete" in status:
+        return True
+    return None
+
+
+class RunScheduler:
+    """
+    :param hosts: RunHost 列表
+    :param output_dir: 每个 run 完成后取回的文件放在 output_dir/<run>/ 下，为空时不取回
+    :param fetch_patterns: 取回的文件
+    :param poll_interval: 查询 run 状态的间隔, sec
+    :param auto_parent: 没有指定 depends 时，用 run 的 PARENT 属性作为依赖
+    """
+
+    def __init__(self, hosts: Iterable[RunHost], output_dir: str = "",
+                 fetch_patterns: Sequence[str] = DefaultFetchPatterns, poll_interval: float = 10,
+                 auto_parent: bool = True):
+        self.hosts = {h.name: h for h in hosts}
+        if not self.hosts:
+            raise ViArgsError("run scheduler needs at least one host")
+        self.output_dir = output_dir
+        self.fetch_patterns = tuple(fetch_patterns)
+        self.poll_interval = poll_interval
+        self.auto_parent = auto_parent
+        self.jobs = {}  # type: Dict[str, RunJob]
+        self._callbacks = []  # type: List[Callable[[RunEvent], None]]
+
+    def __repr__(self):
+        return f"<RunScheduler hosts: {list(self.hosts)}, jobs: {len(self.jobs)}>"
+
+    def add(self, run: str, depends: Sequence[str] = (), cores: int = 1, mem_gb: float = 0.0,
+            weight: float = 1.0, host: str = "", **launch_kwargs) -> RunJob:
+        if host and host not in self.hosts:
+            raise ViArgsError(f"unknown host {host}")
+        if not any(cores <= h.cores and (not h.mem_gb or mem_gb <= h.mem_gb) for h in self.hosts.values()):
+            raise ViArgsError(f"run {run} needs {cores} cores / {mem_gb} GB, no host is big enough")
+        job = RunJob(run, depends, cores, mem_gb, weight, host, **launch_kwargs)
+        self.jobs[run] = job
+        self._emit("queued", job)
+        return job
+
+    def add_callback(self, func: Callable[[RunEvent], None]) -> None:
+        """ func(event: RunEvent)，在调度线程中调用 """
+        self._callbacks.append(func)
+
+    def _emit(self, kind: str, job: RunJob, message: str = "") -> None:
+        event = RunEvent(kind, job, message)
+        logger.info(f"run scheduler {event}")
+        for func in self._callbacks:
+            try:
+                func(event)
+            except Exception as err:
+                logger.error(f"run scheduler callback failed: {err}")
+
+    def _resolve_parents(self) -> None:
+        first = next(iter(self.hosts.values()))
+        for job in self.jobs.values():
+            if job.depends:
+                continue
+            result = first.prj.tcl(f"get_property -quiet PARENT [get_runs {{{job.run}}}]")
+            parent = result[0].strip() if result else ""
+            if parent in self.jobs:
+                job.depends = [parent]
+
+    def _compute_priority(self) -> None:
+        """ 关键路径优先: priority 为从该 job 到任意末端 job 的最长 weight 之和 """
+        children = {run: [] for run in self.jobs}
+        for job in self.jobs.values():
+            for dep in job.depends:
+                if dep not in self.jobs:
+                    raise ViArgsError(f"run {job.run} depends on unknown run {dep}")
+                children[dep].append(job.run)
+
+        memo, visiting = {}, set()
+
+        def longest(run: str) -> float:
+            if run in memo:
+                return memo[run]
+            if run in visiting:
+                raise ViArgsError(f"dependency cycle at run {run}")
+            visiting.add(run)
+            memo[run] = self.jobs[run].weight + max((longest(c) for c in children[run]), default=0.0)
+            visiting.discard(run)
+            return memo[run]
+
+        for run, job in self.jobs.items():
+            job.priority = longest(run)
+
+    def _ready(self) -> List[RunJob]:
+        ready = [j for j in self.jobs.values() if j.state == JobState.Pending
+                 and all(self.jobs[d].state == JobState.Done for d in j.depends)]
+        return sorted(ready, key=lambda j: -j.priority)
+
+    def _place(self, job: RunJob) -> Optional[RunHost]:
+        """ 依赖 job 所在的 host 优先（必须），否则选空闲 cores 最多的 host """
+        pinned = job.host or next((self.jobs[d].host for d in job.depends if self.jobs[d].host), "")
+        candidates = [self.hosts[pinned]] if pinned else list(self.hosts.values())
+        candidates = [h for h in candidates if h.fits(job)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda h: (h.free_cores, h.free_mem_gb))
+
+    def _skip_dependents(self, failed: RunJob) -> None:
+        for job in self.jobs.values():
+            if job.state == JobState.Pending and failed.run in job.depends:
+                job.state = JobState.Skipped
+                self._emit("skipped", job, f"depends on failed run {failed.run}")
+                self._skip_dependents(job)
+
+    def _finish(self, host: RunHost, job: RunJob, ok: bool) -> None:
+        host.running.pop(job.run, None)
+        job.end_time = time.time()
+        if not ok:
+            job.state = JobState.Failed
+            self._emit("failed", job, job.status)
+            self._skip_dependents(job)
+            return
+
+        job.state = JobState.Done
+        self._emit("done", job, f"{job.elapsed:.0f} s")
+        if self.output_dir:
+            job.outputs = host.prj.fetch_run_outputs(job.run, os.path.join(self.output_dir, job.run),
+                                                     self.fetch_patterns)
+            self._emit("fetched", job, f"{len(job.outputs)} files")
+
+    def cancel(self, run: str, reason: str = "") -> None:
+        """ 取消 job，运行中的 run 通过 reset_run 停止，依赖它的 job 跳过 """
+        job = self.jobs[run]
+        if job.state not in (JobState.Pending, JobState.Running):
+            return
+        if job.state == JobState.Running:
+            host = self.hosts[job.host]
+            host.prj.reset_runs(run)
+            host.running.pop(run, None)
+            job.end_time = time.time()
+        job.state = JobState.Cancelled
+        self._emit("cancelled", job, reason)
+        self._skip_dependents(job)
+
+    def step(self) -> bool:
+        """
+        调度一轮: 查询运行中的 run，再把就绪的 job 放到空闲 host 上
+        :return: 是否还有未结束的 job
+        """
+        for host in self.hosts.values():
+            for run, (progress, status) in host.poll().items():
+                job = host.running[run]
+                if (progress, status) != (job.progress, job.status):
+                    job.progress, job.status = progress, status
+                    self._emit("progress", job, status)
+                done = run_is_done(progress, status)
+                if done is not None:
+                    self._finish(host, job, done)
+
+        for job in self._ready():
+            host = self._place(job)
+            if host is None:
+                if not any(h.running for h in self.hosts.values()):
+                    # 全部 host 空闲仍然放不下，只可能是固定的 host 预算不够
+                    job.state, job.status = JobState.Failed, "no host fits the job"
+                    self._emit("failed", job, job.status)
+                    self._skip_dependents(job)
+                continue
+            job.host = host.name
+            job.start_time = time.time()
+            job.state = JobState.Running
+            try:
+                host.launch(job)
+            except Exception as err:
+                job.status = str(err)
+                self._finish(host, job, False)
+                continue
+            self._emit("started", job, f"cores: {job.cores}")
+
+        return any(j.state in (JobState.Pending, JobState.Running) for j in self.jobs.values())
+
+    def run(self, raise_on_fail: bool = False) -> Dict[str, RunJob]:
+        """
+        阻塞直到全部 job 结束
+        :param raise_on_fail: 有 run 失败时抛出 ViRunFailed
+        """
+        if self.auto_parent:
+            self._resolve_parents()
+        self._compute_priority()
+
+        while self.step():
+            if not any(h.running for h in self.hosts.values()) and not self._ready():
+                break
+            time.sleep(self.poll_interval)
+
+        failed = [j.run for j in self.jobs.values()
+                  if j.state in (JobState.Failed, JobState.Skipped, JobState.Cancelled)]
+        if failed and raise_on_fail:
+            raise ViRunFailed(f"runs failed: {failed}")
+        return self.jobs
+
+    def close(self) -> None:
+        for host in self.hosts.values():
+            host.close()
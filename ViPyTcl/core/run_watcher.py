@@ -0,0 +1,368 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+根据 run 目录中的文件跟踪 run 状态，不占用 vivado 解释器
+    .vivado.begin.rst / .vivado.end.rst / .vivado.error.rst     整个 run 的开始、结束、出错
+    .<step>.begin.rst / .<step>.end.rst / .<step>.error.rst     impl 各 step 的开始、结束、出错
+    runme.log                                                   Command / Phase / Timing Summary / ERROR 行
+    轮询时每个 run 只 scandir 一次，runme.log 只读取新增的部分
+"""
+
+_MarkerRe = re.compile(r"^\.(?P<step>[\w]+)\.(?P<kind>begin|end|error)\.rst$")
+_CommandRe = re.compile(r"^Command: (?P<step>\w+)")
+_CompletedRe = re.compile(r"^(?P<step>\w+) completed successfully")
+_PhaseRe = re.compile(r"^Phase (?P<phase>[\d.]+ .*?)\s*(?:\|\s*Checksum:.*)?$")
+_TimingRe = re.compile(r"Timing Summary\s*\|")
+_TimingFieldRe = re.compile(r"(?P<key>WNS|TNS|WHS|THS)=(?P<value>-?[\d.]+|N/A)")
+
+
+class RunStatus:
+    NotStarted = "not_started"
+    Running = "running"
+    Done = "done"
+    Failed = "failed"
+
+
+class RunStep:
+    __slots__ = ("name", "begin", "end", "failed")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.begin = 0.0
+        self.end = 0.0
+        self.failed = False
+
+    def __repr__(self):
+        return f"<RunStep {self.name} {self.elapsed:.0f} s{' failed' if self.failed else ''}>"
+
+    @property
+    def elapsed(self) -> float:
+        if not self.begin:
+            return 0.0
+        return (self.end if self.end else time.time()) - self.begin
+
+
+class RunState:
+    """ 单个 run 的状态 """
+
+    def __init__(self, run: str, directory: str):
+        self.run = run
+        self.directory = directory
+        self.status = RunStatus.NotStarted
+        self.begin = 0.0
+        self.end = 0.0
+        self.steps = {}  # type: Dict[str, RunStep]
+        self.current_step = ""
+        self.phase = ""
+        self.timing = {}  # type: Dict[str, float]  # 最近一次 Timing Summary 的 WNS/TNS/WHS/THS
+        self.errors = []  # type: List[str]
+
+        self._markers = set()
+        self._log_offset = 0
+        self._log_tail = ""
+
+    def __repr__(self):
+        return f"<RunState {self.run} {self.status} step: {self.current_step}, timing: {self.timing}>"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (RunStatus.Done, RunStatus.Failed)
+
+    @property
+    def elapsed(self) -> float:
+        if not self.begin:
+            return 0.0
+        return (self.end if self.end else time.time()) - self.begin
+
+
+class RunWatchEvent:
+    """ kind: started / step_started / step_done / step_failed / phase / timing / error / done / failed / reset """
+
+    def __init__(self, kind: str, state: RunState, step: str = "", message: str = ""):
+        self.kind = kind
+        self.state = state
+        self.step = step
+        self.message = message
+        self.time = time.time()
+
+    def __repr__(self):
+        return f"<RunWatchEvent {self.kind} {self.state.run} {self.step} {self.message}>"
+
+    @property
+    def run(self) -> str:
+        return self.state.run
+
+
+class RunWatcher:
+    """
+    :param run_dirs: {run: run 目录}
+    :param poll_interval: 轮询间隔, sec
+    :param callback: callback(event: RunWatchEvent)，在轮询线程中调用
+    """
+
+    def __init__(self, run_dirs: Dict[str, str], poll_interval: float = 2.0,
+                 callback: Callable[[RunWatchEvent], None] = None):
+        self.states = {run: RunState(run, directory) for run, directory in run_dirs.items()}
+        self.poll_interval = poll_interval
+        self._callbacks = [callback] if callback else []
+        self._thread = None  # type: threading.Thread or None
+        self._stop = threading.Event()
+        self._changed = threading.Condition()
+
+    def __repr__(self):
+        return f"<RunWatcher runs: {list(self.states)}>"
+
+    def add_callback(self, func: Callable[[RunWatchEvent], None]) -> None:
+        self._callbacks.append(func)
+
+    def add_run(self, run: str, directory: str) -> RunState:
+        self.states[run] = RunState(run, directory)
+        return self.states[run]
+
+    def _emit(self, kind: str, state: RunState, step: str = "", message: str = "") -> None:
+        event = RunWatchEvent(kind, state, step, message)
+        logger.debug(f"run watcher {event}")
+        for func in self._callbacks:
+            try:
+                func(event)
+            except Exception as err:
+                logger.error(f"run watcher callback failed: {err}")
+
+    def _scan_markers(self, state: RunState) -> None:
+        try:
+            entries = {e.name: e for e in os.scandir(state.directory) if e.name.endswith(".rst")}
+        except FileNotFoundError:
+            entries = {}
+
+        names = set(entries)
+        begin = entries.get(".vivado.begin.rst")
+        relaunched = state.begin and begin is not None and begin.stat().st_mtime != state.begin
+        if state._markers and (not names or relaunched):
+            # run 被 reset，目录被清空，或者已经重新启动
+            self.states[state.run] = RunState(state.run, state.directory)
+            self._emit("reset", self.states[state.run])
+            return
+
+        # mtime 相同时（文件系统精度不足或同时创建）begin 在 end / error 之前
+        for name in sorted(names - state._markers,
+                           key=lambda n: (entries[n].stat().st_mtime, not n.endswith(".begin.rst"), n)):
+            match = _MarkerRe.match(name)
+            if not match:
+                continue
+            step, kind = match.group("step"), match.group("kind")
+            mtime = entries[name].stat().st_mtime
+            if step == "vivado":
+                if kind == "begin":
+                    state.status, state.begin = RunStatus.Running, mtime
+                    self._emit("started", state)
+                elif kind == "end":
+                    state.status, state.end = RunStatus.Done, mtime
+                else:
+                    state.status, state.end = RunStatus.Failed, mtime
+                continue
+
+            run_step = state.steps.setdefault(step, RunStep(step))
+            if kind == "begin":
+                run_step.begin = mtime
+                state.current_step = step
+                self._emit("step_started", state, step)
+            else:
+                run_step.end = mtime
+                run_step.failed = kind == "error"
+                self._emit("step_failed" if run_step.failed else "step_done", state, step)
+        state._markers = names
+
+    def _scan_log(self, state: RunState) -> None:
+        path = os.path.join(state.directory, "runme.log")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        if stat.st_size < state._log_offset:
+            state._log_offset, state._log_tail = 0, ""
+        if stat.st_size == state._log_offset:
+            return
+
+        with open(path, "rb") as f:
+            f.seek(state._log_offset)
+            data = f.read()
+        state._log_offset += len(data)
+
+        text = state._log_tail + data.decode("utf-8", errors="replace")
+        lines = text.split("\n")
+        state._log_tail = lines.pop()
+        for line in lines:
+            self._parse_log_line(state, line.rstrip("\r"))
+
+    def _parse_log_line(self, state: RunState, line: str) -> None:
+        match = _CommandRe.match(line)
+        if match:
+            # synth run 没有 step 标记文件，由 Command 行得到 step
+            step = match.group("step")
+            run_step = state.steps.setdefault(step, RunStep(step))
+            if not run_step.begin:
+                run_step.begin = time.time()
+                state.current_step = step
+                self._emit("step_started", state, step)
+            return
+
+        match = _CompletedRe.match(line)
+        if match:
+            run_step = state.steps.get(match.group("step"))
+            if run_step is not None and not run_step.end:
+                run_step.end = time.time()
+                self._emit("step_done", state, run_step.name)
+            return
+
+        match = _PhaseRe.match(line)
+        if match:
+            state.phase = match.group("phase")
+            self._emit("phase", state, state.current_step, state.phase)
+            return
+
+        if _TimingRe.search(line):
+            timing = {m.group("key"): float("nan") if m.group("value") == "N/A" else float(m.group("value"))
+                      for m in _TimingFieldRe.finditer(line)}
+            if timing:
+                state.timing = timing
+                self._emit("timing", state, state.current_step, line.strip())
+            return
+
+        if line.startswith("ERROR:"):
+            state.errors.append(line)
+            self._emit("error", state, state.current_step, line)
+
+    def poll(self) -> None:
+        """ 检查一次全部 run """
+        changed = False
+        for state in list(self.states.values()):
+            finished = state.finished
+            self._scan_markers(state)
+            if finished and self.states[state.run] is state:
+                # 结束的 run 只检查标记文件，发现 reset 后重新跟踪
+                continue
+            state = self.states[state.run]
+            self._scan_log(state)
+            if state.finished:
+                changed = True
+                self._emit("done" if state.status == RunStatus.Done else "failed", state, message=f"{state.elapsed:.0f} s")
+
+        if changed:
+            with self._changed:
+                self._changed.notify_all()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as err:
+                logger.error(f"run watcher poll failed: {err}")
+            with self._changed:
+                # 在锁中退出，之后 add_run + start 会启动新的线程
+                if self.states and all(s.finished for s in self.states.values()):
+                    self._thread = None
+                    self._changed.notify_all()
+                    return
+            self._stop.wait(self.poll_interval)
+
+        with self._changed:
+            self._changed.notify_all()
+
+    def start(self) -> 'RunWatcher':
+        """ 启动轮询线程，全部 run 结束后线程退出，之后再次调用（例如 add_run 之后）会重新启动 """
+        with self._changed:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="vipytcl_run_watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def _refresh(self) -> None:
+        """ 轮询线程已经退出时先检查一次，结束后又被 reset / 重新启动的 run 重新变为未结束 """
+        if self._thread is None:
+            self.poll()
+
+    def _pending(self, runs: Iterable[str] = None) -> List[str]:
+        runs = list(runs) if runs else list(self.states)
+        return [r for r in runs if not self.states[r].finished]
+
+    def wait(self, runs: Iterable[str] = None, timeout: float = None) -> bool:
+        """
+        阻塞到 runs 全部结束，不占用 vivado 解释器
+        :return: 超时返回 False
+        """
+        runs = list(runs) if runs else list(self.states)
+        self._refresh()
+        if self._pending(runs):
+            self.start()
+        deadline = time.time() + timeout if timeout else None
+        with self._changed:
+            while self._pending(runs):
+                remaining = deadline - time.time() if deadline else self.poll_interval
+                if remaining <= 0:
+                    return False
+                self._changed.wait(min(remaining, self.poll_interval))
+        return True
+
+    async def wait_async(self, runs: Iterable[str] = None, timeout: float = None) -> bool:
+        """ wait 的 asyncio 版本 """
+        runs = list(runs) if runs else list(self.states)
+        self._refresh()
+        if self._pending(runs):
+            self.start()
+        deadline = time.time() + timeout if timeout else None
+        while self._pending(runs):
+            if deadline and time.time() >= deadline:
+                return False
+            await asyncio.sleep(self.poll_interval)
+        return True
+
+    async def events(self):
+        """
+        以 async for 的方式消费事件，全部 run 结束后退出
+            async for event in watcher.events(): ...
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()  # type: asyncio.Queue
+        done = object()
+
+        def forward(event: RunWatchEvent):
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+            if event.kind in ("done", "failed") and all(s.finished for s in self.states.values()):
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        self.add_callback(forward)
+        try:
+            self._refresh()
+            if not self._pending():
+                return
+            self.start()
+            while True:
+                event = await queue.get()
+                if event is done:
+                    return
+                yield event
+        finally:
+            self._callbacks.remove(forward)
+
+    def summary(self) -> Dict[str, Optional[dict]]:
+        return {run: {"status": s.status, "elapsed": s.elapsed, "current_step": s.current_step,
+                      "steps": {k: v.elapsed for k, v in s.steps.items()}, "timing": dict(s.timing),
+                      "errors": list(s.errors)}
+                for run, s in self.states.items()}
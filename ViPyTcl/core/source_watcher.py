@@ -0,0 +1,337 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from ..utils.tools import file_digest
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+监视工程的 HDL / XDC / IP 源文件，按改动的类型只重新运行受影响的 run
+    constraint  只改了约束                  -> 使用该 constrset 的 impl run（约束参与综合时为 synth run）
+    ooc         改动的文件属于 BlockSrcs    -> 该 fileset 对应的 OOC synth run
+    top         改动的文件属于 DesignSrcs   -> 顶层 synth run（to_impl 时连同其下的 impl run）
+    仿真文件等不属于任何 run 的改动被忽略
+文件与 fileset、run 的对应关系由一次 tcl 调用取得
+    F   file    FILE_TYPE   fileset     FILESET_TYPE    USED_IN_SYNTHESIS
+    R   run     SRCSET      CONSTRSET   IS_SYNTHESIS    PARENT
+"""
+
+SourceMapTcl = r"""
+namespace eval ::vipytcl {}
+
+proc ::vipytcl::source_map {} {
+    set lines [list]
+    foreach fs [get_filesets -quiet] {
+        set t [get_property -quiet FILESET_TYPE $fs]
+        foreach f [get_files -quiet -norecurse -of_objects $fs] {
+            lappend lines [join [list F $f [get_property -quiet FILE_TYPE $f] $fs $t \
+                [get_property -quiet USED_IN_SYNTHESIS $f]] "\t"]
+        }
+    }
+    foreach r [get_runs -quiet] {
+        lappend lines [join [list R $r [get_property -quiet SRCSET $r] [get_property -quiet CONSTRSET $r] \
+            [get_property -quiet IS_SYNTHESIS $r] [get_property -quiet PARENT $r]] "\t"]
+    }
+    return [join $lines "\n"]
+}
+"""
+
+
+class ChangeKind:
+    Constraint = "constraint"
+    OOC = "ooc"
+    Top = "top"
+    Ignored = "ignored"
+
+
+class SourceFile:
+    __slots__ = ("path", "file_type", "fileset", "fileset_type", "used_in_synthesis")
+
+    def __init__(self, path: str, file_type: str, fileset: str, fileset_type: str, used_in_synthesis: bool):
+        self.path = path
+        self.file_type = file_type
+        self.fileset = fileset
+        self.fileset_type = fileset_type
+        self.used_in_synthesis = used_in_synthesis
+
+    def __repr__(self):
+        return f"<SourceFile {self.fileset}:{os.path.basename(self.path)} {self.file_type}>"
+
+    @property
+    def kind(self) -> str:
+        if self.fileset_type == "Constrs" or self.file_type == "XDC":
+            return ChangeKind.Constraint
+        if self.fileset_type == "BlockSrcs":
+            return ChangeKind.OOC
+        if self.fileset_type == "DesignSrcs":
+            return ChangeKind.Top
+        return ChangeKind.Ignored
+
+
+class SourceMap:
+    """ 工程的源文件、fileset 与 run 的对应关系 """
+
+    def __init__(self):
+        self.files = {}  # path: SourceFile
+        self.runs = {}  # run: (srcset, constrset, is_synth, parent)
+
+    def __repr__(self):
+        return f"<SourceMap files: {len(self.files)}, runs: {len(self.runs)}>"
+
+    def synth_runs(self, srcset: str = "", constrset: str = "") -> List[str]:
+        return [r for r, (src, constr, synth, _) in self.runs.items()
+                if synth and (not srcset or src == srcset) and (not constrset or constr == constrset)]
+
+    def impl_runs(self, parents: Iterable[str] = (), constrset: str = "") -> List[str]:
+        parents = set(parents)
+        return [r for r, (_, constr, synth, parent) in self.runs.items()
+                if not synth and (not parents or parent in parents) and (not constrset or constr == constrset)]
+
+
+def parse_source_map(lines: Iterable[str]) -> SourceMap:
+    source_map = SourceMap()
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        if fields[0] == "F":
+            fields += [""] * (6 - len(fields))
+            source_map.files[fields[1]] = SourceFile(fields[1], fields[2], fields[3], fields[4], fields[5] != "0")
+        elif fields[0] == "R":
+            fields += [""] * (6 - len(fields))
+            source_map.runs[fields[1]] = (fields[2], fields[3], fields[4] == "1", fields[5])
+    return source_map
+
+
+class RebuildPlan:
+    """
+    一批改动对应的最小重新运行集合
+        changes: {kind: [文件]}
+        reset: 需要 reset 的 run
+        launch: 需要 launch 的 run（launch impl run 时 vivado 会先运行 reset 过的 parent）
+    """
+
+    def __init__(self):
+        self.changes = {}  # ChangeKind: 文件列表
+        self.reset = []  # type: List[str]
+        self.launch = []  # type: List[str]
+
+    def __repr__(self):
+        return f"<RebuildPlan {', '.join(f'{k}: {len(v)}' for k, v in self.changes.items())} launch: {self.launch}>"
+
+    def __bool__(self):
+        return bool(self.launch)
+
+    @property
+    def kind(self) -> str:
+        """ 整批改动中影响最大的类型 """
+        for kind in (ChangeKind.Top, ChangeKind.OOC, ChangeKind.Constraint):
+            if kind in self.changes:
+                return kind
+        return ChangeKind.Ignored
+
+
+def plan_rebuild(source_map: SourceMap, changed: Iterable[str], to_impl: bool = False) -> RebuildPlan:
+    """
+    :param changed: 改动的文件（vivado 端路径）
+    :param to_impl: RTL 改动时连同 impl run 一起重新运行
+    """
+    plan = RebuildPlan()
+    reset, launch = [], []  # type: List[str], List[str]
+
+    def add(runs: Iterable[str], to: List[str]):
+        for r in runs:
+            if r not in to:
+                to.append(r)
+
+    for path in changed:
+        source = source_map.files.get(path)
+        kind = source.kind if source else ChangeKind.Ignored
+        plan.changes.setdefault(kind, []).append(path)
+        if kind == ChangeKind.Ignored:
+            continue
+
+        if kind == ChangeKind.Constraint:
+            if source.used_in_synthesis:
+                synth = source_map.synth_runs(constrset=source.fileset)
+                add(synth, reset)
+                add(source_map.impl_runs(synth, source.fileset) if to_impl else synth, launch)
+            impl = source_map.impl_runs(constrset=source.fileset)
+            add(impl, reset)
+            add(impl, launch)
+        else:
+            synth = source_map.synth_runs(srcset=source.fileset)
+            add(synth, reset)
+            children = source_map.impl_runs(synth) if kind == ChangeKind.Top and to_impl else []
+            add(children, reset)
+            add(children or synth, launch)
+
+    # launch 了 impl run 时不再单独 launch 它的 parent
+    parents = {source_map.runs[r][3] for r in launch if r in source_map.runs and not source_map.runs[r][2]}
+    plan.reset = reset
+    plan.launch = [r for r in launch if r not in parents]
+    return plan
+
+
+class SourceChangeEvent:
+    """ kind: changed / rebuild / error """
+
+    def __init__(self, kind: str, plan: RebuildPlan = None, message: str = ""):
+        self.kind = kind
+        self.plan = plan
+        self.message = message
+        self.time = time.time()
+
+    def __repr__(self):
+        return f"<SourceChangeEvent {self.kind} {self.plan} {self.message}>"
+
+
+class SourceWatcher:
+    """
+    轮询源文件的 mtime / size，变化后再比较内容摘要，只 touch 不会触发重新运行
+    最后一次改动之后 debounce 秒内没有新的改动时，在同一个（已打开工程的）vivado 解释器中 reset / launch 受影响的 run
+    :param prj: VivadoPrj
+    :param debounce: sec
+    :param poll_interval: sec
+    :param to_impl: RTL 改动时连同 impl run 一起重新运行
+    :param path_map: (vivado 端路径前缀, 本机路径前缀)
+    :param refresh_interval: 重新取得源文件列表的间隔, sec，之后加入工程的文件也会被监视，0 为只在 start 时取得
+    :param callback: callback(event: SourceChangeEvent)，在轮询线程中调用
+    :param launch_kwargs: launch_runs 的参数
+    """
+
+    def __init__(self, prj, debounce: float = 2.0, poll_interval: float = 1.0, to_impl: bool = False,
+                 path_map: Tuple[str, str] = (), callback: Callable[[SourceChangeEvent], None] = None,
+                 refresh_interval: float = 30.0, **launch_kwargs):
+        self.prj = prj
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.to_impl = to_impl
+        self.path_map = path_map
+        self.refresh_interval = refresh_interval
+        self.launch_kwargs = launch_kwargs
+        self.source_map = SourceMap()
+        self.history = []  # type: List[RebuildPlan]
+
+        self._callbacks = [callback] if callback else []
+        self._signatures = {}  # path: (mtime, size, digest)
+        self._pending = set()
+        self._last_change = 0.0
+        self._last_refresh = 0.0
+        self._thread = None  # type: threading.Thread or None
+        self._stop = threading.Event()
+
+    def __repr__(self):
+        return f"<SourceWatcher {self.source_map} pending: {len(self._pending)}>"
+
+    def add_callback(self, func: Callable[[SourceChangeEvent], None]) -> None:
+        self._callbacks.append(func)
+
+    def _emit(self, kind: str, plan: RebuildPlan = None, message: str = "") -> None:
+        event = SourceChangeEvent(kind, plan, message)
+        logger.debug(f"source watcher {event}")
+        for func in self._callbacks:
+            try:
+                func(event)
+            except Exception as err:
+                logger.error(f"source watcher callback failed: {err}")
+
+    def _local_path(self, path: str) -> str:
+        return path.replace(self.path_map[0], self.path_map[1], 1) if self.path_map else path
+
+    def _signature(self, path: str, digest: str = "") -> Optional[Tuple[float, int, str]]:
+        try:
+            stat = os.stat(self._local_path(path))
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size, digest
+
+    def refresh(self) -> SourceMap:
+        """ 重新取得源文件与 run 的对应关系，新加入的文件以当前内容为基准 """
+        self._last_refresh = time.time()
+        self.prj.source_script(SourceMapTcl, "vipytcl_source_map.tcl", once=True)
+        self.source_map = parse_source_map(self.prj.tcl("::vipytcl::source_map"))
+        for path in self.source_map.files:
+            if path not in self._signatures:
+                self._signatures[path] = self._signature(path, self._digest(path))
+        for path in set(self._signatures) - set(self.source_map.files):
+            del self._signatures[path]
+        return self.source_map
+
+    def _digest(self, path: str) -> str:
+        try:
+            return file_digest(self._local_path(path))
+        except OSError:
+            return ""
+
+    def scan(self) -> List[str]:
+        """ 检查一次全部源文件，返回内容变化的文件 """
+        changed = []
+        for path, old in self._signatures.items():
+            new = self._signature(path)
+            if new == old or (old and new and new[:2] == old[:2]):
+                continue
+            digest = self._digest(path) if new else ""
+            if old and digest == old[2]:
+                # 只更新了 mtime
+                self._signatures[path] = new[:2] + (digest,)
+                continue
+            self._signatures[path] = new[:2] + (digest,) if new else None
+            changed.append(path)
+        return changed
+
+    def poll(self) -> Optional[RebuildPlan]:
+        """ 检查一次，debounce 到期时执行重新运行并返回其 RebuildPlan """
+        if self.refresh_interval and time.time() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+        changed = self.scan()
+        if changed:
+            self._pending.update(changed)
+            self._last_change = time.time()
+            self._emit("changed", message=", ".join(os.path.basename(p) for p in changed))
+        if not self._pending or time.time() - self._last_change < self.debounce:
+            return None
+
+        pending, self._pending = sorted(self._pending), set()
+        plan = plan_rebuild(self.source_map, pending, self.to_impl)
+        if plan:
+            self.rebuild(plan)
+        return plan
+
+    def rebuild(self, plan: RebuildPlan) -> None:
+        logger.info(f"source watcher rebuild {plan.kind}: reset {plan.reset}, launch {plan.launch}")
+        try:
+            for run in plan.reset:
+                self.prj.reset_runs(run)
+            self.prj.launch_runs(" ".join(plan.launch), **self.launch_kwargs)
+        except Exception as err:
+            logger.error(f"source watcher rebuild failed: {err}")
+            self._emit("error", plan, str(err))
+            return
+        self.history.append(plan)
+        self._emit("rebuild", plan)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as err:
+                logger.error(f"source watcher poll failed: {err}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self) -> 'SourceWatcher':
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        if not self.source_map.files:
+            self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="vipytcl_source_watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,299 @@
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .run_scheduler import RunScheduler, RunHost, RunJob, JobState
+from .run_watcher import RunWatcher
+from .timing_report import parse_design_timing_summary
+from .utilization_report import parse_utilization_report
+from ..base import ViArgsError
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+实现策略 / directive 的并行搜索
+    space: {run 属性: 候选值列表}，例如
+        {"STRATEGY": ["Performance_Explore", "Performance_NetDelay_high"],
+         "STEPS.PLACE_DESIGN.ARGS.DIRECTIVE": ["Explore", "ExtraTimingOpt"]}
+    search:
+        grid      全部组合
+        random    随机抽取 n 个组合
+        adaptive  先随机抽取一批，之后每次在当前最好的候选上随机改变一个属性；
+                  依赖里没有贝叶斯优化的库，用这种局部搜索代替
+    候选 run 由模板 impl run 的 flow / constrset 以及 parent synth run 创建，通过 RunScheduler 在 cores 预算内并行运行
+    运行中 runme.log 的 Intermediate Timing Summary 的 WNS 比已完成的最好结果差 early_stop_margin 以上时提前停止
+"""
+
+SweepReportPatterns = ("*_timing_summary_routed.rpt", "*_utilization_placed.rpt")
+
+# 不同器件系列的资源名
+_UtilizationKeys = {
+    "LUT": ("Slice LUTs", "CLB LUTs"),
+    "FF": ("Slice Registers", "CLB Registers", "Register as Flip Flop"),
+    "BRAM": ("Block RAM Tile",),
+    "DSP": ("DSPs",),
+}
+
+
+def grid_candidates(space: Dict[str, Sequence[str]]) -> Iterator[Dict[str, str]]:
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_candidates(space: Dict[str, Sequence[str]], n: int, rng: random.Random) -> Iterator[Dict[str, str]]:
+    """ 不重复地随机抽取，组合数不足 n 时全部返回 """
+    total = int(np.prod([len(v) for v in space.values()]))
+    seen = set()
+    while len(seen) < min(n, total):
+        candidate = {k: rng.choice(list(v)) for k, v in space.items()}
+        key = tuple(candidate.items())
+        if key not in seen:
+            seen.add(key)
+            yield candidate
+
+
+def mutate_candidate(best: Dict[str, str], space: Dict[str, Sequence[str]], rng: random.Random) -> Dict[str, str]:
+    candidate = dict(best)
+    keys = [k for k in space if len(space[k]) > 1]
+    if keys:
+        key = rng.choice(keys)
+        candidate[key] = rng.choice([v for v in space[key] if v != best[key]])
+    return candidate
+
+
+class SweepResult:
+    """
+    搜索结果表，每个候选一行
+        rows: [{"run", "status", "elapsed", <属性>..., "WNS(ns)", "TNS(ns)", ..., "LUT", "FF", "BRAM", "DSP"}]
+    """
+
+    def __init__(self, params: Sequence[str]):
+        self.params = list(params)
+        self.rows = []  # type: List[dict]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        best = self.best
+        return f"<SweepResult candidates: {len(self)}, best: {best['run'] if best else None}>"
+
+    def add(self, row: dict) -> None:
+        self.rows.append(row)
+
+    def completed(self) -> List[dict]:
+        return [r for r in self.rows if r["status"] == JobState.Done and not np.isnan(r.get("WNS(ns)", np.nan))]
+
+    def sort(self, by: str = "WNS(ns)", descending: bool = True) -> List[dict]:
+        """ 缺失值排在最后 """
+        def missing(row):
+            value = row.get(by)
+            return value is None or (isinstance(value, float) and np.isnan(value))
+
+        present = sorted((r for r in self.rows if not missing(r)), key=lambda r: r[by], reverse=descending)
+        return present + [r for r in self.rows if missing(r)]
+
+    @property
+    def best(self) -> Optional[dict]:
+        """ WNS 最大的候选，WNS 相同时比较 TNS """
+        rows = self.completed()
+        if not rows:
+            return None
+        return max(rows, key=lambda r: (r["WNS(ns)"], r.get("TNS(ns)", 0.0)))
+
+    def best_wns(self) -> float:
+        best = self.best
+        return best["WNS(ns)"] if best else np.nan
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        names = []
+        for row in self.rows:
+            names += [k for k in row if k not in names]
+        result = {}
+        for name in names:
+            values = [row.get(name, np.nan) for row in self.rows]
+            if all(isinstance(v, (int, float)) for v in values):
+                result[name] = np.array(values, dtype=np.float64)
+            else:
+                result[name] = np.array(["" if v is None else str(v) for v in values], dtype=str)
+        return result
+
+
+class StrategySweep:
+    """
+    :param prj: 打开工程的 VivadoPrj
+    :param parent: 候选 impl run 的 parent synth run
+    :param space: {run 属性: 候选值}
+    :param search: grid / random / adaptive
+    :param n: random / adaptive 的候选数
+    :param template: 模板 impl run，为空时取 parent 下的第一个 impl run
+    :param cores_per_run: 每个候选占用的 cores
+    :param hosts: 其它 RunHost，各 host 上都会创建同名候选 run；为空时只使用 prj，cores 预算为 prj 的 max_core
+    :param early_stop_margin: WNS 比已完成的最好结果差多少 ns 时提前停止，0 为不提前停止
+    :param min_completed: 至少完成多少个候选之后才开始提前停止
+    :param prefix: 候选 run 名前缀
+    """
+
+    def __init__(self, prj, parent: str, space: Dict[str, Sequence[str]], search: str = "grid", n: int = 0,
+                 template: str = "", cores_per_run: int = 2, hosts: Sequence[RunHost] = (),
+                 early_stop_margin: float = 0.5, min_completed: int = 2, prefix: str = "sweep_",
+                 poll_interval: float = 10, seed: int = 0, path_map: tuple = ()):
+        if search not in ("grid", "random", "adaptive"):
+            raise ViArgsError(f"unknown search {search}, must be grid / random / adaptive")
+        if search != "grid" and n <= 0:
+            raise ViArgsError(f"search {search} needs n > 0")
+
+        self.prj = prj
+        self.parent = parent
+        self.space = {k: list(v) for k, v in space.items()}
+        self.search = search
+        self.n = n
+        self.template = template
+        self.cores_per_run = cores_per_run
+        self.early_stop_margin = early_stop_margin
+        self.min_completed = min_completed
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+        self.path_map = path_map
+        self._rng = random.Random(seed)
+
+        hosts = list(hosts) if hosts else [RunHost(prj, prj.max_core, name="local")]
+        self.scheduler = RunScheduler(hosts, poll_interval=poll_interval, auto_parent=False)
+        self.slots = max(1, sum(h.cores for h in hosts) // cores_per_run)
+        self.result = SweepResult(list(self.space))
+        self._candidates = {}  # type: Dict[str, Dict[str, str]]
+        self._watcher = None  # type: RunWatcher or None
+        self._report_dir = tempfile.mkdtemp(prefix="vipytcl_sweep_")
+
+    def __repr__(self):
+        return f"<StrategySweep {self.search} parent: {self.parent}, params: {list(self.space)}>"
+
+    def _template_info(self) -> tuple:
+        template = self.template
+        if not template:
+            result = self.prj.tcl(f"lindex [get_runs -quiet -filter {{PARENT == {self.parent} && "
+                                  f"IS_IMPLEMENTATION}}] 0")
+            template = result[0].strip() if result else ""
+            if not template:
+                raise ViArgsError(f"no implementation run under {self.parent}, set template")
+        flow = self.prj.tcl(f"get_property FLOW [get_runs {{{template}}}]")[0]
+        constrs = self.prj.tcl(f"get_property CONSTRSET [get_runs {{{template}}}]")[0]
+        return flow, constrs
+
+    def _create(self, name: str, params: Dict[str, str], flow: str, constrs: str) -> None:
+        props = " ".join(f"{{{k}}} {{{v}}}" for k, v in params.items())
+        for host in self.scheduler.hosts.values():
+            host.prj.tcl(f"delete_runs -quiet [get_runs -quiet {{{name}}}]")
+            host.prj.create_run(name, flow, constrs, parent_run=self.parent)
+            if props:
+                host.prj.tcl(f"set_property -dict [list {props}] [get_runs {{{name}}}]")
+
+    def _generator(self) -> Iterator[Dict[str, str]]:
+        if self.search == "grid":
+            yield from grid_candidates(self.space)
+            return
+        if self.search == "random":
+            yield from random_candidates(self.space, self.n, self._rng)
+            return
+
+        # adaptive: 第一批随机，之后围绕当前最好的候选变异
+        seen = set()
+        for candidate in random_candidates(self.space, min(self.n, self.slots), self._rng):
+            seen.add(tuple(candidate.items()))
+            yield candidate
+        total = int(np.prod([len(v) for v in self.space.values()]))
+        misses = 0
+        while len(seen) < min(self.n, total) and misses < 100:
+            best = self.result.best
+            base = self._candidates[best["run"]] if best else self._rng.choice(list(self._candidates.values()))
+            candidate = mutate_candidate(base, self.space, self._rng)
+            key = tuple(candidate.items())
+            if key in seen:
+                misses += 1
+                continue
+            misses = 0
+            seen.add(key)
+            yield candidate
+
+    def _harvest(self, job: RunJob) -> None:
+        row = {"run": job.run, "status": job.state, "elapsed": job.elapsed}
+        row.update(self._candidates[job.run])
+        if job.state == JobState.Done:
+            host = self.scheduler.hosts[job.host]
+            files = host.prj.fetch_run_outputs(job.run, os.path.join(self._report_dir, job.run), SweepReportPatterns)
+            for path in files:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    if "timing_summary" in os.path.basename(path):
+                        row.update(parse_design_timing_summary(f))
+                    else:
+                        site_types = parse_utilization_report(f).site_types()
+                        for name, keys in _UtilizationKeys.items():
+                            used = next((site_types[k]["Used"] for k in keys if k in site_types), np.nan)
+                            row[name] = used
+        elif self._watcher is not None and job.run in self._watcher.states:
+            # 提前停止的候选记录最后一次的中间 WNS
+            row["WNS(ns)"] = self._watcher.states[job.run].timing.get("WNS", np.nan)
+        self.result.add(row)
+        logger.info(f"sweep {job.run} {job.state} WNS: {row.get('WNS(ns)')}")
+
+    def _early_stop(self) -> None:
+        if not self.early_stop_margin or self._watcher is None or len(self.result.completed()) < self.min_completed:
+            return
+        self._watcher.poll()
+        best = self.result.best_wns()
+        for run, state in self._watcher.states.items():
+            job = self.scheduler.jobs.get(run)
+            wns = state.timing.get("WNS", np.nan)
+            if job is None or job.state != JobState.Running or np.isnan(wns):
+                continue
+            if wns < best - self.early_stop_margin:
+                self.scheduler.cancel(run, f"intermediate WNS {wns} < best {best} - {self.early_stop_margin}")
+
+    def run(self) -> SweepResult:
+        flow, constrs = self._template_info()
+        if self.early_stop_margin and (not self.prj.is_remote or self.path_map):
+            self._watcher = RunWatcher({}, self.poll_interval)
+        elif self.early_stop_margin:
+            logger.warning("sweep on remote project without path_map, early stop disabled")
+
+        generator = self._generator()
+        exhausted = False
+        harvested = set()
+        index = 0
+        while True:
+            active = [j for j in self.scheduler.jobs.values() if j.state in (JobState.Pending, JobState.Running)]
+            while not exhausted and len(active) < self.slots:
+                try:
+                    params = next(generator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                name = f"{self.prefix}{index}"
+                index += 1
+                self._create(name, params, flow, constrs)
+                self._candidates[name] = params
+                active.append(self.scheduler.add(name, cores=self.cores_per_run))
+                if self._watcher is not None:
+                    run_dir = self.prj.get_run_dirs([name])[name]
+                    if self.path_map:
+                        run_dir = run_dir.replace(self.path_map[0], self.path_map[1], 1)
+                    self._watcher.add_run(name, run_dir)
+
+            self.scheduler.step()
+            self._early_stop()
+            for job in self.scheduler.jobs.values():
+                if job.run not in harvested and job.state not in (JobState.Pending, JobState.Running):
+                    harvested.add(job.run)
+                    self._harvest(job)
+
+            if exhausted and len(harvested) == len(self.scheduler.jobs):
+                break
+            time.sleep(self.poll_interval)
+        return self.result
@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+import subprocess
+import uuid
+from typing import List, Optional
+
+from .tcl_process import DontDoPutsCmd
+from ..base.vivado_error import ViDeferredResult, ViError, ViTclCantRunError, get_err_from_str
+
+logger = logging.getLogger("ViPyTcl")
+
+r"""
+录制模式: VivadoPrj 的方法调用不立即运行，tcl 命令按顺序编译为一个脚本，一次运行后把结果分配回每个调用
+    @@vipytcl <batch id> begin <i>
+    ...                                 第 i 个命令的输出
+    @@vipytcl <batch id> error <i> msg  第 i 个命令出错
+    @@vipytcl <batch id> end <i>
+全部命令放在一个 proc 中通过 uplevel #0 运行，source 时 vivado 不会逐行回显，变量仍然在全局作用域
+"""
+
+_MarkerRe = re.compile(r"^@@vipytcl (?P<id>\w+) (?P<kind>begin|end|error) (?P<index>\d+) ?(?P<message>.*)$")
+
+
+def tcl_batch_options(cmd, error_check: bool = True) -> dict:
+    """ tcl_batch 中单条命令的选项，cmd 为字符串时使用默认值 """
+    options = {"cmd": cmd, "raw": False, "timeout": None, "error_check": error_check}
+    if isinstance(cmd, dict):
+        unknown = set(cmd) - set(options)
+        if unknown:
+            raise ValueError(f"unknown tcl batch options: {unknown}")
+        options.update(cmd)
+    options["cmd"] = options["cmd"].strip(" ").strip("\n")
+    if not options["cmd"]:
+        raise ValueError("tcl can't be empty")
+    return options
+
+
+class TclFuture(list):
+    """
+    录制模式下 tcl 调用的返回值，batch 运行后填入输出行，之后和普通 list 一样使用
+    运行前读取内容会抛出 ViDeferredResult，需要立即使用返回值的方法（get_* 等查询）不能录制
+    """
+
+    def __init__(self, index: int, cmd: str):
+        super().__init__()
+        self.index = index
+        self.cmd = cmd
+        self._done = False
+        self._error = None  # type: Exception or None
+
+    def __repr__(self):
+        if not self._done:
+            return f"<TclFuture {self.index} pending {self.cmd!r}>"
+        return f"<TclFuture {self.index} {'error' if self._error else list.__repr__(self)}>"
+
+    def _check(self) -> None:
+        if not self._done:
+            raise ViDeferredResult(f"result of deferred tcl used before batch run: {self.cmd}")
+        if self._error is not None:
+            raise self._error
+
+    def __getitem__(self, item):
+        self._check()
+        return super().__getitem__(item)
+
+    def __iter__(self):
+        self._check()
+        return super().__iter__()
+
+    def __len__(self):
+        self._check()
+        return super().__len__()
+
+    def __contains__(self, item):
+        self._check()
+        return super().__contains__(item)
+
+    def done(self) -> bool:
+        return self._done
+
+    def exception(self) -> Optional[Exception]:
+        return self._error
+
+    def result(self) -> List[str]:
+        self._check()
+        return list(super().__iter__())
+
+    def set_result(self, lines: List[str]) -> None:
+        self.extend(lines)
+        self._done = True
+
+    def set_exception(self, err: Exception) -> None:
+        self._error = err
+        self._done = True
+
+
+class TclBatch:
+    """
+    :param stop_on_error: 出错后不再运行后面的命令，它们的 future 为 ViTclCantRunError
+    """
+
+    def __init__(self, stop_on_error: bool = True):
+        self.id = uuid.uuid4().hex[:8]
+        self.stop_on_error = stop_on_error
+        self.futures = []  # type: List[TclFuture]
+
+    def __repr__(self):
+        return f"<TclBatch {self.id} calls: {len(self.futures)}>"
+
+    def __len__(self):
+        return len(self.futures)
+
+    def add(self, cmd: str) -> TclFuture:
+        cmd = cmd.strip(" ").strip("\n")
+        if not cmd:
+            raise ValueError("tcl can't be empty")
+        future = TclFuture(len(self.futures), cmd)
+        self.futures.append(future)
+        return future
+
+    def script(self) -> str:
+        """ 编译为一个 tcl 脚本 """
+        proc = f"::vipytcl::batch_{self.id}"
+        lines = ["namespace eval ::vipytcl {}", f"proc {proc} {{}} {{"]
+        for future in self.futures:
+            marker = f"@@vipytcl {self.id}"
+            # 和 tcl() 一样: 自己输出的命令不再 puts 返回值
+            echo = future.cmd.split()[0] not in DontDoPutsCmd
+            lines.append(f'    puts "{marker} begin {future.index}"')
+            lines.append(f"    if {{[catch {{uplevel #0 {{\n{future.cmd}\n}}}} result] == 1}} {{")
+            lines.append(f'        puts "{marker} error {future.index} [string map {{"\\n" " "}} $result]"')
+            if self.stop_on_error:
+                lines.append(f'        puts "{marker} end {future.index}"')
+                lines.append("        return")
+            lines.append("    }" + (" else {\n        puts $result\n    }" if echo else ""))
+            lines.append(f'    puts "{marker} end {future.index}"')
+        lines += ["}", proc, ""]
+        return "\n".join(lines)
+
+    def resolve(self, output: List[str]) -> List[TclFuture]:
+        """ 按标记把输出分配给每个 future """
+        current, lines, errors = None, [], []  # type: Optional[int], List[str], List[str]
+        for line in output:
+            match = _MarkerRe.match(line.rstrip("\r\n"))
+            if not match or match.group("id") != self.id:
+                # 和 tcl() 一样不保留空行
+                if current is not None and line.strip():
+                    lines.append(line.rstrip("\r\n"))
+                continue
+
+            kind, index = match.group("kind"), int(match.group("index"))
+            if kind == "begin":
+                current, lines, errors = index, [], []
+            elif kind == "error":
+                errors.append(match.group("message"))
+            elif current is not None:
+                future = self.futures[current]
+                vivado_errors = [line for line in lines if line.startswith("ERROR")]
+                if vivado_errors:
+                    future.set_exception(get_err_from_str(vivado_errors[0]))
+                elif errors:
+                    future.set_exception(ViError(errors[0]))
+                else:
+                    future.set_result(lines)
+                current = None
+
+        for future in self.futures:
+            if not future.done():
+                future.set_exception(ViTclCantRunError(f"tcl not run in batch {self.id}: {future.cmd}"))
+        return self.futures
+
+    def run_batch_mode(self, vivado_bat_path: str, script_path: str, encode: str = "GBK",
+                       timeout: float = None) -> List[TclFuture]:
+        """
+        写出脚本并以 vivado -mode batch -source 运行，不需要常驻的解释器
+        :param script_path: 本机脚本路径
+        """
+        with open(script_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(self.script())
+        cmd = [vivado_bat_path, "-mode", "batch", "-notrace", "-nojournal", "-source", script_path,
+               "-log", os.path.splitext(script_path)[0] + ".log"]
+        logger.info(f"run tcl batch {self.id}, calls: {len(self.futures)}")
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout,
+                              cwd=os.path.dirname(os.path.abspath(script_path)))
+        return self.resolve(proc.stdout.decode(encode, errors="replace").splitlines())
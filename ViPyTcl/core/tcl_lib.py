@@ -0,0 +1,20 @@
+r"""
+vivado 端通用的 tcl proc，各个导出脚本拼接使用
+    write_objs: 对一组对象批量 get_property，每个对象按 tab 分隔写一行
+"""
+
+WriteObjsTcl = r"""
+namespace eval ::vipytcl {}
+
+proc ::vipytcl::write_objs {fh tag objs extra props} {
+    set cols [list]
+    foreach p $props { lappend cols [get_property -quiet $p $objs] }
+    set n [llength $objs]
+    for {set i 0} {$i < $n} {incr i} {
+        set line [list $tag [lindex $objs $i]]
+        foreach col $extra { lappend line [lindex $col $i] }
+        foreach col $cols { lappend line [lindex $col $i] }
+        puts $fh [join $line "\t"]
+    }
+}
+"""
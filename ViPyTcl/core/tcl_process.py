@@ -1,16 +1,23 @@
+import asyncio
+import functools
 import logging
+import queue
 import shutil
 import subprocess
 import threading
+import time
 from pathlib import Path
-from typing import Union
+from typing import AsyncIterator, Iterator, List, Union
 from datetime import datetime, timedelta
 import traceback
 
 from .global_var import *
-from ..base.vivado_error import get_err_from_str
+from ..base.vivado_error import ViTclCantRunError, get_err_from_str
 
 DontDoPutsCmd = {"puts", "for", "foreach", "while", "source"}
+# tcl_stream 未被取走的行数上限
+StreamMaxLines = 65536
+_StreamEnd = object()
 
 logger = logging.getLogger("ViPyTcl")
 
@@ -76,7 +83,8 @@ class BaseTclProcess:
         self._cur_err = None  # tcl端err
         self._error_check = True  # 是否对tcl端output做err检查
         self._cur_cmd_done = threading.Event()
-        self._lock = threading.Lock()
+        self._lock = threading.RLock()  # tcl_batch 运行期间可以重入
+        self._on_line = None  # 流式输出时每行的回调，为 None 时收集到 _cur_out
 
         self._recv_th_obj = None
         self._err_th_obj = None
@@ -106,16 +114,34 @@ class BaseTclProcess:
             s = s.replace(esc, f"\\{esc}")
         return s
 
-    def grpc_put_file(self, src_path, dst_path: str = "", timeout: int = 0) -> Union[str, Path]:
+    def grpc_put_file(self, src_path, dst_path: str = "", timeout: int = 0, progress=None) -> Union[str, Path]:
         raise NotImplementedError
 
-    def grpc_get_file(self, src_path, dst_path: str = "", timeout: int = 0) -> Union[str, Path]:
+    def grpc_get_file(self, src_path, dst_path: str = "", timeout: int = 0, progress=None) -> Union[str, Path]:
+        raise NotImplementedError
+
+    def grpc_put_files(self, files, timeout: int = 0, progress=None) -> List[str]:
+        raise NotImplementedError
+
+    def grpc_put_dir(self, src_dir, dst_dir: str = "", timeout: int = 0, progress=None) -> List[str]:
+        raise NotImplementedError
+
+    def sync_dir(self, src: str, dst: str = "", direction: str = "put", delete: bool = False,
+                 exclude=(), workers: int = 8, progress=None):
         raise NotImplementedError
 
     def _send_cmd(self, tcl: str, raw: bool = False, timeout: int = None, block: bool = True):
         raise NotImplementedError
 
-    def tcl(self, tcl, raw: bool = False, timeout: int = None, block: bool = True) -> list:
+    def _emit_line(self, line: str) -> None:
+        """ _recv_th 收到当前命令的一行输出 """
+        if self._on_line is None:
+            self._cur_out.append(line)
+        else:
+            self._on_line(line)
+
+    def tcl(self, tcl, raw: bool = False, timeout: int = None, block: bool = True, error_check: bool = None,
+            on_line=None) -> list:
         """
         阻塞方式运行tcl语句，完成后返回输出的信息列表
         :param tcl:
@@ -125,31 +151,175 @@ class BaseTclProcess:
             False: 添加 puts 优化输出
         :param timeout: 单命令运行timeout，sec
         :param block: 是否阻塞等待命令执行完毕
+        :param error_check: 是否对本次输出做 err 检查，None 时使用初始化时的设置
+        :param on_line: on_line(line)，每收到一行输出时调用，此时输出不再收集，返回空列表
         :return:
         """
         if self._is_terminate:
             raise ValueError("Tcl process has terminate")
 
-        self._lock.acquire()
-
         tcl = tcl.strip(" ").strip("\n")
         if not tcl:
             raise ValueError("tcl can't be empty")
 
-        output = self._send_cmd(tcl, raw=raw, timeout=timeout, block=block)
+        error_check = self._error_check if error_check is None else error_check
+        with self._lock:
+            self._cur_err = None
+            if on_line is not None:
+                def listener(line: str):
+                    if error_check and line.startswith("ERROR"):
+                        self._cur_err = get_err_from_str(line)
+                    on_line(line)
 
-        if self._error_check:
-            for out in output:
-                if out.startswith("ERROR"):
-                    self._cur_err = get_err_from_str(out)
+                self._on_line = listener
+            try:
+                output = self._send_cmd(tcl, raw=raw, timeout=timeout, block=block)
+            finally:
+                self._on_line = None
 
-        if self._cur_err:
-            raise self._cur_err
+            if error_check:
+                for out in output:
+                    if out.startswith("ERROR"):
+                        self._cur_err = get_err_from_str(out)
 
-        self._lock.release()
+            err, self._cur_err = self._cur_err, None
 
+        if err:
+            raise err
         return output
 
+    def tcl_batch(self, cmds, stop_on_error: bool = True, error_check: bool = None) -> list:
+        """
+        依次运行多条命令，每条命令的结果或错误放在对应的 TclFuture 中
+        :param cmds: tcl 语句，或 {"cmd", "raw", "timeout", "error_check"} 指定单条命令的选项
+        :param stop_on_error: 出错后不再运行后面的命令，它们的 future 为 ViTclCantRunError
+        :return: List[TclFuture]
+        """
+        from .tcl_batch import TclFuture, tcl_batch_options
+
+        error_check = self._error_check if error_check is None else error_check
+        futures = []
+        failed = False
+        with self._lock:
+            for i, cmd in enumerate(cmds):
+                options = tcl_batch_options(cmd, error_check)
+                future = TclFuture(i, options["cmd"])
+                futures.append(future)
+                if failed:
+                    future.set_exception(ViTclCantRunError(f"tcl not run in batch: {options['cmd']}"))
+                    continue
+                try:
+                    future.set_result(self.tcl(options["cmd"], raw=options["raw"], timeout=options["timeout"],
+                                               error_check=options["error_check"]))
+                except Exception as err:
+                    future.set_exception(err)
+                    failed = stop_on_error
+        return futures
+
+    def tcl_stream(self, tcl, raw: bool = False, timeout: int = None, error_check: bool = None,
+                   batch_lines: int = 256, batch_interval: float = 0.5,
+                   max_lines: int = StreamMaxLines) -> Iterator[List[str]]:
+        """
+        运行tcl语句，边运行边按批返回输出，适合 launch_runs / wait_on_run 等长时间的命令
+        命令出错时在输出全部返回后抛出
+        :param batch_lines: 每批最多的行数
+        :param batch_interval: 有输出时最长多久返回一批, sec
+        :param max_lines: 未被取走的行数上限，达到后读取线程等待，vivado 的 stdout 随之阻塞
+        """
+        lines = queue.Queue(max_lines)  # type: queue.Queue
+        closed = threading.Event()
+        state = {}
+
+        def on_line(line: str):
+            if not closed.is_set():
+                lines.put(line)
+
+        def run():
+            try:
+                self.tcl(tcl, raw=raw, timeout=timeout, error_check=error_check, on_line=on_line)
+            except Exception as err:
+                state["err"] = err
+            finally:
+                lines.put(_StreamEnd)
+
+        th = threading.Thread(target=run, daemon=True, name="vipytcl_tcl_stream")
+        th.start()
+
+        batch = []
+        deadline = time.time() + batch_interval
+        try:
+            while True:
+                try:
+                    line = lines.get(timeout=max(deadline - time.time(), 0.01))
+                except queue.Empty:
+                    line = None
+                if line is _StreamEnd:
+                    break
+                if line is not None:
+                    batch.append(line)
+                now = time.time()
+                if batch and (len(batch) >= batch_lines or now >= deadline):
+                    yield batch
+                    batch = []
+                if now >= deadline:
+                    deadline = now + batch_interval
+            if batch:
+                yield batch
+        finally:
+            # 提前关闭时丢弃剩下的输出，让命令在后台运行完，不等待
+            closed.set()
+            while True:
+                try:
+                    lines.get_nowait()
+                except queue.Empty:
+                    break
+
+        th.join()
+        if "err" in state:
+            raise state["err"]
+
+    async def tcl_async(self, tcl, raw: bool = False, timeout: int = None, error_check: bool = None,
+                        executor=None) -> list:
+        """ tcl 的 asyncio 版本，命令在 executor 中运行，等待输出期间不占用事件循环 """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(self.tcl, tcl, raw=raw, timeout=timeout,
+                                                                      error_check=error_check))
+
+    def tcl_stream_async(self, tcl, raw: bool = False, timeout: int = None, error_check: bool = None,
+                         batch_lines: int = 256, batch_interval: float = 0.5,
+                         executor=None) -> AsyncIterator[List[str]]:
+        """ tcl_stream 的 asyncio 版本: async for batch in proc.tcl_stream_async(...) """
+        return aiter_in_executor(self.tcl_stream(tcl, raw=raw, timeout=timeout, error_check=error_check,
+                                                 batch_lines=batch_lines, batch_interval=batch_interval), executor)
+
+
+async def aiter_in_executor(iterator: Iterator, executor=None) -> AsyncIterator:
+    """
+    在 executor 中逐个取同步迭代器的元素，只在取元素期间占用线程
+    提前退出时等正在进行的 next 完成后关闭迭代器
+    """
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()
+    end = object()
+
+    def step():
+        with lock:
+            return next(iterator, end)
+
+    def close():
+        with lock:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, step)
+            if item is end:
+                return
+            yield item
+    finally:
+        await loop.run_in_executor(executor, close)
+
 
 class TclProcessPopen(subprocess.Popen, BaseTclProcess):
     def __init__(self, vivado_bat_path: str = "", *args, output=False, save_log: str = "", clean=True, error_check=True,
@@ -168,7 +338,7 @@ class TclProcessPopen(subprocess.Popen, BaseTclProcess):
         subprocess.Popen.__init__(self, self._major_cmd, *args, shell=shell,
                                   stdin=stdin, stdout=stdout, stderr=stderr, **kwargs)
 
-        self._cache = os.getcwd()
+        self._cache = str(kwargs["cwd"]) if kwargs.get("cwd") else os.getcwd()
         self._output = output
         self._output_stdout = output_stdout
         self._clean = clean
@@ -186,7 +356,7 @@ class TclProcessPopen(subprocess.Popen, BaseTclProcess):
         self._cur_out = []
         self._cur_err = None
         self._cur_cmd_done = threading.Event()
-        self._lock = threading.Lock()
+        self._lock = threading.RLock()  # tcl_batch 运行期间可以重入
         if not delay:
             self.open()
 
@@ -277,7 +447,7 @@ class TclProcessPopen(subprocess.Popen, BaseTclProcess):
                         self._cur_cmd_done.set()
 
                 elif self._is_cur_out and s:
-                    self._cur_out.append(s)
+                    self._emit_line(s)
 
             except Exception as e:
                 print(e)
@@ -0,0 +1,289 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from ..utils.columnar import StringTable, encode_column, save_npz
+
+r"""
+report_timing / report_timing_summary 文本输出的流式解析
+    iter_timing_paths: 逐行读入，每解析完一条 path 就 yield 一个 TimingPath，内存中只保留当前 path
+    TimingPathTable: 列式汇总，数值列为 numpy 数组，字符串列为 StringTable 或字典编码
+    parse_design_timing_summary: report_timing_summary 开头的 Design Timing Summary
+"""
+
+_SlackRe = re.compile(r"^\s*Slack(?:\s+\((?P<status>\w+)\))?\s*:\s*(?P<slack>-?[\d.]+|inf)")
+_FieldRe = re.compile(r"^\s{2}(?P<key>[A-Z][\w ()/]*?):\s+(?P<value>.*?)\s*$")
+_ClockedByRe = re.compile(r"clocked by (?P<clock>\S+)")
+_NsRe = re.compile(r"^(?P<value>-?[\d.]+)ns")
+_DataPathDelayRe = re.compile(r"logic (?P<logic>-?[\d.]+)ns.*route (?P<route>-?[\d.]+)ns")
+_LogicLevelsRe = re.compile(r"^(?P<levels>\d+)\s*(?:\((?P<detail>.*)\))?")
+_StageRe = re.compile(r"^\s{2,}(?:(?P<location>\S+)\s{2,})?(?:(?P<delay_type>\S.*?)\s+)?(?P<incr>-?\d+\.\d+)\s+"
+                      r"(?P<path>-?\d+\.\d+)(?:\s+(?P<edge>[rf])(?=\s|$))?(?:\s+(?P<resource>\S.*?))?\s*$")
+_SummaryRe = re.compile(r"^\s+(?P<key>required time|arrival time|slack)\s+(?P<value>-?\d+\.\d+)\s*$")
+
+StageSections = ("source_clock", "data", "destination_clock")
+
+
+class TimingStage:
+    __slots__ = ("section", "location", "delay_type", "incr", "path", "edge", "resource")
+
+    def __init__(self, section: str, location: str, delay_type: str, incr: float, path: float, edge: str,
+                 resource: str):
+        self.section = section
+        self.location = location
+        self.delay_type = delay_type
+        self.incr = incr
+        self.path = path
+        self.edge = edge
+        self.resource = resource
+
+    def __repr__(self):
+        return f"<TimingStage {self.section} {self.delay_type} {self.incr:.3f} {self.resource}>"
+
+    @property
+    def is_net(self) -> bool:
+        return self.delay_type.startswith("net")
+
+
+class TimingPath:
+    """ 一条 timing path，未出现在报告里的字段为 None """
+
+    def __init__(self):
+        self.status = None  # type: str or None    # MET / VIOLATED, 未约束时为 None
+        self.slack = None  # type: float or None   # inf 时为 None
+        self.source = None  # type: str or None
+        self.destination = None  # type: str or None
+        self.source_clock = None  # type: str or None
+        self.destination_clock = None  # type: str or None
+        self.path_group = None  # type: str or None
+        self.path_type = None  # type: str or None
+        self.requirement = None  # type: float or None
+        self.data_path_delay = None  # type: float or None
+        self.logic_delay = None  # type: float or None
+        self.route_delay = None  # type: float or None
+        self.logic_levels = None  # type: int or None
+        self.logic_levels_detail = ""
+        self.clock_path_skew = None  # type: float or None
+        self.clock_uncertainty = None  # type: float or None
+        self.required_time = None  # type: float or None
+        self.arrival_time = None  # type: float or None
+        self.stages = []  # type: List[TimingStage]
+
+    def __repr__(self):
+        return f"<TimingPath slack: {self.slack}, {self.source} -> {self.destination}>"
+
+    def data_stages(self) -> List[TimingStage]:
+        return [s for s in self.stages if s.section == "data"]
+
+
+def _ns(value: str) -> Optional[float]:
+    match = _NsRe.match(value)
+    return float(match.group("value")) if match else None
+
+
+def _set_field(path: TimingPath, key: str, value: str) -> None:
+    if key == "Source":
+        path.source = value
+    elif key == "Destination":
+        path.destination = value
+    elif key == "Path Group":
+        path.path_group = value
+    elif key == "Path Type":
+        path.path_type = value
+    elif key == "Requirement":
+        path.requirement = _ns(value)
+    elif key == "Data Path Delay":
+        path.data_path_delay = _ns(value)
+        match = _DataPathDelayRe.search(value)
+        if match:
+            path.logic_delay, path.route_delay = float(match.group("logic")), float(match.group("route"))
+    elif key == "Logic Levels":
+        match = _LogicLevelsRe.match(value)
+        if match:
+            path.logic_levels = int(match.group("levels"))
+            path.logic_levels_detail = match.group("detail") or ""
+    elif key == "Clock Path Skew":
+        path.clock_path_skew = _ns(value)
+    elif key == "Clock Uncertainty":
+        path.clock_uncertainty = _ns(value)
+
+
+def iter_timing_paths(lines: Iterable[str], stages: bool = True) -> Iterator[TimingPath]:
+    """
+    流式解析 report_timing / report_timing_summary 的输出
+    :param lines: 可迭代的行，可以是打开的报告文件、tcl() 返回的 list 或其它生成器
+    :param stages: 是否解析逐级延时，只需要汇总信息时关闭可以更快
+    """
+    path = None  # type: TimingPath or None
+    last_key = ""
+    section = -1
+    in_table = False
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        match = _SlackRe.match(line)
+        if match:
+            if path is not None:
+                yield path
+            path = TimingPath()
+            path.status = match.group("status")
+            path.slack = None if match.group("slack") == "inf" else float(match.group("slack"))
+            last_key, section, in_table = "", -1, False
+            continue
+
+        if path is None:
+            continue
+
+        if not in_table:
+            match = _FieldRe.match(line)
+            if match:
+                last_key = match.group("key")
+                _set_field(path, last_key, match.group("value"))
+                continue
+
+            # Source / Destination 下一行的括号里是时钟
+            stripped = line.strip()
+            if stripped.startswith("(") and last_key in ("Source", "Destination"):
+                clock = _ClockedByRe.search(stripped)
+                if clock and last_key == "Source":
+                    path.source_clock = clock.group("clock")
+                elif clock:
+                    path.destination_clock = clock.group("clock")
+                continue
+
+            if stripped.startswith("Location") and "Delay type" in stripped:
+                in_table, section = True, -1
+            continue
+
+        if line.lstrip().startswith("---"):
+            section += 1
+            continue
+
+        match = _SummaryRe.match(line)
+        if match:
+            key, value = match.group("key"), float(match.group("value"))
+            if key == "required time":
+                path.required_time = value
+            elif key == "arrival time":
+                path.arrival_time = abs(value)
+            continue
+
+        if stages and 0 <= section < len(StageSections):
+            match = _StageRe.match(line)
+            if match:
+                path.stages.append(TimingStage(StageSections[section], match.group("location") or "",
+                                               match.group("delay_type") or "", float(match.group("incr")),
+                                               float(match.group("path")), match.group("edge") or "",
+                                               match.group("resource") or ""))
+
+    if path is not None:
+        yield path
+
+
+TimingFloatColumns = ("slack", "requirement", "data_path_delay", "logic_delay", "route_delay", "clock_path_skew",
+                      "clock_uncertainty", "required_time", "arrival_time")
+TimingCodedColumns = ("status", "source_clock", "destination_clock", "path_group", "path_type")
+TimingStringColumns = ("source", "destination")
+
+
+class TimingPathTable:
+    """
+    timing path 的列式汇总
+        数值列为 float64（缺失为 nan，slack 为 inf 时也为 nan），logic_levels 为 int32（缺失为 -1）
+        status / 时钟 / path group / path type 为字典编码，source / destination 为 StringTable
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    def __len__(self):
+        return len(self.arrays["slack"])
+
+    def __repr__(self):
+        return f"<TimingPathTable paths: {len(self)}>"
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[TimingPath]) -> 'TimingPathTable':
+        floats = {k: [] for k in TimingFloatColumns}
+        coded = {k: [] for k in TimingCodedColumns}
+        strings = {k: [] for k in TimingStringColumns}
+        levels = []
+        for path in paths:
+            for k in TimingFloatColumns:
+                v = getattr(path, k)
+                floats[k].append(np.nan if v is None else v)
+            for k in TimingCodedColumns:
+                coded[k].append(getattr(path, k) or "")
+            for k in TimingStringColumns:
+                strings[k].append(getattr(path, k) or "")
+            levels.append(-1 if path.logic_levels is None else path.logic_levels)
+
+        arrays = {k: np.array(v, dtype=np.float64) for k, v in floats.items()}
+        arrays["logic_levels"] = np.array(levels, dtype=np.int32)
+        for k, v in coded.items():
+            table, codes = encode_column(v)
+            arrays.update(table.to_arrays(k))
+            arrays[f"{k}_codes"] = codes
+        for k, v in strings.items():
+            arrays.update(StringTable.from_strings(v).to_arrays(k))
+        return cls(arrays)
+
+    def column(self, name: str):
+        """ 数值列返回 numpy 数组，字符串列返回 list """
+        if name in self.arrays:
+            return self.arrays[name]
+        if name in TimingCodedColumns:
+            table = StringTable.from_arrays(self.arrays, name)
+            return [table[int(c)] for c in self.arrays[f"{name}_codes"]]
+        if name in TimingStringColumns:
+            return StringTable.from_arrays(self.arrays, name).tolist()
+        raise KeyError(name)
+
+    def worst(self, n: int = 10) -> np.ndarray:
+        """ slack 最差的 n 条 path 的下标 """
+        return np.argsort(np.nan_to_num(self.arrays["slack"], nan=np.inf), kind="stable")[:n]
+
+    def save(self, path: str) -> str:
+        return save_npz(path, self.arrays)
+
+
+def timing_path_table(lines: Iterable[str]) -> TimingPathTable:
+    """ 只做汇总解析，不保留逐级延时 """
+    return TimingPathTable.from_paths(iter_timing_paths(lines, stages=False))
+
+
+def _number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def parse_design_timing_summary(lines: Iterable[str]) -> Dict[str, float]:
+    """
+    解析 report_timing_summary 的 Design Timing Summary 表
+    :return: {"WNS(ns)": 0.123, "TNS(ns)": 0.0, "TNS Failing Endpoints": 0, ...}
+    """
+    header = None
+    found = False
+    for line in lines:
+        if not found:
+            found = "Design Timing Summary" in line
+            continue
+        stripped = line.strip()
+        if header is None:
+            if stripped.startswith("WNS(ns)"):
+                header = re.split(r"\s{2,}", stripped)
+            continue
+        if not stripped or stripped.startswith("---"):
+            continue
+        values = stripped.split()
+        if len(values) != len(header):
+            break
+        return {k: _number(v) for k, v in zip(header, values)}
+    return {}
@@ -0,0 +1,171 @@
+import re
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+r"""
+report_utilization 以及 report_utilization -hierarchical 的 ascii 表格解析
+    每个 "+----+" 边框围起来的表格解析为一个 UtilizationTable，按所在章节标题归类
+    列的类型按内容推断: 全是整数为 int64，数值为 float64（"<0.01" 记为 0.01，空值为 nan），否则为字符串
+    -hierarchical 的 Instance 列按缩进额外生成 Level 列
+"""
+
+_SectionRe = re.compile(r"^(?P<number>\d+(?:\.\d+)*)\.?\s+(?P<title>\S.*?)\s*$")
+
+
+def _parse_number(value: str):
+    value = value.strip().lstrip("<")
+    return float(value) if value else np.nan
+
+
+def _typed_column(values: List[str]) -> np.ndarray:
+    stripped = [v.strip() for v in values]
+    non_empty = [v for v in stripped if v]
+    if non_empty and all(re.fullmatch(r"-?\d+", v) for v in non_empty) and len(non_empty) == len(stripped):
+        return np.array([int(v) for v in stripped], dtype=np.int64)
+    try:
+        if non_empty:
+            return np.array([_parse_number(v) for v in stripped], dtype=np.float64)
+    except ValueError:
+        pass
+    return np.array(stripped, dtype=str)
+
+
+class UtilizationTable:
+    """
+    一张表格
+        columns: {列名: numpy 数组}，按表头顺序
+    """
+
+    def __init__(self, section: str, header: List[str], rows: List[List[str]], hierarchical: bool = False):
+        self.section = section
+        self.header = header
+        self.columns = {}  # type: Dict[str, np.ndarray]
+
+        # -hierarchical 的 Instance 列每级缩进两个空格
+        if hierarchical and header:
+            raw = [row[0] for row in rows]
+            self.columns["Level"] = np.array([(len(v) - len(v.lstrip(" "))) // 2 for v in raw], dtype=np.int32)
+
+        for i, name in enumerate(header):
+            values = [row[i] if i < len(row) else "" for row in rows]
+            key = name if name not in self.columns else f"{name}_{i}"
+            self.columns[key] = _typed_column(values)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __repr__(self):
+        return f"<UtilizationTable {self.section!r} columns: {list(self.columns)}, rows: {len(self)}>"
+
+    def __getitem__(self, item: str) -> np.ndarray:
+        return self.columns[item]
+
+    def to_records(self) -> np.recarray:
+        """ 转为 numpy record array，列名中的特殊字符替换为下划线 """
+        names = [re.sub(r"\W+", "_", name).strip("_") or f"col{i}" for i, name in enumerate(self.columns)]
+        return np.rec.fromarrays(list(self.columns.values()), names=names)
+
+    def to_dict(self, key: str, value: str) -> Dict[str, object]:
+        """ 以 key 列为键取 value 列，例如 primitives.to_dict("Ref Name", "Used") """
+        return {str(k): v.item() if hasattr(v, "item") else v for k, v in zip(self.columns[key], self.columns[value])}
+
+
+class UtilizationReport:
+    """ 按章节标题归类的全部表格 """
+
+    def __init__(self, tables: List[UtilizationTable]):
+        self.tables = tables
+        self.sections = {}  # type: Dict[str, List[UtilizationTable]]
+        for table in tables:
+            self.sections.setdefault(table.section, []).append(table)
+
+    def __repr__(self):
+        return f"<UtilizationReport sections: {list(self.sections)}>"
+
+    def table(self, section: str, index: int = 0) -> UtilizationTable:
+        """ section 可以是完整标题，也可以是标题中的一部分，例如 "Slice Logic"、"Primitives" """
+        if section in self.sections:
+            return self.sections[section][index]
+        for title, tables in self.sections.items():
+            if section.lower() in title.lower():
+                return tables[index]
+        raise KeyError(f"utilization section not found: {section}")
+
+    def site_types(self) -> Dict[str, Dict[str, object]]:
+        """ 所有以 Site Type 为首列的表合并为 {site type: {Used:..., Available:..., Util%:...}}，去掉脚注的 * """
+        result = {}
+        for table in self.tables:
+            if "Site Type" not in table.columns:
+                continue
+            others = [c for c in table.columns if c != "Site Type"]
+            for i, site_type in enumerate(table.columns["Site Type"]):
+                result[str(site_type).rstrip("*")] = {c: table.columns[c][i].item() for c in others}
+        return result
+
+    def primitives(self) -> Dict[str, int]:
+        return self.table("Primitives").to_dict("Ref Name", "Used")
+
+    def hierarchy(self) -> UtilizationTable:
+        return self.table("Utilization by Hierarchy")
+
+
+def _split_row(line: str) -> List[str]:
+    return line.rstrip().strip("|").split("|")
+
+
+def iter_utilization_tables(lines: Iterable[str]) -> Iterator[UtilizationTable]:
+    """
+    逐行解析，每遇到一张完整的表格就 yield
+    表格结构: 边框, 表头(可能多行), 边框, 数据行..., 边框
+    """
+    section = ""
+    prev = ""
+    border_count = 0
+    header_lines = []  # type: List[List[str]]
+    rows = []  # type: List[List[str]]
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+
+        if stripped.startswith("+") and set(stripped) <= set("+-="):
+            border_count += 1
+            if border_count == 3:
+                yield _make_table(section, header_lines, rows)
+                border_count, header_lines, rows = 0, [], []
+            continue
+
+        if border_count == 1 and stripped.startswith("|"):
+            header_lines.append(_split_row(stripped))
+        elif border_count == 2 and stripped.startswith("|"):
+            rows.append(_split_row(stripped))
+        elif border_count:
+            # 表格没有下边框就结束
+            if rows or header_lines:
+                yield _make_table(section, header_lines, rows)
+            border_count, header_lines, rows = 0, [], []
+
+        if stripped and set(stripped) == {"-"} and prev:
+            match = _SectionRe.match(prev.strip())
+            if match:
+                section = match.group("title")
+        prev = line
+
+    if border_count == 2:
+        yield _make_table(section, header_lines, rows)
+
+
+def _make_table(section: str, header_lines: List[List[str]], rows: List[List[str]]) -> UtilizationTable:
+    # 多行表头按列拼接
+    width = max((len(h) for h in header_lines), default=0)
+    header = [" ".join(h[i].strip() for h in header_lines if i < len(h) and h[i].strip()) for i in range(width)]
+    return UtilizationTable(section, header, rows, bool(header) and header[0] == "Instance")
+
+
+def parse_utilization_report(lines: Iterable[str]) -> UtilizationReport:
+    """
+    :param lines: 可迭代的行，一般直接传入打开的报告文件
+    """
+    return UtilizationReport(list(iter_utilization_tables(lines)))
+
@@ -1,9 +1,37 @@
+import contextlib
+import math
 import multiprocessing
 import os
+import posixpath
 import re
-
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from .build_cache import BuildCache, LocalStore, RunInputs, RunInputsTcl, DefaultBuildCacheBytes, \
+    DefaultCachePatterns, parse_run_inputs, build_cache_key, select_outputs
+from .dir_sync import SyncResult, sync_local_dir
+from .device_db import DeviceDB, ExportDeviceTcl, ViObjTclToDeviceKind, parse_device_dump
+from .ip_build import IPBuilder, IPBuildResult, IPInfo, IPInfoTcl, parse_ip_info
+from .incremental import IncrementalResult, IncrementalDirName, RoutedDcpPattern, ReuseReportPatterns, \
+    TimingSummaryPatterns, parse_reuse_report
+from .netlist_graph import NetlistGraph
+from .netlist_db import NetlistDB, ExportNetlistTcl, parse_netlist_dump, export_netlist_tcl_call, \
+    DefaultCellProperties, DefaultPinProperties, DefaultNetProperties, DefaultPortProperties
+from .project_snapshot import ProjectSnapshot, SnapshotTcl, parse_snapshot, snapshot_tcl_call
 from .remote_tcl import RemoteTclProcessPopen
+from .report_cache import ReportCache, DefaultReportCacheBytes, report_key
+from .run_watcher import RunWatcher
+from .source_watcher import SourceWatcher
+from .tcl_batch import TclBatch, TclFuture, tcl_batch_options
+from .strategy_sweep import StrategySweep, SweepResult
+from .timing_report import TimingPath, TimingPathTable, iter_timing_paths, parse_design_timing_summary
+from .utilization_report import UtilizationReport, parse_utilization_report
 from ..base import *
+from ..utils.tools import file_digest
 from .tcl_process import *
 
 
@@ -51,6 +79,7 @@ class VivadoPrj:
                  server_addr: str or tuple = "",
                  delay: bool = False,
                  delay_open: bool = True,
+                 session: bool = False,
                  max_core: int = multiprocessing.cpu_count(), **kwargs):
 
         self.prj_path = prj_path
@@ -63,6 +92,16 @@ class VivadoPrj:
         self._is_exit = False
         self._is_remote = False
         self._max_core = max_core
+        self._local_tmp = ""
+        self._sourced_scripts = set()
+        self.device_db = None  # type: DeviceDB or None
+        self.build_cache = None  # type: BuildCache or None
+        self._digest_memo = {}  # type: Dict[Tuple[str, str, str], str]
+        self.report_cache = None  # type: ReportCache or None
+        self._snapshot = None  # type: ProjectSnapshot or None
+        self._snapshot_serial = -1
+        self._tcl_serial = 0  # 每次 tcl 调用加一，用于判断 snapshot 是否可以复用
+        self._record_local = threading.local()  # 录制状态，只属于进入 record() 的线程
         self.server_addr = ()
 
         if server_addr:
@@ -72,7 +111,7 @@ class VivadoPrj:
                 self.server_addr = addr_parser(server_addr)
 
         if self.server_addr:
-            self._tcl_proc = RemoteTclProcessPopen(*self.server_addr, delay=delay)
+            self._tcl_proc = RemoteTclProcessPopen(*self.server_addr, delay=delay, session=session)
             self._is_remote = True
         else:
             self._tcl_proc = TclProcessPopen(self.bat_path, delay=delay, output=output, error_check=error_check,
@@ -101,23 +140,222 @@ class VivadoPrj:
         self._is_open = False
         self._is_exit = True
 
+    @property
+    def _batch(self) -> TclBatch or None:
+        """ 当前线程正在录制的 TclBatch，SourceWatcher / RunScheduler 等后台线程的调用不会被录制 """
+        return getattr(self._record_local, "batch", None)
+
+    @_batch.setter
+    def _batch(self, batch: TclBatch or None) -> None:
+        self._record_local.batch = batch
+
     def tcl(self, tcl_cmd: str):
+        if self._batch is not None:
+            # 录制模式，不需要解释器
+            return self._batch.add(tcl_cmd)
         if not self._is_open:
             raise RuntimeError("tcl popen is not open")
         elif self._is_exit:
             raise ViTclCantRunError("vivado is exit, can't run tcl cmd")
 
+        self._tcl_serial += 1
         return self._tcl_proc.tcl(tcl_cmd)
 
+    def tcl_stream(self, tcl_cmd: str, timeout: int = None, batch_lines: int = 256,
+                   batch_interval: float = 0.5) -> Iterator[List[str]]:
+        """
+        边运行边按批返回输出，远程时由服务端流式转发，例如:
+            for lines in prj.tcl_stream("wait_on_run impl_1"):
+                print("\n".join(lines))
+        """
+        if self._batch is not None:
+            raise ViDeferredResult("tcl_stream can't be recorded")
+        if not self._is_open:
+            raise RuntimeError("tcl popen is not open")
+        elif self._is_exit:
+            raise ViTclCantRunError("vivado is exit, can't run tcl cmd")
+
+        self._tcl_serial += 1
+        return self._tcl_proc.tcl_stream(tcl_cmd, timeout=timeout, batch_lines=batch_lines,
+                                         batch_interval=batch_interval)
+
+    def tcl_batch(self, cmds: Iterable[str or dict], stop_on_error: bool = True) -> List[TclFuture]:
+        """
+        多条命令一次运行，远程时只有一次往返，返回每条命令的 TclFuture
+        :param cmds: tcl 语句，或 {"cmd", "raw", "timeout", "error_check"}
+        :param stop_on_error: 出错后不再运行后面的命令
+        """
+        if self._batch is not None:
+            return [self._batch.add(tcl_batch_options(cmd)["cmd"]) for cmd in cmds]
+        if not self._is_open:
+            raise RuntimeError("tcl popen is not open")
+        elif self._is_exit:
+            raise ViTclCantRunError("vivado is exit, can't run tcl cmd")
+
+        cmds = list(cmds)
+        self._tcl_serial += len(cmds)
+        return self._tcl_proc.tcl_batch(cmds, stop_on_error)
+
     def tcls(self, *tcl_cmds):
         tcl_cmd = "\n".join(tcl_cmds)
         return self.tcl(tcl_cmd)
 
-    def grpc_get_file(self, src: str, dst: str = "") -> Union[str, Path]:
-        return self._tcl_proc.grpc_get_file(src, dst)
+    def grpc_get_file(self, src: str, dst: str = "", progress=None) -> Union[str, Path]:
+        """ :param progress: progress(recv_bytes, total_bytes) """
+        return self._tcl_proc.grpc_get_file(src, dst, progress=progress)
+
+    def grpc_put_file(self, src: str, dst: str = "", progress=None) -> Union[str, Path]:
+        """ :param progress: progress(sent_bytes, total_bytes) """
+        return self._tcl_proc.grpc_put_file(src, dst, progress=progress)
+
+    def grpc_put_files(self, files: Iterable[Tuple[str, str]], progress=None) -> List[str]:
+        """
+        按内容去重上传多个文件，服务端已有的内容只发送摘要
+        :param files: [(本机路径, 远端路径)]
+        """
+        return self._tcl_proc.grpc_put_files(files, progress=progress)
+
+    def grpc_put_dir(self, src_dir: str, dst_dir: str = "", progress=None) -> List[str]:
+        """ 上传整个目录，保持相对路径，未改变的文件只发送摘要 """
+        return self._tcl_proc.grpc_put_dir(src_dir, dst_dir, progress=progress)
+
+    def sync_dir(self, src: str, dst: str = "", direction: str = "put", delete: bool = False,
+                 exclude: Sequence[str] = (), workers: int = 8, progress=None) -> SyncResult:
+        """
+        增量同步本机目录和 vivado 端目录，只传输改变的文件或块
+        :param direction: put: 本机 src -> vivado 端 dst; get: vivado 端 src -> 本机 dst
+        :param delete: 删除 dst 中 src 没有的文件
+        :param exclude: 不同步的 glob，例如 (".Xil", "*.jou")
+        :param progress: progress(done_files, total_files)
+        """
+        if self._is_remote:
+            return self._tcl_proc.sync_dir(src, dst, direction, delete, exclude, workers, progress)
+        if not dst:
+            raise ValueError("dst can't be empty for local vivado")
+        return sync_local_dir(src, dst, delete, exclude)
+
+    @property
+    def is_remote(self) -> bool:
+        return self._is_remote
+
+    @property
+    def max_core(self) -> int:
+        return self._max_core
+
+    def local_tmp_dir(self) -> str:
+        """ 本机临时目录，存放要 source 的脚本和从 vivado 端取回的文件 """
+        if not self._local_tmp:
+            self._local_tmp = tempfile.mkdtemp(prefix="vipytcl_")
+        return self._local_tmp
+
+    def _vivado_tmp_path(self, name: str) -> str:
+        """ 生成一个 vivado 端可写的临时文件路径，远程时为服务端工作目录下的 .vipytcl """
+        name = f"{uuid.uuid4().hex[:8]}_{name}"
+        if not self._is_remote:
+            return os.path.join(self.local_tmp_dir(), name).replace("\\", "/")
+
+        self.tcl("file mkdir .vipytcl")
+        return self.tcl(f"file normalize {{.vipytcl/{name}}}")[0]
+
+    def _fetch_file(self, vivado_path: str, local_path: str = "") -> str:
+        """ 把 vivado 端生成的文件取回本机，本地进程直接返回原路径 """
+        if not self._is_remote:
+            if local_path and os.path.abspath(local_path) != os.path.abspath(vivado_path):
+                shutil.copy(vivado_path, local_path)
+                return local_path
+            return vivado_path
+
+        local_path = local_path if local_path else os.path.join(self.local_tmp_dir(), os.path.basename(vivado_path))
+        return str(self.grpc_get_file(vivado_path, local_path))
+
+    def put_file(self, local_path: str, vivado_path: str) -> str:
+        """ 把本机文件放到 vivado 端 vivado_path，远程时上传 """
+        if self._is_remote:
+            return str(self.grpc_put_file(local_path, vivado_path))
+        shutil.copyfile(local_path, vivado_path)
+        return vivado_path
+
+    def source_script(self, script: str, name: str = "", once: bool = False) -> List[str]:
+        """
+        将一段 tcl 脚本写入文件后 source，长脚本不必逐行经过 stdin 回显
+        :param script: tcl 脚本内容
+        :param name: 脚本文件名
+        :param once: 为 True 时同一个 name 只 source 一次，用于定义 proc 的脚本；
+                     录制模式中只是记录了 source，batch 不一定运行或成功，不计为已 source
+        """
+        name = name if name else f"{uuid.uuid4().hex[:8]}.tcl"
+        if once and name in self._sourced_scripts:
+            return []
 
-    def grpc_put_file(self, src: str, dst: str = "") -> Union[str, Path]:
-        return self._tcl_proc.grpc_put_file(src, dst)
+        output = self.tcl(f"source -notrace {{{self._put_script(script, name)}}}")
+        if once and self._batch is None:
+            self._sourced_scripts.add(name)
+        return output
+
+    def _put_script(self, script: str, name: str) -> str:
+        """ 写入本机临时目录，远程时再发送到服务端，返回 vivado 端路径 """
+        path = os.path.join(self.local_tmp_dir(), name)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(script)
+
+        if self._is_remote:
+            path = str(self.grpc_put_file(path, name))
+        return path.replace("\\", "/")
+
+    @contextlib.contextmanager
+    def record(self, run: bool = True, batch_mode: bool = False, stop_on_error: bool = True) -> Iterator[TclBatch]:
+        """
+        录制模式: with 块中的方法调用只记录 tcl 命令并返回 TclFuture，退出时编译为一个脚本一次运行
+            with prj.record():
+                prj.reset_runs("synth_1")
+                f = prj.launch_runs("synth_1")
+                prj.wait_on_run("synth_1", timeout=60)
+            f.result()
+        需要立即使用返回值的方法（get_* 等查询）不能在录制模式中调用
+        只录制当前线程的调用，其它线程同时调用 prj 的方法照常运行
+        open_run / create_run / current_design / write_bits 在录制模式中返回 TclFuture，不检查结果
+        :param run: 退出时运行，False 时由调用方 run_batch 或取 batch.script()
+        :param batch_mode: 以 vivado -mode batch -source 在新进程中运行，不使用当前解释器
+        :param stop_on_error: 出错后不再运行后面的命令
+        """
+        if self._batch is not None:
+            raise ViArgsError("already recording")
+        batch = self._batch = TclBatch(stop_on_error)
+        try:
+            yield batch
+        finally:
+            self._batch = None
+        if run:
+            self.run_batch(batch, batch_mode)
+
+    def run_batch(self, batch: TclBatch, batch_mode: bool = False) -> List[TclFuture]:
+        """ 运行录制的 batch，返回按调用顺序的 future """
+        if not batch.futures:
+            return []
+        if batch_mode:
+            if self._is_remote:
+                raise ViArgsError("batch_mode only supports local vivado")
+            return batch.run_batch_mode(self.bat_path, os.path.join(self.local_tmp_dir(), f"batch_{batch.id}.tcl"))
+
+        if not self._is_open:
+            raise RuntimeError("tcl popen is not open")
+        path = self._put_script(batch.script(), f"batch_{batch.id}.tcl")
+        self._tcl_serial += 1
+        # 每个命令的错误由 batch 按标记分配，这里不检查
+        return batch.resolve(self._tcl_proc.tcl(f"source -notrace {{{path}}}", error_check=False))
+
+    def _report_to_file(self, cmd: str, name: str) -> str:
+        """
+        在 vivado 端执行 "cmd -file <path>" 把报告直接写到文件，再取回本机，
+        不经过 stdout 逐行回传
+        :return: 本机文件路径，用完后由调用方删除
+        """
+        path = self._vivado_tmp_path(name)
+        self.tcl(f"{cmd} -file {{{path}}}")
+        local_path = self._fetch_file(path)
+        if self._is_remote:
+            self.tcl(f"file delete -force {{{path}}}")
+        return local_path
 
     def save_log(self, path: str):
         if not self._is_exit:
@@ -155,7 +393,7 @@ class VivadoPrj:
     def _common_get(self, cmd: str,
                     pattern: str = "*",
                     regexp: bool = False,
-                    filter_: Filter = None or str,
+                    filter_: Filter or str = "",
                     of_objects: str or ViObj = "", **kwargs) -> List[str]:
 
         tcl = f"{cmd} {{{pattern}}}"
@@ -171,18 +409,41 @@ class VivadoPrj:
         else:
             return result[0].split()
 
+    """ ============================ snapshot =========================== """
+
+    def snapshot(self, max_age: float = 0.0) -> ProjectSnapshot:
+        """
+        一次 tcl 调用取得全部 run（类型、状态、进度、parent、strategy、needs_refresh、目录）和已打开的 design
+        :param max_age: 上一次 snapshot 之后没有执行过其它 tcl 命令且不超过 max_age 秒时直接复用, 0 为总是重新查询
+        """
+        if (max_age and self._snapshot is not None and self._snapshot_serial == self._tcl_serial
+                and self._snapshot.age <= max_age):
+            return self._snapshot
+
+        self.source_script(SnapshotTcl, "vipytcl_snapshot.tcl", once=True)
+        self._snapshot = parse_snapshot(self.tcl(snapshot_tcl_call()))
+        self._snapshot_serial = self._tcl_serial
+        return self._snapshot
+
+    def is_run_exist(self, run: str or ViObjRun) -> bool:
+        run = run.name if isinstance(run, ViObjRun) else run
+        return run in self.snapshot(max_age=1.0).runs
+
     """ ============================ runs =========================== """
 
     def get_designs(self,
                     pattern: str = "*",
                     regexp: bool = False,
-                    filter_: Filter = None or str,
+                    filter_: Filter or str = "",
                     of_objects: str or ViObj = "", **kwargs) -> List[str]:
         return self._common_get("get_designs", pattern, regexp, filter_, of_objects, **kwargs)
 
     def current_design(self, design: str or ViObjDesign = "", **kwargs) -> ViObjDesign or None:
         tcl = f"current_design {design}"
         tcl += tcl_args_parse(**kwargs) if kwargs else ""
+        if self._batch is not None:
+            # 录制模式: 返回 TclFuture，不检查结果
+            return self.tcl(tcl)
         result = self.tcl(tcl)[0]
 
         if "WARNING: " in result:
@@ -199,7 +460,7 @@ class VivadoPrj:
     def get_runs(self,
                  pattern: str = "*",
                  regexp: bool = False,
-                 filter_: Filter = None or str,
+                 filter_: Filter or str = "",
                  of_objects: str or ViObj = "", **kwargs) -> Tuple[ViObjRun, ...]:
         runs = self._common_get("get_runs", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjRun(self._tcl_proc, run) for run in runs)
@@ -207,6 +468,8 @@ class VivadoPrj:
     def open_run(self, run: str or ViObjRun, **kwargs) -> ViObjRun:
         name = kwargs.pop("name") if "name" in kwargs else run
         result = self.tcl(f"open_run {run} -name {name}" + tcl_args_parse(**kwargs))
+        if self._batch is not None:
+            return result
         if result[-1] != run:
             raise ViRunNameDontMatch
         return ViObjRun(self._tcl_proc, run)
@@ -217,6 +480,8 @@ class VivadoPrj:
         tcl = f"create_run {run} -flow {{{flow}}}" + tcl_args_parse(**kwargs)
 
         result = self.tcl(tcl)
+        if self._batch is not None:
+            return result
         if result and result[-1] != run:
             raise ViRunNameDontMatch
 
@@ -229,13 +494,71 @@ class VivadoPrj:
         return self.tcl(f"wait_on_run {run} -timeout {timeout}" + tcl_args_parse(**kwargs))
 
     def launch_runs(self, run: str or ViObjRun, force: bool = False, **kwargs) -> List[str]:
+        """ 未指定 jobs 时使用 max_core """
+        kwargs.setdefault("jobs", self._max_core)
         if force:
             return self.tcl(f"launch_runs {run} -force" + tcl_args_parse(**kwargs))
         else:
             return self.tcl(f"launch_runs {run}" + tcl_args_parse(**kwargs))
 
+    def get_run_dirs(self, runs: Sequence[str or ViObjRun] = ()) -> Dict[str, str]:
+        """ 一次调用取得 runs（为空时为全部 run）的 DIRECTORY """
+        names = " ".join(f"{{{r.name if isinstance(r, ViObjRun) else r}}}" for r in runs)
+        objs = f"[get_runs [list {names}]]" if runs else "[get_runs]"
+        lines = self.tcl(f"foreach r {objs} {{puts \"$r\\t[get_property DIRECTORY $r]\"}}")
+        return dict(line.split("\t", 1) for line in lines if "\t" in line)
+
+    def watch_runs(self, runs: Sequence[str or ViObjRun] = (), callback=None, poll_interval: float = 2.0,
+                   path_map: Tuple[str, str] = (), start: bool = True) -> RunWatcher:
+        """
+        通过 run 目录中的标记文件和 runme.log 跟踪 run 状态，代替阻塞解释器的 wait_on_run
+        :param callback: callback(event: RunWatchEvent)
+        :param path_map: (vivado 端路径前缀, 本机路径前缀)，远程工程的 run 目录通过 NFS 等共享到本机时使用
+        """
+        run_dirs = self.get_run_dirs(runs)
+        if path_map:
+            run_dirs = {r: d.replace(path_map[0], path_map[1], 1) for r, d in run_dirs.items()}
+        elif self._is_remote:
+            raise ViArgsError("watch_runs on remote project needs path_map to a locally mounted run directory")
+
+        watcher = RunWatcher(run_dirs, poll_interval, callback)
+        return watcher.start() if start else watcher
+
+    def watch_sources(self, callback=None, debounce: float = 2.0, poll_interval: float = 1.0, to_impl: bool = False,
+                      path_map: Tuple[str, str] = (), start: bool = True, refresh_interval: float = 30.0,
+                      **launch_kwargs) -> SourceWatcher:
+        """
+        监视 get_files 得到的 HDL / XDC / IP 源文件，改动后只 reset / launch 受影响的 run
+            只改约束 -> impl run，改 OOC 模块 -> 该 OOC synth run，改顶层 RTL -> 顶层 synth run
+        :param callback: callback(event: SourceChangeEvent)
+        :param debounce: 最后一次改动之后等待的时间, sec
+        :param to_impl: RTL 改动时连同 impl run 一起重新运行
+        :param path_map: (vivado 端路径前缀, 本机路径前缀)，远程工程的源文件共享到本机时使用
+        :param refresh_interval: 重新取得源文件列表的间隔, sec，之后加入工程的文件也会被监视
+        :param launch_kwargs: launch_runs 的参数
+        """
+        if self._is_remote and not path_map:
+            raise ViArgsError("watch_sources on remote project needs path_map to locally mounted sources")
+        watcher = SourceWatcher(self, debounce, poll_interval, to_impl, path_map, callback, refresh_interval,
+                                **launch_kwargs)
+        watcher.refresh()
+        return watcher.start() if start else watcher
+
+    def sweep_strategies(self, parent: str, space: Dict[str, Sequence[str]], search: str = "grid", n: int = 0,
+                         **kwargs) -> SweepResult:
+        """
+        在 parent synth run 下并行搜索实现策略 / directive，完成后返回按 WNS 可排序的结果表
+        :param space: {run 属性: 候选值}，例如 {"STRATEGY": [...], "STEPS.ROUTE_DESIGN.ARGS.DIRECTIVE": [...]}
+        :param search: grid / random / adaptive
+        :param n: random / adaptive 的候选数
+        :param kwargs: StrategySweep 的其它参数，例如 cores_per_run、early_stop_margin、hosts
+        """
+        return StrategySweep(self, parent, space, search, n, **kwargs).run()
+
     def get_runs_type(self, run: str or ViObjRun) -> RunsType:
-        return self.get_runs(run)[0].get_run_type()
+        run = run.name if isinstance(run, ViObjRun) else run
+        info = self.snapshot(max_age=1.0).runs.get(run)
+        return info.type if info else RunsType.NoneType
 
     def current_run(self, run: str or ViObjRun = "", synth: bool = False, impl: bool = False, **kwargs) -> List[str]:
         """ 当传入 run 即为将该 run 对应的 synth 和 impl 设置为 active """
@@ -260,7 +583,7 @@ class VivadoPrj:
     def get_filesets(self,
                      pattern: str = "*",
                      regexp: bool = False,
-                     filter_: Filter = None or str,
+                     filter_: Filter or str = "",
                      of_objects: str or ViObj = "", **kwargs) -> Tuple[ViObjFileset, ...]:
         filesets = self._common_get("get_filesets", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjFileset(self._tcl_proc, fileset) for fileset in filesets)
@@ -320,7 +643,7 @@ class VivadoPrj:
     def get_files(self,
                   patterns: str = "*",
                   regexp: bool = False,
-                  filter_: Filter = None or str,
+                  filter_: Filter or str = "",
                   of_objects: str or ViObj = "",
                   used_in: RunsType = None,
                   all_: bool = False, **kwargs
@@ -342,12 +665,29 @@ class VivadoPrj:
         tcl += " ".join(files)
         return self.tcl(tcl)
 
+    def get_ips_info(self, xcis: Sequence[str] = ()) -> List[IPInfo]:
+        """ 一次调用取得 IP 的 IPDEF、是否 OOC、OOC synth run 和 CONFIG.* 属性的 hash """
+        xcis = xcis if xcis else self.get_files(filter_=viproperty.FILE_TYPE == viproperty.FILE_TYPE.IP)
+        self.source_script(IPInfoTcl, "vipytcl_ip_build.tcl", once=True)
+        return parse_ip_info(self.tcl(f"::vipytcl::ip_info [list {' '.join(f'{{{x}}}' for x in xcis)}]"))
+
+    def build_ips(self, ips: Sequence[str] = (), workers: int = 0, mem_gb: float = 0.0, mem_per_worker: float = 2.0,
+                  cache: BuildCache = None, **launch_kwargs) -> Dict[str, IPBuildResult]:
+        """
+        generate_target 全部（或 ips 指定的）IP 并并行运行 OOC synth run，配置未变的 IP 从构建缓存恢复
+        :param workers: 同时运行的 OOC synth run 数，0 时由 max_core / mem_gb / mem_per_worker 决定
+        :param mem_gb: 可用内存，0 为不限制
+        :param launch_kwargs: launch_runs 的参数
+        :return: {ip: IPBuildResult}，包括每个 IP 的 generate / synth 时间
+        """
+        return IPBuilder(self, ips, workers, self._max_core, mem_gb, mem_per_worker, cache, **launch_kwargs).run()
+
     """ ============================ cells =========================== """
 
     def get_cells(self,
                   pattern: str = "*",
                   regexp: bool = False,
-                  filter_: Filter = None or str,
+                  filter_: Filter or str = "",
                   of_objects: str or ViObj = "",
                   hierarchy: bool = False,
                   nocase: bool = False,
@@ -413,24 +753,303 @@ class VivadoPrj:
         tcl += tcl_args_parse(**kwargs)
         return self.tcl(tcl)
 
+    """ ============================ build cache =========================== """
+
+    def use_build_cache(self, root: str = "", max_bytes: int = DefaultBuildCacheBytes, shared=None) -> BuildCache:
+        """
+        启用构建缓存，launch_runs_cached 在输入没有变化时直接恢复之前的 DCP / 报告
+        :param root: 本机缓存目录
+        :param max_bytes: 本机缓存的容量上限
+        :param shared: 共享存储，DirectoryStore(nfs 目录) 或 GRPCStore
+        """
+        self.build_cache = BuildCache(LocalStore(root, max_bytes), shared)
+        return self.build_cache
+
+    def run_inputs(self, run: str or ViObjRun) -> RunInputs:
+        """ 一次调用导出 run 的全部输入: 源文件、约束、run 属性、part、vivado 版本 """
+        run = run.name if isinstance(run, ViObjRun) else run
+        self.source_script(RunInputsTcl, "vipytcl_build_cache.tcl", once=True)
+        dump = self._vivado_tmp_path("run_inputs.txt")
+        self.tcl(f"::vipytcl::run_inputs {{{dump}}} {{{run}}}")
+        local_dump = self._fetch_file(dump)
+        with open(local_dump, encoding="utf-8") as f:
+            inputs = parse_run_inputs(f)
+        os.remove(local_dump)
+        if self._is_remote:
+            self.tcl(f"file delete -force {{{dump}}}")
+        return inputs
+
+    def run_cache_key(self, run: str or ViObjRun) -> str:
+        """
+        run 输入的 hash，impl run 同时包含 parent synth run 的 key
+        本地进程直接对文件内容计算摘要，按 (path, size, mtime) 记忆避免重复读取
+        """
+        inputs = self.run_inputs(run)
+        digests = {}
+        if not self._is_remote:
+            for f in inputs.files:
+                memo = (f["path"], f["size"], f["mtime"])
+                if memo not in self._digest_memo:
+                    self._digest_memo[memo] = file_digest(f["path"])
+                digests[f["path"]] = self._digest_memo[memo]
+
+        parent_key = self.run_cache_key(inputs.parent) if inputs.parent else ""
+        return build_cache_key(inputs, digests, parent_key)
+
+    def get_run_outputs(self, run: str or ViObjRun, patterns: Sequence[str] = DefaultCachePatterns) -> List[str]:
+        """ run 目录下匹配 patterns 的文件，为 vivado 端路径 """
+        run = run.name if isinstance(run, ViObjRun) else run
+        self.source_script(RunInputsTcl, "vipytcl_build_cache.tcl", once=True)
+        result = self.tcl(f"::vipytcl::run_outputs {{{run}}}")
+        return select_outputs([path for path in result if path], patterns)
+
+    def fetch_run_outputs(self, run: str or ViObjRun, dst_dir: str,
+                          patterns: Sequence[str] = DefaultCachePatterns) -> List[str]:
+        """ 把 run 目录下匹配 patterns 的文件取回本机 dst_dir """
+        os.makedirs(dst_dir, exist_ok=True)
+        return [self._fetch_file(path, os.path.join(dst_dir, os.path.basename(path)))
+                for path in self.get_run_outputs(run, patterns)]
+
+    def launch_runs_cached(self, run: str or ViObjRun, cache: BuildCache = None,
+                           patterns: Sequence[str] = DefaultCachePatterns, **kwargs) -> bool:
+        """
+        带构建缓存的 reset_run + launch_runs + wait_on_run
+            命中: 把缓存的 DCP / 报告 / run 状态文件恢复到 run 目录，不启动 run；恢复后 STATUS 不是完成时照常运行
+            未命中: 正常运行，完成后把 run 目录中匹配 patterns 的文件写入缓存
+        :param cache: 为空时使用 use_build_cache 启用的缓存
+        :param kwargs: launch_runs 的参数
+        :return: 是否命中缓存
+        """
+        run = run.name if isinstance(run, ViObjRun) else run
+        cache = cache if cache else self.build_cache
+        if cache is None:
+            cache = self.use_build_cache()
+
+        key = self.run_cache_key(run)
+        stage = os.path.join(self.local_tmp_dir(), f"build_cache_{key[:12]}")
+        try:
+            files = cache.get(key, stage)
+            if files is not None:
+                status = self.restore_run_outputs(run, files)
+                if "Complete" in status:
+                    logger.info(f"run {run} restored from build cache {key[:12]}, files: {len(files)}")
+                    return True
+                logger.warning(f"run {run} restored from build cache {key[:12]} but status is {status!r}, rerun")
+
+            status = self._run_and_wait(run, **kwargs)
+            if "Complete" not in status:
+                raise ViRunFailed(f"run {run} failed: {status}")
+
+            files = self.fetch_run_outputs(run, stage, patterns)
+            cache.put(key, files, meta={"run": run, "status": status})
+            logger.info(f"run {run} stored to build cache {key[:12]}, files: {len(files)}")
+            return False
+        finally:
+            shutil.rmtree(stage, ignore_errors=True)
+
+    def restore_run_outputs(self, run: str or ViObjRun, files: Iterable[str]) -> str:
+        """
+        reset_run 后把本机的 files 复制到 run 目录
+        files 需包含 run 的状态标记（build_cache.RunStatusPatterns），否则 vivado 仍认为 run 没有完成
+        :return: 恢复后 run 的 STATUS
+        """
+        run = run.name if isinstance(run, ViObjRun) else run
+        self.reset_runs(run)
+        run_dir = self.tcl(f"get_property DIRECTORY [get_runs {{{run}}}]")[0]
+        self.tcl(f"file mkdir {{{run_dir}}}")
+        for path in files:
+            self.put_file(path, f"{run_dir}/{os.path.basename(path)}")
+        return self.tcl(f"get_property STATUS [get_runs {{{run}}}]")[0]
+
+    def _run_and_wait(self, run: str, **kwargs) -> str:
+        """ reset_run + launch_runs + wait_on_run，返回 run 的 STATUS """
+        self.reset_runs(run)
+        self.launch_runs(run, **kwargs)
+        self.tcl(f"wait_on_run {{{run}}}")
+        return self.tcl(f"get_property STATUS [get_runs {{{run}}}]")[0]
+
+    """ ============================ incremental =========================== """
+
+    def _incremental_dir(self, run: str) -> str:
+        prj_dir = self.tcl("get_property DIRECTORY [current_project]")[0]
+        return f"{prj_dir}/{IncrementalDirName}/{run}".replace("\\", "/")
+
+    def incremental_reference(self, run: str or ViObjRun) -> str:
+        """ run 当前的增量参考 DCP（vivado 端路径），没有时为空 """
+        run = run.name if isinstance(run, ViObjRun) else run
+        result = self.tcl(f"lindex [glob -nocomplain -directory {{{self._incremental_dir(run)}}} *.dcp] 0")
+        return result[0].strip() if result else ""
+
+    def clear_incremental_reference(self, run: str or ViObjRun) -> None:
+        run = run.name if isinstance(run, ViObjRun) else run
+        self.tcl(f"file delete -force {{{self._incremental_dir(run)}}}")
+        self._set_incremental_checkpoint(run, "")
+
+    def _set_incremental_checkpoint(self, run: str, dcp: str) -> None:
+        self.tcl(f"set_property INCREMENTAL_CHECKPOINT {{{dcp}}} [get_runs {{{run}}}]")
+
+    def _update_incremental_reference(self, run: str) -> bool:
+        """ 在 vivado 端把 run 的 routed DCP 复制为参考，不经过本机 """
+        routed = self.get_run_outputs(run, (RoutedDcpPattern,))
+        if not routed:
+            return False
+        ref_dir = self._incremental_dir(run)
+        self.tcl(f"file delete -force {{{ref_dir}}}")
+        self.tcl(f"file mkdir {{{ref_dir}}}")
+        self.tcl(f"file copy -force {{{routed[0]}}} {{{ref_dir}/{os.path.basename(routed[0])}}}")
+        return True
+
+    def _read_incremental_reports(self, result: IncrementalResult) -> None:
+        report_dir = os.path.join(self.local_tmp_dir(), f"incremental_{result.run}")
+        try:
+            for path in self.fetch_run_outputs(result.run, report_dir, ReuseReportPatterns + TimingSummaryPatterns):
+                name = os.path.basename(path)
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    if "timing_summary" in name:
+                        result.wns = parse_design_timing_summary(f).get("WNS(ns)", result.wns)
+                    elif "reuse_routed" in name or not result.reuse:
+                        result.reuse = parse_reuse_report(f) or result.reuse
+        finally:
+            shutil.rmtree(report_dir, ignore_errors=True)
+
+    def launch_runs_incremental(self, run: str or ViObjRun, min_reuse: float = 60.0, only_met_timing: bool = False,
+                                fallback: bool = True, rerun_on_poor_reuse: bool = False,
+                                **kwargs) -> IncrementalResult:
+        """
+        增量实现: 以该 run 上一次成功的 routed DCP 作为 INCREMENTAL_CHECKPOINT 运行，完成后更新参考
+        :param min_reuse: cell 复用率低于该值（%）视为复用差
+        :param only_met_timing: 只有 WNS >= 0 的结果才作为下一次的参考
+        :param fallback: 带参考运行失败时，去掉参考按完整流程重新运行
+        :param rerun_on_poor_reuse: 复用差且时序不满足时，去掉参考按完整流程重新运行
+        :param kwargs: launch_runs 的参数
+        """
+        run = run.name if isinstance(run, ViObjRun) else run
+        start = time.time()
+        result = IncrementalResult(run, self.incremental_reference(run))
+        self._set_incremental_checkpoint(run, result.reference)
+        status = self._run_and_wait(run, **kwargs)
+
+        if "Complete" not in status and result.reference and fallback:
+            logger.warning(f"incremental run {run} failed with reference, fall back to full flow: {status}")
+            result.fell_back, result.reference = True, ""
+            self._set_incremental_checkpoint(run, "")
+            status = self._run_and_wait(run, **kwargs)
+
+        result.status = status
+        if "Complete" not in status:
+            raise ViRunFailed(f"run {run} failed: {status}")
+
+        self._read_incremental_reports(result)
+        if result.reference and math.isnan(result.cell_reuse):
+            # 复用报告缺失或无法解析时不知道复用率，不当作复用差，保留参考
+            logger.warning(f"incremental run {run} cell reuse unknown, keep reference")
+        result.poor_reuse = bool(result.reference) and result.cell_reuse < min_reuse
+        if result.poor_reuse:
+            logger.warning(f"incremental run {run} cell reuse {result.cell_reuse:.1f}% < {min_reuse}%")
+            if rerun_on_poor_reuse and not result.wns >= 0:
+                result.fell_back, result.reference = True, ""
+                self._set_incremental_checkpoint(run, "")
+                result.status = self._run_and_wait(run, **kwargs)
+                if "Complete" not in result.status:
+                    raise ViRunFailed(f"run {run} failed: {result.status}")
+                self._read_incremental_reports(result)
+
+        if not only_met_timing or result.wns >= 0:
+            result.updated = self._update_incremental_reference(run)
+        result.elapsed = time.time() - start
+        logger.info(f"incremental run done: {result}")
+        return result
+
+    """ ============================ device db =========================== """
+
+    def get_part_and_version(self) -> Tuple[str, str]:
+        part = self.tcl("if {[llength [current_design -quiet]]} {get_property PART [current_design]} "
+                        "else {get_property PART [current_project]}")[0]
+        version = self.tcl("version -short")[0]
+        return part, version
+
+    def use_device_db(self, root: str = "", populate: bool = True, with_pins: bool = False) -> DeviceDB or None:
+        """
+        启用器件数据库，get_tiles/get_sites/get_bels/get_site_pins/get_bel_pins 会先查询本地数据库，
+        无法由数据库回答的查询（带 filter、其它参数等）仍然交给 vivado
+        数据库按 part 和 vivado 版本保存在 root 下，首次使用时由当前 design 导出
+        :param root: 数据库根目录，默认 ~/.ViPyTcl/device_db
+        :param populate: 数据库不存在时是否从 vivado 导出
+        :param with_pins: 导出时是否包含 site_pins 和 bel_pins，数据量会大很多
+        """
+        part, version = self.get_part_and_version()
+        db = DeviceDB.open(part, version, root)
+        if (db is None or (with_pins and not db.with_pins)) and populate:
+            db = self.export_device_db(root, with_pins=with_pins)
+        self.device_db = db
+        return db
+
+    def export_device_db(self, root: str = "", with_pins: bool = False) -> DeviceDB:
+        """ 在 vivado 端一次性导出当前器件的 tile/site/bel 数据并保存到数据库 """
+        part, version = self.get_part_and_version()
+        self.source_script(ExportDeviceTcl, "vipytcl_export_device.tcl", once=True)
+
+        dump = self._vivado_tmp_path("device.txt")
+        self.tcl(f"::vipytcl::export_device {{{dump}}} {int(with_pins)}")
+        local_dump = self._fetch_file(dump)
+
+        with open(local_dump, encoding="utf-8") as f:
+            db = parse_device_dump(f, part, version)
+        os.remove(local_dump)
+        if self._is_remote:
+            self.tcl(f"file delete -force {{{dump}}}")
+
+        path = db.save(root)
+        logger.info(f"export device db {db} -> {path}")
+        return DeviceDB.load(path, part, version)
+
+    def _device_db_get(self, kind: str, pattern: str, regexp: bool, filter_, of_objects, **kwargs) -> List[str] or None:
+        """ 能由器件数据库回答时返回名字列表，否则返回 None 交给 vivado """
+        if self.device_db is None or not self.device_db.has(kind) or filter_:
+            return None
+
+        nocase = kwargs.pop("nocase", False)
+        kwargs.pop("quiet", None)
+        if kwargs:
+            return None
+
+        of_kind, of_names = "", ()
+        if of_objects:
+            objs = list(of_objects) if isinstance(of_objects, (list, tuple, ViObjList)) else [of_objects]
+            if not all(isinstance(obj, ViObj) and obj.tcl == objs[0].tcl for obj in objs):
+                return None
+            of_kind = ViObjTclToDeviceKind.get(objs[0].tcl, "")
+            if not of_kind or not self.device_db.has(of_kind):
+                return None
+            of_names = [name for obj in objs for name in obj.name.split()]
+
+        try:
+            return self.device_db.query(kind, pattern, regexp, nocase, of_kind, of_names)
+        except KeyError:
+            return None
+
     """ ============================ bel =========================== """
 
     def get_bels(self,
                  pattern: str = "*",
                  regexp: bool = False,
-                 filter_: Filter = None or str,
+                 filter_: Filter or str = "",
                  of_objects: str or ViObj = "",
                  **kwargs) -> Tuple[ViObjBel, ...]:
-        bels = self._common_get("get_bels", pattern, regexp, filter_, of_objects, **kwargs)
+        bels = self._device_db_get("bels", pattern, regexp, filter_, of_objects, **kwargs)
+        if bels is None:
+            bels = self._common_get("get_bels", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjBel(self._tcl_proc, bel) for bel in bels)
 
     def get_bel_pins(self,
                      pattern: str = "*",
                      regexp: bool = False,
-                     filter_: Filter = None or str,
+                     filter_: Filter or str = "",
                      of_objects: str or ViObjBel = "",
                      **kwargs) -> Tuple[ViObjPin, ...]:
-        pins = self._common_get("get_bel_pins", pattern, regexp, filter_, of_objects, **kwargs)
+        pins = self._device_db_get("bel_pins", pattern, regexp, filter_, of_objects, **kwargs)
+        if pins is None:
+            pins = self._common_get("get_bel_pins", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjPin(self._tcl_proc, pin) for pin in pins)
 
     """ ============================ site =========================== """
@@ -438,19 +1057,23 @@ class VivadoPrj:
     def get_sites(self,
                   pattern: str = "*",
                   regexp: bool = False,
-                  filter_: Filter = None or str,
+                  filter_: Filter or str = "",
                   of_objects: str or ViObj = "",
                   **kwargs) -> Tuple[ViObjSite, ...]:
-        sites = self._common_get("get_sites", pattern, regexp, filter_, of_objects, **kwargs)
+        sites = self._device_db_get("sites", pattern, regexp, filter_, of_objects, **kwargs)
+        if sites is None:
+            sites = self._common_get("get_sites", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjSite(self._tcl_proc, site) for site in sites)
 
     def get_site_pins(self,
                       pattern: str = "*",
                       regexp: bool = False,
-                      filter_: Filter = None or str,
+                      filter_: Filter or str = "",
                       of_objects: str or ViObjBel = "",
                       **kwargs) -> Tuple[ViObjPin, ...]:
-        pins = self._common_get("get_site_pins", pattern, regexp, filter_, of_objects, **kwargs)
+        pins = self._device_db_get("site_pins", pattern, regexp, filter_, of_objects, **kwargs)
+        if pins is None:
+            pins = self._common_get("get_site_pins", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjPin(self._tcl_proc, pin) for pin in pins)
 
     """ ============================ tile =========================== """
@@ -458,10 +1081,12 @@ class VivadoPrj:
     def get_tiles(self,
                   pattern: str = "*",
                   regexp: bool = False,
-                  filter_: Filter = None or str,
+                  filter_: Filter or str = "",
                   of_objects: str or ViObj = "",
                   **kwargs) -> Tuple[ViObjTile, ...]:
-        tiles = self._common_get("get_tiles", pattern, regexp, filter_, of_objects, **kwargs)
+        tiles = self._device_db_get("tiles", pattern, regexp, filter_, of_objects, **kwargs)
+        if tiles is None:
+            tiles = self._common_get("get_tiles", pattern, regexp, filter_, of_objects, **kwargs)
         return tuple(ViObjTile(self._tcl_proc, tile) for tile in tiles)
 
     """ ============================ pins =========================== """
@@ -469,7 +1094,7 @@ class VivadoPrj:
     def get_pins(self,
                  pattern: str = "*",
                  regexp: bool = False,
-                 filter_: Filter = None or str,
+                 filter_: Filter or str = "",
                  of_objects: str or ViObj = "",
                  **kwargs) -> Tuple[ViObjPin, ...]:
         pins = self._common_get("get_pins", pattern, regexp, filter_, of_objects, **kwargs)
@@ -502,7 +1127,7 @@ class VivadoPrj:
     def get_ports(self,
                   pattern: str = "*",
                   regexp: bool = False,
-                  filter_: Filter = None or str,
+                  filter_: Filter or str = "",
                   of_objects: str or ViObj = "",
                   **kwargs) -> Tuple[ViObjPort, ...]:
         ports = self._common_get("get_ports", pattern, regexp, filter_, of_objects, **kwargs)
@@ -529,6 +1154,198 @@ class VivadoPrj:
         tcl += tcl_args_parse(kwargs) if kwargs else ""
         return self.tcl(tcl)
 
+    """ ============================ netlist =========================== """
+
+    def export_netlist(self, path: str,
+                       cell_props: Sequence[str] = (),
+                       pin_props: Sequence[str] = (),
+                       net_props: Sequence[str] = (),
+                       port_props: Sequence[str] = ()) -> NetlistDB:
+        """
+        在 vivado 端一次性导出当前 design 的 cell/pin/net/port、属性和连接关系，保存为列式 .npz
+        之后可通过 NetlistDB.load(path) 以 mmap 方式反复加载，不需要再打开 design
+        :param path: 本机 .npz 保存路径
+        :param cell_props: 除默认属性外额外导出的 cell 属性，pin_props/net_props/port_props 同理
+        """
+        props = [tuple(dict.fromkeys((*default, *map(str, extra))))
+                 for default, extra in ((DefaultCellProperties, cell_props), (DefaultPinProperties, pin_props),
+                                        (DefaultNetProperties, net_props), (DefaultPortProperties, port_props))]
+        self.source_script(ExportNetlistTcl, "vipytcl_export_netlist.tcl", once=True)
+
+        dump = self._vivado_tmp_path("netlist.txt")
+        self.tcl(export_netlist_tcl_call(dump, *props))
+        local_dump = self._fetch_file(dump)
+
+        with open(local_dump, encoding="utf-8") as f:
+            db = parse_netlist_dump(f, *props)
+        os.remove(local_dump)
+        if self._is_remote:
+            self.tcl(f"file delete -force {{{dump}}}")
+
+        db.save(path)
+        logger.info(f"export netlist {db} -> {path}")
+        return NetlistDB.load(path)
+
+    def netlist_graph(self, path: str = "", refresh: bool = False, **kwargs) -> NetlistGraph:
+        """
+        建立网表连接关系索引，fanout/fanin cone、driver/load、时钟域查询都在本地完成
+        :param path: NetlistDB 的 .npz 路径，已存在且不 refresh 时直接加载，不再访问 vivado
+        :param refresh: 是否重新导出
+        :param kwargs: 传给 export_netlist 的额外属性
+        """
+        path = path if path else os.path.join(self.local_tmp_dir(), "netlist.npz")
+        if refresh or not os.path.isfile(path):
+            db = self.export_netlist(path, **kwargs)
+        else:
+            db = NetlistDB.load(path)
+        return NetlistGraph(db)
+
+    """ ============================ timing =========================== """
+
+    def report_timing_paths(self, stages: bool = True, **kwargs) -> Iterator[TimingPath]:
+        """
+        report_timing 写入文件后流式解析，逐条 yield TimingPath
+        :param stages: 是否解析逐级延时
+        :param kwargs: report_timing 的参数，例如 max_paths=1000, nworst=1, delay_type="max", of_objects=...
+        """
+        local_path = self._report_to_file("report_timing" + tcl_args_parse(**kwargs), "timing.rpt")
+        try:
+            with open(local_path, encoding="utf-8", errors="replace") as f:
+                yield from iter_timing_paths(f, stages=stages)
+        finally:
+            os.remove(local_path)
+
+    def report_timing_table(self, **kwargs) -> TimingPathTable:
+        """ report_timing 的列式汇总，只保留每条 path 的汇总信息 """
+        return TimingPathTable.from_paths(self.report_timing_paths(stages=False, **kwargs))
+
+    def report_timing_summary(self, **kwargs) -> Dict[str, float]:
+        """
+        report_timing_summary 的 Design Timing Summary
+        :return: {"WNS(ns)": ..., "TNS(ns)": ..., "WHS(ns)": ..., ...}
+        """
+        local_path = self._report_to_file("report_timing_summary" + tcl_args_parse(**kwargs), "timing_summary.rpt")
+        try:
+            with open(local_path, encoding="utf-8", errors="replace") as f:
+                return parse_design_timing_summary(f)
+        finally:
+            os.remove(local_path)
+
+    """ ============================ utilization =========================== """
+
+    def report_utilization(self, hierarchical: bool = False, hierarchical_depth: int = 0,
+                           **kwargs) -> UtilizationReport:
+        """
+        report_utilization 写入文件后取回本机解析，大层次结构也不经过 stdout 逐行回传
+        各表按章节标题归类，例如 report.table("Slice Logic")、report.primitives()、report.hierarchy()
+        每张表的 columns 为 numpy 数组，to_records() 转为 record array
+        :param hierarchical: 按层次统计，得到带 Level 列的 "Utilization by Hierarchy" 表
+        :param hierarchical_depth: 层次深度，0 为不限制
+        :param kwargs: report_utilization 的其它参数，例如 cells=..., pblocks=...
+        """
+        if hierarchical:
+            kwargs["hierarchical"] = True
+            if hierarchical_depth:
+                kwargs["hierarchical_depth"] = hierarchical_depth
+
+        local_path = self._report_to_file("report_utilization" + tcl_args_parse(**kwargs), "utilization.rpt")
+        try:
+            with open(local_path, encoding="utf-8", errors="replace") as f:
+                return parse_utilization_report(f)
+        finally:
+            os.remove(local_path)
+
+    """ ============================ report cache =========================== """
+
+    def use_report_cache(self, root: str = "", max_bytes: int = DefaultReportCacheBytes) -> ReportCache:
+        """ 启用报告缓存，同一个 DCP 上相同的报告命令和参数只生成一次 """
+        self.report_cache = ReportCache(root, max_bytes)
+        return self.report_cache
+
+    def _run_dcp(self, run: str) -> str:
+        """ run 的最终 DCP，impl run 为 routed DCP """
+        patterns = (RoutedDcpPattern,) if self.get_runs_type(run) is RunsType.IMPL else ("*.dcp",)
+        dcps = self.get_run_outputs(run, patterns)
+        if not dcps:
+            raise ViRunFailed(f"run {run} has no checkpoint")
+        return dcps[0]
+
+    def _dcp_digest(self, dcp: str, path_map: Tuple[str, str] = ()) -> str:
+        if not self._is_remote or path_map:
+            return self.report_cache.dcp_digest(dcp.replace(path_map[0], path_map[1], 1) if path_map else dcp)
+
+        # 远程且 DCP 不在本机: 由服务端读取整个 DCP 计算摘要，服务端按 (path, size, mtime_ns) 缓存，
+        # 同一个服务端的所有客户端共用，DCP 未改变时不重新读取
+        dcp_dir, name = posixpath.split(dcp.replace("\\", "/"))
+        _, manifest = self._tcl_proc.remote_manifest(dcp_dir, missing_ok=False, paths=[name])
+        if name not in manifest:
+            raise FileNotFoundError(f"checkpoint not found on server: {dcp}")
+        return manifest[name].sha256
+
+    def _open_for_report(self, run: str, dcp: str) -> None:
+        if run:
+            if run in self.snapshot().designs:
+                self.current_design(run)
+            else:
+                self.open_run(run)
+        else:
+            self.tcl("set ::vipytcl_report_prj [current_project -quiet]")
+            self.tcl(f"open_checkpoint {{{dcp}}}")
+
+    def _close_for_report(self, run: str) -> None:
+        if not run:
+            # open_checkpoint 打开的是一个新的内存工程
+            self.tcl("close_project")
+            self.tcl("if {$::vipytcl_report_prj ne \"\"} {current_project $::vipytcl_report_prj}")
+
+    def cached_report(self, cmd: str, run: str or ViObjRun = "", dcp: str = "", path_map: Tuple[str, str] = (),
+                      **kwargs) -> str:
+        """
+        按 DCP 内容摘要 + 命令 + 参数缓存的报告文本，命中时不打开 design
+            prj.cached_report("report_utilization", run="impl_1", hierarchical=True)
+            prj.cached_report("report_drc", dcp="/path/top_routed.dcp")
+        只有 dcp 时 open_checkpoint 到一个临时的内存工程，生成报告后关闭并切回原工程
+        没有 vivado 时可以直接用 ReportCache(root).get_report(dcp, cmd, **kwargs) 读取
+        :param cmd: report_utilization / report_timing_summary / report_power / report_drc 等支持 -file 的命令
+        :param run: 使用该 run 的 DCP，未命中时 open_run
+        :param path_map: (vivado 端路径前缀, 本机路径前缀)，远程时 DCP 在本机可读则在本机计算摘要，
+                         否则服务端读取整个 DCP 计算摘要，每个 DCP 版本只计算一次
+        :param kwargs: 报告命令的参数
+        """
+        run = run.name if isinstance(run, ViObjRun) else run
+        if not run and not dcp:
+            raise ViArgsError("cached_report needs run or dcp")
+        if self.report_cache is None:
+            self.use_report_cache()
+
+        dcp = self._run_dcp(run) if run else dcp
+        digest = self._dcp_digest(dcp, path_map)
+        key = report_key(digest, cmd, kwargs)
+        text = self.report_cache.get(key)
+        if text is not None:
+            logger.info(f"report cache hit {cmd} {os.path.basename(dcp)}")
+            return text
+
+        self._open_for_report(run, dcp)
+        try:
+            local_path = self._report_to_file(cmd + tcl_args_parse(**kwargs), f"{cmd}.rpt")
+        finally:
+            self._close_for_report(run)
+
+        try:
+            self.report_cache.put(key, local_path, {"dcp": dcp, "digest": digest, "cmd": cmd,
+                                                    "args": {k: str(v) for k, v in kwargs.items()}})
+            with open(local_path, encoding="utf-8", errors="replace") as f:
+                return f.read()
+        finally:
+            os.remove(local_path)
+
+    def cached_utilization(self, run: str or ViObjRun = "", dcp: str = "", **kwargs) -> UtilizationReport:
+        return parse_utilization_report(self.cached_report("report_utilization", run, dcp, **kwargs).splitlines())
+
+    def cached_timing_summary(self, run: str or ViObjRun = "", dcp: str = "", **kwargs) -> Dict[str, float]:
+        return parse_design_timing_summary(self.cached_report("report_timing_summary", run, dcp, **kwargs).splitlines())
+
     """ ================= hw ================="""
     "connect_hw_server"
 
@@ -541,7 +1358,7 @@ class VivadoPrj:
     def get_hw_server(self,
                       pattern: str = "*",
                       regexp: bool = False,
-                      filter_: Filter = None or str,
+                      filter_: Filter or str = "",
                       of_objects: str or ViObj = "",
                       **kwargs) -> Tuple[ViObjHWServer, ...]:
         servers = self._common_get("get_hw_server", pattern, regexp, filter_, of_objects, **kwargs)
@@ -578,7 +1395,7 @@ class VivadoPrj:
     def get_hw_devices(self,
                        pattern: str = "*",
                        regexp: bool = False,
-                       filter_: Filter = None or str,
+                       filter_: Filter or str = "",
                        of_objects: str or ViObj = "",
                        **kwargs) -> Tuple[ViObjHWDevice, ...]:
         devs = self._common_get("get_hw_server", pattern, regexp, filter_, of_objects, **kwargs)
@@ -605,7 +1422,7 @@ class VivadoPrj:
     def get_hw_target(self,
                       pattern: str = "*",
                       regexp: bool = False,
-                      filter_: Filter = None or str,
+                      filter_: Filter or str = "",
                       of_objects: str or ViObj = "",
                       **kwargs) -> Tuple[ViObjHWTarget, ...]:
         tars = self._common_get("get_hw_target", pattern, regexp, filter_, of_objects, **kwargs)
@@ -623,8 +1440,11 @@ class VivadoPrj:
     """ ================= bitstream ================="""
 
     def write_bits(self, bit_path: str, force: bool = False) -> List[str]:
-        if self.current_design().get_design_type() is not RunsType.IMPL:
-            raise ViNotInRightDesign("write bitstream must be in impl design")
+        """ 录制模式中不检查当前 design，由 write_bitstream 自己报错 """
+        if self._batch is None:
+            design = self.snapshot().current_design
+            if design is None or design.type is not RunsType.IMPL:
+                raise ViNotInRightDesign("write bitstream must be in impl design")
 
         if bit_path.endswith(".bit"):
             bit_path = bit_path.replace("\\", "/")
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import zipfile
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+r"""
+列式存储工具
+    StringTable: 字符串表，utf-8 拼接的字节 + int64 偏移量，可直接 mmap
+    save_npz / load_npz: 不压缩的 .npz，load 时每个成员都可以直接 mmap 到磁盘上
+    build_csr: 由 (row, col) 边列表构造 CSR 邻接数组
+"""
+
+
+class StringTable:
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        """
+        :param data: uint8, 所有字符串 utf-8 编码后拼接在一起
+        :param offsets: int64, 长度为 n + 1, 第 i 个字符串为 data[offsets[i]:offsets[i + 1]]
+        """
+        self.data = data
+        self.offsets = offsets
+        self._index = None  # type: Dict[str, int] or None
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> 'StringTable':
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], prefix: str) -> 'StringTable':
+        return cls(arrays[f"{prefix}_data"], arrays[f"{prefix}_offsets"])
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}_data": self.data, f"{prefix}_offsets": self.offsets}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item: int) -> str:
+        if item < 0:
+            item += len(self)
+        start, end = int(self.offsets[item]), int(self.offsets[item + 1])
+        return bytes(self.data[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __contains__(self, item: str):
+        return item in self._get_index()
+
+    def _get_index(self) -> Dict[str, int]:
+        """ name -> index 的反查表在第一次使用时才建立 """
+        if self._index is None:
+            self._index = {s: i for i, s in enumerate(self)}
+        return self._index
+
+    def index(self, name: str) -> int:
+        return self._get_index()[name]
+
+    def get(self, name: str, default: int = -1) -> int:
+        return self._get_index().get(name, default)
+
+    def tolist(self) -> List[str]:
+        return list(self)
+
+
+def encode_column(values: Iterable[str]) -> Tuple[StringTable, np.ndarray]:
+    """
+    对低基数的字符串列做字典编码
+    :return: (去重后的字符串表, int32 编码)
+    """
+    table = {}
+    codes = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int32)
+    return StringTable.from_strings(table.keys()), codes
+
+
+def build_csr(rows: np.ndarray, cols: np.ndarray, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    由边列表构造 CSR
+    :return: (indptr, indices), row i 的邻居为 indices[indptr[i]:indptr[i + 1]]
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int32)
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def save_npz(path: str, arrays: Dict[str, np.ndarray]) -> str:
+    """ 不压缩保存，保证 load_npz 能够 mmap 每一个成员 """
+    # 每次写入使用唯一的临时文件，多个进程同时保存同一个文件时不会互相覆盖
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def _member_data_offset(fp, info: zipfile.ZipInfo) -> int:
+    """ zip local file header 之后才是成员数据，central directory 里的 extra 长度不可信 """
+    fp.seek(info.header_offset)
+    header = fp.read(30)
+    name_len = int.from_bytes(header[26:28], "little")
+    extra_len = int.from_bytes(header[28:30], "little")
+    return info.header_offset + 30 + name_len + extra_len
+
+
+def load_npz(path: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    读取 save_npz 保存的文件
+    :param mmap: True 时所有未压缩的成员都以只读 np.memmap 返回，多进程打开同一文件共享 page cache
+    """
+    if not mmap:
+        with np.load(path, allow_pickle=False) as npz:
+            return {k: npz[k] for k in npz.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as fp:
+        for info in zf.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+
+            fp.seek(_member_data_offset(fp, info))
+            version = np.lib.format.read_magic(fp)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+
+            if dtype.hasobject:
+                raise ValueError(f"object array can't be mmap: {info.filename}")
+
+            if not shape or 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=fp.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
@@ -42,3 +42,13 @@ def get_sec_from_time_str(time_str: str):
         return n_type(n) * 3600
     else:
         return 0
+
+
+def file_digest(path: str, algorithm: str = "sha256", chunk_size: int = 1 << 20) -> str:
+    """ 分块计算文件摘要，大文件不会整个读入内存 """
+    import hashlib
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
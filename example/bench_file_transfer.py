@@ -0,0 +1,89 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from ViPyTcl import GRPCServer, GRPCRemoteTclServicer, RemoteTclProcessPopen, add_RemoteTclServicer_to_server
+
+"""
+put_file / get_file 吞吐测试
+    不指定 --server 时在本进程中启动一个只处理文件的服务端（不启动 vivado）
+    每个大小分别测试分块传输和整条消息传输，整条消息超过 gRPC 的 4 MB 限制时记为 failed
+"""
+
+
+class FileOnlyServicer(GRPCRemoteTclServicer):
+    def __init__(self, cache: str):
+        self._tcl_proc = None
+        self._init_cache(Path(cache))
+
+    def stop(self):
+        pass
+
+
+def bench(client: RemoteTclProcessPopen, path: str, dst_dir: str, repeat: int):
+    size = os.path.getsize(path)
+    result = {}
+    stream_put = lambda src, dst: client.grpc_put_file(src, dst, dedup=False)
+    for name, put, get in (("stream", stream_put, client.grpc_get_file),
+                           ("unary", client._grpc_put_file_unary, client._grpc_get_file_unary)):
+        try:
+            start = time.time()
+            for _ in range(repeat):
+                remote = put(path, os.path.basename(path))
+            put_time = (time.time() - start) / repeat
+
+            start = time.time()
+            for _ in range(repeat):
+                get(remote, os.path.join(dst_dir, f"{name}_{os.path.basename(path)}"))
+            get_time = (time.time() - start) / repeat
+            result[name] = (size / put_time / 1024 ** 2, size / get_time / 1024 ** 2)
+        except Exception as err:
+            result[name] = str(err).splitlines()[0][:40] if str(err) else err.__class__.__name__
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", default="", help="ip:port of a running remote tcl server")
+    parser.add_argument("--sizes", default="1,16,64,256", help="file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="vipytcl_bench_")
+    server = None
+    if args.server:
+        ip, port = args.server.split(":")
+    else:
+        server = GRPCServer(use_aps=False)
+        server.add_servicer(add_RemoteTclServicer_to_server, FileOnlyServicer(os.path.join(work, "server")))
+        ip, port = "127.0.0.1", server.add_insecure_port("127.0.0.1", 0)
+        server.start()
+
+    client = RemoteTclProcessPopen(ip, int(port))
+    print(f"{'size MB':>8} {'stream put':>12} {'stream get':>12} {'unary put':>12} {'unary get':>12}  (MB/s)")
+    try:
+        for size_mb in (float(s) for s in args.sizes.split(",")):
+            path = os.path.join(work, f"bench_{size_mb:g}MB.bin")
+            with open(path, "wb") as f:
+                for _ in range(int(size_mb)):
+                    f.write(os.urandom(1024 ** 2))
+                f.write(os.urandom(int((size_mb % 1) * 1024 ** 2)))
+
+            result = bench(client, path, work, args.repeat)
+            cols = []
+            for name in ("stream", "unary"):
+                value = result[name]
+                cols += [f"{v:12.1f}" for v in value] if isinstance(value, tuple) else [f"{'failed':>12}"] * 2
+            print(f"{size_mb:8g} " + " ".join(cols))
+            os.remove(path)
+        print(f"compression: {client.compression_stats.snapshot()}")
+    finally:
+        client.terminate()
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()